@@ -1,95 +1,119 @@
-import csv
-import sys
+import argparse
 from pathlib import Path
-from urllib.parse import quote
+
+from csv_stream import open_csv, open_csv_writer, read_header
+from index_medias import MediaIndex
+from instrumentation import run_script
+from reporting import Report
+from url_rewrite import NormalizeFilename, Quote, RewriteEngine
+from woo_schema import Schema
 
 
 def main() -> None:
     """
     Usage:
-      python apply_images_base_url.py <base_url> [input_csv] [output_csv]
+      python apply_images_base_url.py <base_url> [input_csv] [output_csv] [--medias <uploads_dir>]
 
     - base_url: e.g. https://example.com/wp-content/uploads/impexo/
       (with or without trailing slash)
     - input_csv defaults to woocommerce_gammes_import_wc_no_images_refs.csv
     - output_csv defaults to woocommerce_gammes_import_wc_images_refs.csv
+    - --medias: local copy of the folder behind base_url. Each file name is
+      resolved against its index (real case, extension, sub-folder) and the
+      names that match no file are listed.
     """
 
-    if len(sys.argv) < 2:
-        raise SystemExit(
-            "Usage: python apply_images_base_url.py <base_url> [input_csv] [output_csv]\n"
-            "Example: python apply_images_base_url.py https://example.com/wp-content/uploads/impexo/"
-        )
-
-    base_url = sys.argv[1].strip()
+    parser = argparse.ArgumentParser(
+        usage="python apply_images_base_url.py <base_url> [input_csv] [output_csv] [--medias <uploads_dir>]",
+        epilog="Example: python apply_images_base_url.py https://example.com/wp-content/uploads/impexo/",
+    )
+    parser.add_argument("base_url")
+    parser.add_argument("input_csv", nargs="?", type=Path)
+    parser.add_argument("output_csv", nargs="?", type=Path)
+    parser.add_argument("--medias", type=Path, help="Local copy of the uploads folder to check file names against")
+    args = parser.parse_args()
+
+    base_url = args.base_url.strip()
     if not base_url:
         raise SystemExit("base_url vide.")
     if not base_url.endswith("/"):
         base_url += "/"
 
     exports_dir = Path(__file__).resolve().parent
-    in_path = Path(sys.argv[2]) if len(sys.argv) >= 3 else exports_dir / "woocommerce_gammes_import_wc_no_images_refs.csv"
-    out_path = Path(sys.argv[3]) if len(sys.argv) >= 4 else exports_dir / "woocommerce_gammes_import_wc_images_refs.csv"
-
-    rows = list(csv.reader(in_path.read_text(encoding="utf-8-sig").splitlines()))
-    if not rows:
+    in_path = args.input_csv or exports_dir / "woocommerce_gammes_import_wc_no_images_refs.csv"
+    out_path = args.output_csv or exports_dir / "woocommerce_gammes_import_wc_images_refs.csv"
+
+    medias = None
+    if args.medias is not None:
+        try:
+            medias = MediaIndex.load_or_build(args.medias)
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+
+    header = read_header(in_path)
+    if not header:
         raise SystemExit(f"CSV vide: {in_path}")
 
-    header = rows[0]
-    if "Images" not in header:
+    schema = Schema(header)
+    if not schema.has("Images"):
         raise SystemExit("Colonne 'Images' introuvable.")
-    img_idx = header.index("Images")
-    
-    # Find attribute columns
-    attr3_name_idx = None
-    attr3_value_idx = None
-    attr1_value_idx = None
-    
-    for i, col in enumerate(header):
-        if col == "Attribute 3 name":
-            attr3_name_idx = i
-        elif col == "Attribute 3 value(s)":
-            attr3_value_idx = i
-        elif col == "Attribute 1 value(s)":
-            attr1_value_idx = i
-
-    out_rows = [header]
-    for r in rows[1:]:
-        rr = r.copy()
-        val = (rr[img_idx] if img_idx < len(rr) else "").strip()
-
-        # If empty, try to infer from attributes (Référence + Modèle)
-        if not val and attr3_value_idx is not None and attr1_value_idx is not None:
-            ref = (rr[attr3_value_idx] if attr3_value_idx < len(rr) else "").strip()
-            model = (rr[attr1_value_idx] if attr1_value_idx < len(rr) else "").strip()
-            
-            if ref and model:
-                # Normalize reference (JOJO1015-X)
-                ref = ref.upper().strip()
-                
-                # Map model to filename suffix
-                model_lower = model.lower()
-                if "air" in model_lower:
-                    val = f"{ref}AIR.JPG"
-                elif "pro max" in model_lower:
-                    val = f"{ref}PM.JPG"
-                elif "pro" in model_lower:
-                    val = f"{ref}P.JPG"
-                elif "iphone 17" in model_lower and "pro" not in model_lower and "air" not in model_lower:
-                    val = f"{ref}.JPG"
-
-        if val:
-            # URL-encode filename (spaces, accents, etc.)
-            rr[img_idx] = base_url + quote(val)
-        out_rows.append(rr)
-
-    with out_path.open("w", encoding="utf-8-sig", newline="") as f:
-        w = csv.writer(f)
-        w.writerows(out_rows)
-
-    print(f"Wrote {out_path} ({len(out_rows)-1} lignes).")
+    # Référence + Modèle are needed to infer missing images
+    can_infer = schema.has("Attribute 3 value(s)") and schema.has("Attribute 1 value(s)")
+
+    count = 0
+    report = Report(samples=20)
+    missed = set()  # noms introuvables, signalés une fois (avec le SKU de la première ligne concernée)
+
+    def real_name(name: str) -> str:
+        media = medias.resolve(name)
+        if media is None:
+            missed.add(name)
+            return name
+        return media.path
+
+    # Nom réel du fichier (avec son sous-dossier) puis encodage (espaces, accents...),
+    # calculés une fois par nom distinct
+    rules = [NormalizeFilename(real_name)] if medias is not None else []
+    rewrite = RewriteEngine(rules + [Quote(whole=True)]).rewrite
+    with open_csv_writer(out_path, header) as w:
+        with open_csv(in_path) as (_, rows):
+            for view in schema.views(rows):
+                val = view.images.strip()
+
+                # If empty, try to infer from attributes (Référence + Modèle)
+                if not val and can_infer:
+                    ref = view.ref.strip()
+                    model = view.model.strip()
+                    
+                    if ref and model:
+                        # Normalize reference (JOJO1015-X)
+                        ref = ref.upper().strip()
+                        
+                        # Map model to filename suffix
+                        model_lower = model.lower()
+                        if "air" in model_lower:
+                            val = f"{ref}AIR.JPG"
+                        elif "pro max" in model_lower:
+                            val = f"{ref}PM.JPG"
+                        elif "pro" in model_lower:
+                            val = f"{ref}P.JPG"
+                        elif "iphone 17" in model_lower and "pro" not in model_lower and "air" not in model_lower:
+                            val = f"{ref}.JPG"
+
+                if val:
+                    before = len(missed)
+                    view.images = base_url + rewrite(val)
+                    if len(missed) > before:
+                        report.add("image_introuvable", f"{val} ({view.sku})")
+                w.writerow(view.row)
+                count += 1
+
+    print(f"Wrote {out_path} ({count} lignes).")
+    if missed:
+        print(f"ATTENTION: {len(missed)} images introuvables dans {args.medias}:")
+        report.print_samples("image_introuvable")
 
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
 
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmark des scripts de exports/ sur des catalogues synthétiques.
+
+Pour chaque taille demandée, un catalogue est fabriqué à partir de la forme de
+specs_client.json (N produits × M couleurs × K références × les modèles),
+puis les générateurs, les correcteurs et les vérificateurs sont lancés tour à
+tour dans un dossier de travail temporaire, comme en production :
+
+- les générateurs partent du specs_client.json synthétique ;
+- les correcteurs partent d'un woocommerce_import.csv dérivé de l'export
+  complet, avec des doublons réalistes (même Modèle + Couleur sous une autre
+  référence) et des URLs d'images cassées (domaine placeholder, ancien
+  dossier, image manquante).
+
+Chaque outil est mesuré dans son propre processus : temps réel, lignes/s et
+pic de mémoire (RSS). Les résultats sont écrits en JSON et comparés à une
+référence enregistrée : le script sort en erreur si un outil est plus lent ou
+plus gourmand que la référence au-delà du seuil.
+
+Usage:
+  python bench_exports.py [--sizes 10x10x5,40x20x8] [--repeat 3]
+                          [--output bench_results.json]
+                          [--baseline bench_baseline.json] [--save-baseline]
+                          [--threshold 0.25]
+
+Une taille s'écrit PRODUITSxCOULEURSxREFERENCES[xMODELES].
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Set
+
+from column_cache import NO_CACHE_ENV
+from csv_stream import open_csv, open_csv_writer
+from fix_image_urls import PLACEHOLDER
+from fix_image_urls_correct_path import WRONG_BASE_URL
+from instrumentation import run_script
+from woo_schema import Schema
+
+RESULTS_VERSION = 1
+EXPORTS_DIR = Path(__file__).resolve().parent
+DEFAULT_SIZES = "10x10x5,40x20x8"
+
+# Part des variations dupliquées / dont l'image est cassée dans woocommerce_import.csv
+DUPLICATE_RATE = 0.05
+BROKEN_IMAGE_RATE = 0.10
+
+# En dessous de cet écart (secondes), une différence de temps est du bruit
+MIN_TIME_DELTA = 0.05
+
+
+class Size(NamedTuple):
+    products: int
+    colors: int
+    refs: int
+    models: int = 4
+
+    @classmethod
+    def parse(cls, text: str) -> "Size":
+        parts = [int(p) for p in text.lower().split("x")]
+        if len(parts) not in (3, 4) or min(parts) < 1:
+            raise ValueError(f"Taille invalide: {text} (attendu PRODUITSxCOULEURSxREFERENCES[xMODELES])")
+        return cls(*parts)
+
+    def __str__(self) -> str:
+        return "x".join(str(p) for p in self)
+
+    @property
+    def variations(self) -> int:
+        return self.products * self.colors * self.refs * self.models
+
+
+class Tool(NamedTuple):
+    name: str
+    argv: List[str]
+    rows_from: str  # CSV dont le nombre de lignes de données sert au calcul du débit
+    env: Dict[str, str] = {}
+    warmup: bool = False  # lancement préalable non mesuré (cache à remplir)
+
+
+NO_CACHE = {NO_CACHE_ENV: "1"}
+
+# Dans l'ordre d'exécution : chaque outil lit ce que les précédents ont écrit
+TOOLS = [
+    Tool("generer_csv_complet", ["generer_csv_complet.py"], "woocommerce_import_complet.csv"),
+    Tool("generer_csv_sans_reference", ["generer_csv_sans_reference.py"], "woocommerce_import_sans_reference.csv"),
+    Tool("fix_csv_conflicts", ["fix_csv_conflicts.py"], "woocommerce_import.csv"),
+    Tool("fix_image_urls", ["fix_image_urls.py"], "woocommerce_import_corrige.csv"),
+    Tool("fix_image_urls_correct_path", ["fix_image_urls_correct_path.py"], "woocommerce_import_corrige_final.csv"),
+    Tool("corriger_images_par_reference", ["corriger_images_par_reference.py"],
+         "woocommerce_import_corrige_final.csv"),
+    Tool("corriger_urls_depuis_original", ["corriger_urls_depuis_original.py"], "woocommerce_import.csv"),
+    Tool("pipeline", ["pipeline.py", "--output", "pipeline_sortie.csv"], "woocommerce_import.csv"),
+    Tool("verifier_csv_produits", ["verifier_csv_produits.py"], "woocommerce_import_corrige_final.csv", NO_CACHE),
+    Tool("verifier_images_variations", ["verifier_images_variations.py"],
+         "woocommerce_import_corrige_final.csv", NO_CACHE),
+    Tool("verifier_variations_client", ["verifier_variations_client.py"],
+         "woocommerce_import_corrige_final.csv", NO_CACHE),
+    Tool("valider_catalogue", ["valider_catalogue.py"], "woocommerce_import_corrige_final.csv", NO_CACHE),
+    Tool("valider_catalogue_cache", ["valider_catalogue.py"], "woocommerce_import_corrige_final.csv",
+         warmup=True),
+]
+
+
+# --- Catalogue synthétique ----------------------------------------------------
+
+def scale_specs(base: dict, size: Size) -> dict:
+    """Catalogue de la forme de `base` (textes, couleurs, prix réels) à la taille demandée."""
+    templates = list(base["products"].values())
+    palette = list(dict.fromkeys(c for t in templates for c in t["colors"]))
+    palette += [f"Teinte {i}" for i in range(len(palette), size.colors)]
+    prices = [p for t in templates for p in t["prices"].values()]
+
+    models = list(base["models"][:size.models])
+    models += [f"iPhone 17 Variante {i}" for i in range(len(models), size.models)]
+
+    products = {}
+    for p in range(size.products):
+        template = templates[p % len(templates)]
+        refs = [f"JOJO1015-{p * size.refs + r + 1}" for r in range(size.refs)]
+        colors = [palette[(p + c) % len(palette)] for c in range(size.colors)]
+        products[f"impexo-synth-{p:05d}"] = {
+            "name": f"{template['name']} #{p}",
+            "short_desc": template["short_desc"],
+            "desc": template["desc"],
+            "references": refs,
+            "colors": colors,
+            "prices": {ref: prices[(p + i) % len(prices)] for i, ref in enumerate(refs)},
+        }
+    return {"models": models, "products": products}
+
+
+def degrade_export(complet_path: Path, out_path: Path, seed: int = 0) -> Dict[str, int]:
+    """
+    Écrit `out_path` : l'export complet avec des variations en double (autre
+    référence, même Modèle + Couleur) et des URLs d'images cassées.
+    """
+    rng = random.Random(seed)
+    stats = {"duplicates": 0, "broken_images": 0}
+    with open_csv(complet_path) as (header, rows), open_csv_writer(out_path, header) as writer:
+        schema = Schema(header)
+        refs_by_parent: Dict[str, List[str]] = {}
+        for view in schema.views(rows):
+            if view.is_variable:
+                refs_by_parent[view.sku] = [r.strip() for r in view.ref.split(",")]
+            elif view.is_variation:
+                if rng.random() < BROKEN_IMAGE_RATE:
+                    filename = view.images.split("/")[-1]
+                    view.images = rng.choice([
+                        f"https://{PLACEHOLDER}/wp-content/uploads/{filename}",
+                        f"{WRONG_BASE_URL}/{filename}",
+                        "",
+                    ])
+                    stats["broken_images"] += 1
+                writer.writerow(view.row)
+                others = [r for r in refs_by_parent.get(view.parent, ()) if r != view.ref]
+                if others and rng.random() < DUPLICATE_RATE:
+                    duplicate = schema.view(list(view.row))
+                    duplicate.ref = rng.choice(others)
+                    duplicate.sku = f"{view.sku}--doublon"
+                    writer.writerow(duplicate.row)
+                    stats["duplicates"] += 1
+                continue
+            writer.writerow(view.row)
+    return stats
+
+
+def count_rows(path: Path) -> int:
+    with open_csv(path) as (_, rows):
+        return sum(1 for _ in rows)
+
+
+# --- Mesure -------------------------------------------------------------------
+
+def run_tool(tool: Tool, workdir: Path) -> dict:
+    """Lance l'outil une fois ; renvoie le temps réel et le pic de RSS (Ko) de son processus."""
+    env = dict(os.environ, PYTHONHASHSEED="0", **tool.env)
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, *tool.argv], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    proc.stderr.close()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{tool.name} a echoue ({proc.returncode}): "
+                           f"{stderr.decode('utf-8', 'replace').strip()[-500:]}")
+    return {"wall_s": wall, "peak_rss_kb": usage.ru_maxrss}
+
+
+def bench_size(size: Size, base_specs: dict, repeat: int, measured: Set[str]) -> List[dict]:
+    """
+    Lance tous les outils dans l'ordre sur un catalogue de taille `size` ; ceux
+    qui ne sont pas dans `measured` ne tournent qu'une fois, pour produire
+    les entrées des suivants.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_exports_") as tmp:
+        workdir = Path(tmp)
+        for script in EXPORTS_DIR.glob("*.py"):
+            shutil.copy2(script, workdir)
+        with open(workdir / "specs_client.json", "w", encoding="utf-8") as f:
+            json.dump(scale_specs(base_specs, size), f, ensure_ascii=False)
+
+        for tool in TOOLS:
+            if tool.name == "fix_csv_conflicts":
+                # Entrée des correcteurs : l'export complet abîmé
+                degrade_export(workdir / "woocommerce_import_complet.csv", workdir / "woocommerce_import.csv")
+            if tool.name not in measured:
+                run_tool(tool, workdir)
+                continue
+            if tool.warmup:
+                run_tool(tool, workdir)
+            runs = [run_tool(tool, workdir) for _ in range(repeat)]
+            wall = min(r["wall_s"] for r in runs)
+            rows = count_rows(workdir / tool.rows_from)
+            results.append({
+                "tool": tool.name,
+                "size": str(size),
+                "rows": rows,
+                "wall_s": round(wall, 4),
+                "rows_per_s": round(rows / wall) if wall else 0,
+                "peak_rss_kb": max(r["peak_rss_kb"] for r in runs),
+            })
+            print(f"  {tool.name:<32} {wall:8.3f}s  {rows:>9} lignes  "
+                  f"{results[-1]['rows_per_s']:>9} lignes/s  {results[-1]['peak_rss_kb'] // 1024:>6} Mo")
+    return results
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """Régressions (temps ou mémoire au-delà de `threshold`) par rapport à la référence."""
+    reference = {(r["tool"], r["size"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = reference.get((r["tool"], r["size"]))
+        if base is None:
+            continue
+        if r["wall_s"] > base["wall_s"] * (1 + threshold) and r["wall_s"] - base["wall_s"] > MIN_TIME_DELTA:
+            regressions.append(f"{r['tool']} [{r['size']}]: {base['wall_s']:.3f}s -> {r['wall_s']:.3f}s")
+        if r["peak_rss_kb"] > base["peak_rss_kb"] * (1 + threshold):
+            regressions.append(f"{r['tool']} [{r['size']}]: {base['peak_rss_kb'] // 1024} Mo -> "
+                               f"{r['peak_rss_kb'] // 1024} Mo")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des scripts exports/ sur des catalogues synthétiques.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="Tailles séparées par des virgules (PRODUITSxCOULEURSxREFERENCES[xMODELES])")
+    parser.add_argument("--tools", help=f"Outils séparés par des virgules parmi: {', '.join(t.name for t in TOOLS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Lancements par outil (le plus rapide est gardé)")
+    parser.add_argument("--output", type=Path, default=EXPORTS_DIR / "bench_results.json")
+    parser.add_argument("--baseline", type=Path, default=EXPORTS_DIR / "bench_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer ces résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Écart relatif toléré par rapport à la référence (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    try:
+        sizes = [Size.parse(s.strip()) for s in args.sizes.split(",")]
+    except ValueError as e:
+        raise SystemExit(f"ERREUR: {e}")
+    measured = {t.name for t in TOOLS}
+    if args.tools:
+        measured = {n.strip() for n in args.tools.split(",")}
+        unknown = measured - {t.name for t in TOOLS}
+        if unknown:
+            raise SystemExit(f"Outil inconnu: {', '.join(sorted(unknown))}")
+
+    with open(EXPORTS_DIR / "specs_client.json", encoding="utf-8") as f:
+        base_specs = json.load(f)
+
+    print("=" * 80)
+    print("BENCHMARK DES SCRIPTS EXPORTS")
+    print("=" * 80)
+    results = []
+    for size in sizes:
+        print(f"\nTaille {size} ({size.variations} variations)")
+        try:
+            results.extend(bench_size(size, base_specs, args.repeat, measured))
+        except RuntimeError as e:
+            raise SystemExit(f"ERREUR: {e}")
+
+    report = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nOK: Resultats : {args.output}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"OK: Reference enregistree : {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print("Pas de reference (--save-baseline pour en enregistrer une)")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get("results", []), args.threshold)
+    if regressions:
+        print(f"\nERREUR: {len(regressions)} regression(s) au-dela de {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print(f"OK: Aucune regression au-dela de {args.threshold:.0%} par rapport a {args.baseline}")
+
+
+if __name__ == "__main__":
+    run_script(main)
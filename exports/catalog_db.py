@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Catalogue WooCommerce dans une base SQLite locale, interrogeable en SQL.
+
+Les scripts de vérification reconstruisent leurs dictionnaires (parents,
+variations par parent, combinaisons) à chaque question. Ici, un export est
+chargé une fois dans une base indexée (SKU, Parent, et Parent + modèle +
+couleur + référence), puis chaque contrôle est une requête SQL préparée :
+une nouvelle question sur un catalogue de plusieurs millions de lignes
+s'écrit en une requête au lieu d'un nouveau script.
+
+Les valeurs normalisées utilisées par les vérificateurs (modèle et couleur
+sans espaces ni tirets, référence de l'image) sont calculées à l'import et
+stockées dans des colonnes dédiées, pour que les requêtes restent en SQL pur
+et profitent des index.
+
+Usage:
+  python catalog_db.py import woocommerce_import_corrige_final.csv [--db catalogue.sqlite]
+  python catalog_db.py check [doublons_modele_couleur ...] [--db catalogue.sqlite]
+  python catalog_db.py query <nom de requête | "SELECT ..."> [--output resultat.csv]
+"""
+
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from column_cache import open_columns
+from csv_stream import open_csv_writer
+from instrumentation import run_script
+from verifier_images_variations import extract_ref_from_image_url, normalize as normalize_ref
+from woo_schema import Schema
+
+DB_VERSION = 1
+DB_PATH = Path(__file__).with_name("catalogue.sqlite")
+
+# Lignes insérées par appel à executemany (toutes dans la même transaction)
+BATCH_SIZE = 20000
+
+IMPORTED_COLUMNS = ("Type", "SKU", "Name", "Parent", "Regular price", "Attribute 1 value(s)",
+                    "Attribute 2 value(s)", "Attribute 3 value(s)", "Images")
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE items (
+    line INTEGER PRIMARY KEY,   -- numéro de ligne dans le CSV (en-tête = 1)
+    kind TEXT NOT NULL,         -- Type en minuscules : variable, variation...
+    sku TEXT NOT NULL,
+    name TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    price TEXT NOT NULL,
+    model TEXT NOT NULL,
+    color TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    images TEXT NOT NULL,
+    model_key TEXT NOT NULL,    -- modèle normalisé (minuscules, sans espaces ni tirets)
+    color_key TEXT NOT NULL,    -- couleur normalisée
+    ref_key TEXT NOT NULL,      -- référence normalisée comme dans verifier_images_variations
+    image_ref TEXT NOT NULL,    -- référence lue dans le nom de fichier de l'image
+    image_ref_key TEXT NOT NULL
+);
+-- Références déclarées par chaque produit parent (Attribute 3 value(s), séparées par des virgules)
+CREATE TABLE parent_refs (parent TEXT NOT NULL, ref TEXT NOT NULL);
+"""
+
+# Créés après le chargement : plus rapide que de les tenir à jour ligne par ligne
+INDEXES = """
+CREATE INDEX items_sku ON items (sku);
+CREATE INDEX items_parent ON items (parent);
+CREATE INDEX items_combo ON items (parent, model_key, color_key, ref);
+CREATE INDEX parent_refs_parent ON parent_refs (parent, ref);
+"""
+
+
+def normalize(s: str) -> str:
+    return (s or "").strip().lower().replace(" ", "").replace("-", "")
+
+
+class Query(NamedTuple):
+    description: str
+    sql: str
+
+
+# Contrôles des scripts verifier_*.py / valider_catalogue.py, en SQL
+QUERIES: Dict[str, Query] = {
+    "doublons_modele_couleur": Query(
+        "Plusieurs variations pour la même combinaison Modèle + Couleur",
+        """SELECT parent, model_key AS modele, color_key AS couleur, COUNT(*) AS variations,
+                  group_concat(ref, ', ') AS refs, MIN(sku) AS exemple_sku
+           FROM items WHERE kind = 'variation' AND parent != ''
+           GROUP BY parent, model_key, color_key HAVING COUNT(*) > 1
+           ORDER BY parent, model_key, color_key"""),
+    "skus_dupliques": Query(
+        "Même SKU sur plusieurs lignes",
+        """SELECT sku, COUNT(*) AS lignes, group_concat(line, ', ') AS numeros
+           FROM items WHERE sku != '' GROUP BY sku HAVING COUNT(*) > 1 ORDER BY sku"""),
+    "parents_manquants": Query(
+        "Variations dont le produit parent est absent",
+        """SELECT v.line, v.sku, v.parent FROM items v
+           WHERE v.kind = 'variation'
+             AND NOT EXISTS (SELECT 1 FROM items p WHERE p.sku = v.parent AND p.kind = 'variable')
+           ORDER BY v.line"""),
+    "references_manquantes": Query(
+        "Variations sans référence, ou avec une référence absente du parent",
+        """SELECT v.line, v.parent, v.sku, v.ref FROM items v
+           WHERE v.kind = 'variation' AND v.parent != ''
+             AND (v.ref = '' OR NOT EXISTS (SELECT 1 FROM parent_refs r
+                                            WHERE r.parent = v.parent AND r.ref = v.ref))
+           ORDER BY v.line"""),
+    "references_sans_variation": Query(
+        "Références déclarées par un parent sans aucune variation",
+        """SELECT r.parent, r.ref FROM parent_refs r
+           WHERE NOT EXISTS (SELECT 1 FROM items v WHERE v.parent = r.parent
+                             AND v.kind = 'variation' AND v.ref = r.ref)
+           ORDER BY r.parent, r.ref"""),
+    "image_reference": Query(
+        "Image d'une variation qui ne correspond pas à sa référence",
+        """SELECT line, parent, sku, model, color, ref, image_ref FROM items
+           WHERE kind = 'variation' AND ref != '' AND image_ref != '' AND ref_key != image_ref_key
+           ORDER BY line"""),
+    "images_dupliquees": Query(
+        "Même image utilisée par plusieurs variations d'un produit",
+        """SELECT parent, image_ref, COUNT(*) AS variations, MIN(sku) AS exemple_sku
+           FROM items WHERE kind = 'variation' AND parent != '' AND image_ref != ''
+           GROUP BY parent, image_ref HAVING COUNT(*) > 1
+           ORDER BY parent, image_ref"""),
+}
+
+
+# --- Import -------------------------------------------------------------------
+
+def _item_rows(csv_path) -> Iterator[Tuple]:
+    with open_columns(csv_path, IMPORTED_COLUMNS) as (columns, rows):
+        for line, view in enumerate(Schema(columns).views(rows), start=2):
+            ref = view.ref
+            image_ref = extract_ref_from_image_url(view.images) or ""
+            yield (line, view.type.lower(), view.sku, view.name, view.parent, view.price,
+                   view.model, view.color, ref, view.images,
+                   normalize(view.model), normalize(view.color), normalize_ref(ref),
+                   image_ref, normalize_ref(image_ref))
+
+
+def _batches(rows: Iterable[Tuple], size: int = BATCH_SIZE) -> Iterator[List[Tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_csv(csv_path, db_path=DB_PATH) -> int:
+    """
+    (Re)crée la base à partir du CSV ; renvoie le nombre de lignes importées.
+
+    La base est construite dans un fichier temporaire (sans journal : elle est
+    jetée en cas d'erreur) qui remplace l'ancienne à la fin.
+    """
+    db_path = Path(db_path)
+    tmp_path = db_path.with_name(f".{db_path.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    count = 0
+    try:
+        conn = sqlite3.connect(tmp_path, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(SCHEMA)
+            conn.execute("BEGIN")
+            insert = "INSERT INTO items VALUES (" + ", ".join("?" * 15) + ")"
+            for batch in _batches(_item_rows(csv_path)):
+                conn.executemany(insert, batch)
+                count += len(batch)
+            conn.execute("""INSERT INTO parent_refs (parent, ref)
+                            WITH RECURSIVE split(parent, ref, rest) AS (
+                                SELECT sku, '', ref || ',' FROM items WHERE kind = 'variable' AND ref != ''
+                                UNION ALL
+                                SELECT parent, trim(substr(rest, 1, instr(rest, ',') - 1)),
+                                       substr(rest, instr(rest, ',') + 1)
+                                FROM split WHERE rest != '')
+                            SELECT DISTINCT parent, ref FROM split WHERE ref != ''""")
+            stat = os.stat(csv_path)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(DB_VERSION)),
+                ("source", str(Path(csv_path).resolve())),
+                ("source_size", str(stat.st_size)),
+                ("source_mtime_ns", str(stat.st_mtime_ns)),
+                ("rows", str(count)),
+            ])
+            conn.execute("COMMIT")
+            conn.executescript(INDEXES)
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return count
+
+
+# --- Requêtes -----------------------------------------------------------------
+
+def connect(db_path=DB_PATH) -> sqlite3.Connection:
+    """Connexion en lecture seule ; lève FileNotFoundError si la base n'existe pas ou est d'une autre version."""
+    db_path = Path(db_path)
+    if not db_path.exists():
+        raise FileNotFoundError(f"Base introuvable : {db_path} (lancer d'abord: python catalog_db.py import <csv>)")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if version is None or int(version[0]) != DB_VERSION:
+        conn.close()
+        raise FileNotFoundError(f"Base d'une autre version : {db_path} (la réimporter)")
+    return conn
+
+
+def source_changed(conn: sqlite3.Connection) -> Optional[str]:
+    """Chemin du CSV importé s'il a été modifié (ou supprimé) depuis l'import, sinon None."""
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+    try:
+        stat = os.stat(meta["source"])
+    except FileNotFoundError:
+        return meta["source"]
+    if str(stat.st_size) != meta["source_size"] or str(stat.st_mtime_ns) != meta["source_mtime_ns"]:
+        return meta["source"]
+    return None
+
+
+def run_query(conn: sqlite3.Connection, query: str, params: Iterable = ()) -> Tuple[List[str], sqlite3.Cursor]:
+    """(noms de colonnes, curseur) pour une requête nommée de QUERIES ou un SELECT libre."""
+    sql = QUERIES[query].sql if query in QUERIES else query
+    cursor = conn.execute(sql, tuple(params))
+    return [d[0] for d in cursor.description or ()], cursor
+
+
+# --- Ligne de commande --------------------------------------------------------
+
+def cmd_import(args) -> None:
+    if not args.csv.exists():
+        print(f"ERREUR: Fichier introuvable : {args.csv}")
+        return
+    count = import_csv(args.csv, args.db)
+    print(f"OK: {count} lignes importees dans {args.db}")
+
+
+def cmd_check(args, conn: sqlite3.Connection) -> None:
+    names = args.names or list(QUERIES)
+    for name in names:
+        if name not in QUERIES:
+            raise SystemExit(f"Requete inconnue: {name} (disponibles: {', '.join(QUERIES)})")
+
+    print("=" * 80)
+    print("CONTROLES DU CATALOGUE (SQLite)")
+    print("=" * 80)
+    print()
+    total = 0
+    for name in names:
+        columns, cursor = run_query(conn, name)
+        rows = cursor.fetchall()
+        total += len(rows)
+        if not rows:
+            print(f"OK: {name}")
+            continue
+        print(f"ATTENTION: {name} - {len(rows)} resultat(s) ({QUERIES[name].description})")
+        for row in rows[:args.limit]:
+            print("  - " + ", ".join(f"{c}={v}" for c, v in zip(columns, row)))
+        if len(rows) > args.limit:
+            print(f"  ... et {len(rows) - args.limit} autres")
+    print()
+    print(f"{total} resultat(s) au total")
+
+
+def cmd_query(args, conn: sqlite3.Connection) -> None:
+    try:
+        columns, cursor = run_query(conn, args.query)
+    except sqlite3.Error as e:
+        raise SystemExit(f"ERREUR SQL: {e}")
+    if args.output:
+        count = 0
+        with open_csv_writer(args.output, columns) as writer:
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+        print(f"OK: {count} lignes ecrites dans {args.output}")
+        return
+    print("\t".join(columns))
+    for count, row in enumerate(cursor):
+        if count >= args.limit:
+            print(f"... (limite de {args.limit} lignes, utiliser --output pour tout ecrire)")
+            break
+        print("\t".join("" if v is None else str(v) for v in row))
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", type=Path, default=DB_PATH)
+    parser = argparse.ArgumentParser(description="Catalogue WooCommerce dans une base SQLite indexée.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", parents=[common], help="Charge un export CSV dans la base (la remplace)")
+    p_import.add_argument("csv", type=Path)
+
+    p_check = sub.add_parser("check", parents=[common], help="Lance les contrôles préparés")
+    p_check.add_argument("names", nargs="*", help=f"Contrôles parmi: {', '.join(QUERIES)} (tous par défaut)")
+    p_check.add_argument("--limit", type=int, default=5, help="Exemples affichés par contrôle")
+
+    p_query = sub.add_parser("query", parents=[common], help="Lance une requête nommée ou un SELECT libre")
+    p_query.add_argument("query")
+    p_query.add_argument("--output", type=Path, help="Écrire tous les résultats dans ce CSV")
+    p_query.add_argument("--limit", type=int, default=50, help="Lignes affichées sans --output")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        cmd_import(args)
+        return
+
+    try:
+        conn = connect(args.db)
+    except FileNotFoundError as e:
+        print(f"ERREUR: {e}")
+        return
+    with conn:
+        changed = source_changed(conn)
+        if changed:
+            print(f"ATTENTION: {changed} a change depuis l'import, relancer: python catalog_db.py import")
+        if args.command == "check":
+            cmd_check(args, conn)
+        else:
+            cmd_query(args, conn)
+    conn.close()
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Génération parallèle d'un catalogue CSV, découpée par produit.
+
+Chaque produit de SPECS_CLIENT (ou chaque tranche produit × modèle quand il y a
+plus de cœurs que de produits) est un shard : un processus du pool écrit ses
+lignes dans un fichier temporaire, puis les shards sont recopiés dans l'ordre
+des specs derrière l'en-tête. Le résultat est identique octet pour octet à la
+génération en série.
+
+Le générateur fournit une fonction de niveau module (pour être envoyée aux
+processus) :
+
+    iter_shard_lines(product_sku, specs, models, with_parent) -> lignes CSV (str)
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from csv_stream import open_output
+
+ShardFunc = Callable[[str, dict, List[str], bool], Iterable[str]]
+
+# Lignes concaténées avant chaque écriture dans un shard
+BLOCK_SIZE = 10000
+
+
+def plan_shards(specs_client: Dict[str, dict], models: List[str], jobs: int) -> List[Tuple[str, List[str], bool]]:
+    """
+    Découpe le catalogue en shards (product_sku, modèles, avec_parent), dans l'ordre de sortie.
+
+    Un shard par produit, ou un par produit × modèle s'il y a plus de
+    processus que de produits. La ligne parent reste dans le premier shard du produit.
+    """
+    if jobs > len(specs_client):
+        return [
+            (product_sku, [model], i == 0)
+            for product_sku in specs_client
+            for i, model in enumerate(models)
+        ]
+    return [(product_sku, list(models), True) for product_sku in specs_client]
+
+
+def _write_shard(func: ShardFunc, product_sku: str, specs: dict, models: List[str],
+                 with_parent: bool, shard_path: str) -> str:
+    lines = iter(func(product_sku, specs, models, with_parent))
+    with open(shard_path, "w", encoding="utf-8", newline="") as f:
+        while True:
+            block = "".join(islice(lines, BLOCK_SIZE))
+            if not block:
+                break
+            f.write(block)
+    return shard_path
+
+
+def generate_sharded(output_path, header_line: str, func: ShardFunc,
+                     specs_client: Dict[str, dict], models: List[str], jobs: int) -> int:
+    """Génère `output_path` avec `jobs` processus. Renvoie le nombre de shards."""
+    shards = plan_shards(specs_client, models, jobs)
+    output_path = Path(output_path)
+
+    with tempfile.TemporaryDirectory(prefix=".shards-", dir=output_path.parent) as tmp_dir:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(_write_shard, func, product_sku, specs_client[product_sku], shard_models,
+                            with_parent, os.path.join(tmp_dir, f"{i:06d}.csv"))
+                for i, (product_sku, shard_models, with_parent) in enumerate(shards)
+            ]
+            # Fusion dans l'ordre des specs, quel que soit l'ordre de fin des processus
+            with open_output(output_path) as out:
+                out.write(header_line)
+                out.flush()
+                for future in futures:
+                    with open(future.result(), "rb") as shard:
+                        shutil.copyfileobj(shard, out.buffer, 1 << 20)
+
+    return len(shards)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Points de reprise pour les transformations CSV longues.
+
+Une transformation lit un CSV ligne par ligne et écrit un ou plusieurs
+fichiers. Avec un Checkpoint, les sorties sont écrites dans des fichiers
+partiels voisins (`.nom.partial`) et, toutes les `every` lignes, un point de
+reprise est enregistré (`.nom.checkpoint.json`) :
+
+- la position (en octets) dans le CSV d'entrée après la dernière ligne traitée ;
+- la taille de chaque fichier partiel à ce moment-là (après fsync) ;
+- l'état en mémoire fourni par le script (compteurs, clés déjà vues...).
+
+Après un arrêt brutal, `resume=True` tronque les fichiers partiels à la taille
+enregistrée, repositionne la lecture de l'entrée et rend l'état au script.
+À la fin, les fichiers partiels remplacent les sorties d'un coup (os.replace) :
+une sortie n'est jamais à moitié écrite, même quand elle remplace l'entrée.
+
+    with Checkpoint(in_path, {"out": out_path}, resume=args.resume) as ckpt:
+        state = ckpt.state or {"count": 0}
+        writer = csv.writer(ckpt.files["out"])
+        if not ckpt.resumed:
+            writer.writerow(ckpt.header)
+        for row in ckpt.rows():
+            ...
+            writer.writerow(row)
+            ckpt.tick(lambda: state)
+
+Le point de reprise n'est utilisé que si le CSV d'entrée n'a pas changé
+(taille, mtime et hash du début du fichier).
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from csv_stream import ENCODING, open_output
+from instrumentation import timed_rows
+
+CHECKPOINT_VERSION = 1
+DEFAULT_EVERY = 100000
+
+# Octets du début de l'entrée inclus dans son empreinte
+FINGERPRINT_HEAD = 1 << 16
+
+
+def input_fingerprint(path) -> dict:
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        head = hashlib.blake2b(f.read(FINGERPRINT_HEAD), digest_size=16).hexdigest()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "head": head}
+
+
+class Checkpoint:
+    """Sorties partielles et points de reprise d'une transformation CSV."""
+
+    def __init__(self, in_path, outputs: Dict[str, Optional[Path]], resume: bool = False,
+                 every: int = DEFAULT_EVERY, encoding: str = ENCODING,
+                 encodings: Optional[Dict[str, str]] = None):
+        """
+        `outputs` : nom -> chemin final. Un chemin None désigne un fichier de
+        travail (repris comme les autres, supprimé à la fin). `encodings`
+        remplace `encoding` pour certaines sorties (ex. "utf-8" pour un JSON Lines).
+        """
+        self.in_path = Path(in_path)
+        self.outputs = dict(outputs)
+        self.every = every
+        self.encoding = encoding
+        self.encodings = encodings or {}
+        self.resume = resume
+        anchor = Path(next(p for p in self.outputs.values() if p is not None))
+        self.path = anchor.with_name(f".{anchor.name}.checkpoint.json")
+        self.partials = {name: anchor.with_name(f".{anchor.name}.{name}.partial") for name in self.outputs}
+
+        self.header: List[str] = []
+        self.files: Dict[str, io.TextIOWrapper] = {}
+        self.state: Optional[dict] = None
+        self.resumed = False
+        self.in_offset = 0
+        self.rows_done = 0
+        self.saves = 0
+        self._fingerprint: dict = {}
+
+    # --- Ouverture / fermeture ------------------------------------------------
+
+    def __enter__(self) -> "Checkpoint":
+        self._fingerprint = input_fingerprint(self.in_path)
+        with open(self.in_path, "r", encoding=self.encoding, newline="") as f:
+            self.header = next(csv.reader(f), [])
+
+        saved = self._load() if self.resume else None
+        offsets = saved["outputs"] if saved else {}
+        if saved:
+            self.resumed = True
+            self.state = saved["state"]
+            self.in_offset = saved["in_offset"]
+            self.rows_done = saved["rows_done"]
+
+        for name, partial in self.partials.items():
+            raw = open(partial, "r+b" if saved else "w+b")
+            if saved:
+                raw.truncate(offsets[name])
+                raw.seek(offsets[name])
+            # À une position non nulle, utf-8-sig n'écrit pas de nouveau BOM
+            encoding = self.encodings.get(name, self.encoding)
+            self.files[name] = io.TextIOWrapper(raw, encoding=encoding, newline="")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for f in self.files.values():
+            f.close()
+        if exc_type is not None:
+            # Les fichiers partiels et le dernier point de reprise restent pour --resume
+            return
+        for name, partial in self.partials.items():
+            if self.outputs[name] is None:
+                partial.unlink()
+            else:
+                os.replace(partial, self.outputs[name])
+        if self.path.exists():
+            self.path.unlink()
+
+    def _load(self) -> Optional[dict]:
+        if not self.path.exists():
+            return None
+        saved = json.loads(self.path.read_text(encoding="utf-8"))
+        if (saved.get("version") != CHECKPOINT_VERSION
+                or saved.get("input") != self._fingerprint
+                or set(saved.get("outputs", {})) != set(self.partials)
+                or not all(p.exists() and p.stat().st_size >= saved["outputs"][n]
+                           for n, p in self.partials.items())):
+            return None
+        return saved
+
+    # --- Lecture de l'entrée --------------------------------------------------
+
+    def rows(self) -> Iterator[List[str]]:
+        """Lignes de données à partir du point de reprise ; in_offset suit la lecture."""
+        with open(self.in_path, "rb") as f:
+            if self.in_offset:
+                f.seek(self.in_offset)
+            else:
+                self.in_offset = len(f.readline())  # en-tête déjà lu
+            yield from timed_rows("read", csv.reader(self._lines(f)))
+
+    def _lines(self, f) -> Iterator[str]:
+        # csv.reader ne lit pas d'avance : quand il rend une ligne, in_offset est juste après elle
+        for raw in f:
+            self.in_offset += len(raw)
+            yield raw.decode("utf-8")
+
+    # --- Points de reprise ----------------------------------------------------
+
+    def save(self, state: dict) -> None:
+        """Enregistre un point de reprise (sorties sur disque, puis position et état)."""
+        offsets = {}
+        for name, f in self.files.items():
+            f.flush()
+            os.fsync(f.buffer.fileno())
+            offsets[name] = f.buffer.tell()
+        with open_output(self.path, encoding="utf-8") as out:
+            json.dump({
+                "version": CHECKPOINT_VERSION,
+                "input": self._fingerprint,
+                "in_offset": self.in_offset,
+                "rows_done": self.rows_done,
+                "outputs": offsets,
+                "state": state,
+            }, out)
+        self.saves += 1
+
+    def tick(self, get_state: Callable[[], dict]) -> None:
+        """À appeler après chaque ligne traitée ; enregistre un point de reprise toutes les `every` lignes."""
+        self.rows_done += 1
+        if self.rows_done % self.every == 0:
+            self.save(get_state())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Cache en colonnes des exports CSV, rangé à côté de chaque export.
+
+Les vérificateurs n'ont besoin que de quelques colonnes (Type, SKU, Parent,
+attributs, Images) mais relisaient tout le CSV à chaque lancement, Description
+comprise. La première lecture d'une colonne la range dans un dossier voisin
+`.nom.csv.columns/` ; les lancements suivants ne lisent que les colonnes
+demandées, par mmap :
+
+- colonne à peu de valeurs distinctes (Type, Parent, modèle, couleur...) :
+  dictionnaire des valeurs + tableau de codes (`cN.codes`, `cN.dict.json`) ;
+- autre colonne : valeurs UTF-8 séparées par un octet nul (`cN.data`) et
+  tableau des positions de début (`cN.offs`, une de plus que de lignes : la
+  longueur d'une valeur se déduit de deux positions successives).
+
+Le cache est invalidé quand le CSV change : taille et mtime, puis hash du
+contenu si seul le mtime diffère (fichier touché mais identique).
+
+    with open_columns(csv_path, ["Type", "SKU", "Parent", "Images"]) as (header, rows):
+        for view in Schema(header).views(rows):
+            ...
+
+`header` ne contient que les colonnes demandées présentes dans le CSV : les
+vues d'un Schema construit dessus se comportent comme sur le CSV complet pour
+ces colonnes. load_columns renvoie les mêmes colonnes sous forme de listes,
+pour un traitement colonne par colonne. Avec la variable d'environnement EXPORTS_NO_COLUMN_CACHE=1, le
+CSV est lu directement.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from csv_stream import ENCODING, open_csv, open_output
+from instrumentation import stage, timed_rows
+
+CACHE_VERSION = 1
+NO_CACHE_ENV = "EXPORTS_NO_COLUMN_CACHE"
+
+# Au-delà de ce nombre de valeurs distinctes, une colonne n'est pas codée par dictionnaire
+DICT_LIMIT = 1 << 16
+# Lignes décodées d'un coup lors du parcours d'une colonne non codée
+READ_BATCH = 1 << 14
+
+SEPARATOR = b"\0"
+
+
+def cache_dir(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(f".{csv_path.name}.columns")
+
+
+def file_hash(path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _map(path: Path) -> Optional[mmap.mmap]:
+    """mmap en lecture seule, ou None pour un fichier vide (que mmap refuse)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_atomic(path: Path, data) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class Column:
+    """Colonne en cache, lue par mmap ; se parcourt et s'indexe comme une liste de str."""
+
+    def __init__(self, directory: Path, meta: dict):
+        self.kind = meta["kind"]
+        self.rows = meta["rows"]
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        base = directory / meta["file"]
+        if self.kind == "dict":
+            self.values: List[str] = json.loads(base.with_suffix(".dict.json").read_text(encoding="utf-8"))
+            self.codes = self._array(base.with_suffix(".codes"), meta["typecode"])
+        else:
+            self.offsets = self._array(base.with_suffix(".offs"), "Q")
+            self.data = _map(base.with_suffix(".data"))
+            if self.data is not None:
+                self._maps.append(self.data)
+
+    def _array(self, path: Path, typecode: str) -> memoryview:
+        mm = _map(path)
+        if mm is None:
+            return memoryview(b"").cast(typecode)
+        self._maps.append(mm)
+        raw = memoryview(mm)
+        self._views.append(raw)
+        view = raw.cast(typecode)
+        self._views.append(view)
+        return view
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        for mm in self._maps:
+            mm.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, i: int) -> str:
+        if self.kind == "dict":
+            return self.values[self.codes[i]]
+        start, end = self.offsets[i], self.offsets[i + 1] - 1
+        return self.data[start:end].decode("utf-8") if end > start else ""
+
+    def __iter__(self) -> Iterator[str]:
+        if self.kind == "dict":
+            values = self.values
+            return (values[code] for code in self.codes)
+        return self._iter_data()
+
+    def tolist(self) -> List[str]:
+        if self.kind == "dict":
+            return list(map(self.values.__getitem__, self.codes))
+        return list(self._iter_data())
+
+    def _iter_data(self) -> Iterator[str]:
+        offsets, data = self.offsets, self.data
+        for first in range(0, self.rows, READ_BATCH):
+            last = min(self.rows, first + READ_BATCH)
+            chunk = data[offsets[first]:offsets[last] - 1].decode("utf-8")
+            yield from chunk.split("\0")
+
+
+class _ColumnBuilder:
+    """Accumule une colonne pendant la lecture du CSV et choisit son codage à la fin."""
+
+    def __init__(self, directory: Path, file: str):
+        self.base = directory / file
+        self.file = file
+        self.data = open(self.base.with_suffix(".data"), "wb")
+        self.offsets = array("Q", [0])
+        self.position = 0
+        self.codes: Optional[array] = array("L")
+        self.lookup: Dict[str, int] = {}
+
+    def add(self, value: str) -> None:
+        encoded = value.encode("utf-8")
+        if SEPARATOR in encoded:
+            raise ValueError("octet nul dans une valeur")
+        self.data.write(encoded + SEPARATOR)
+        self.position += len(encoded) + 1
+        self.offsets.append(self.position)
+        if self.codes is not None:
+            code = self.lookup.setdefault(value, len(self.lookup))
+            if len(self.lookup) > DICT_LIMIT:
+                self.codes = None
+                self.lookup = {}
+            else:
+                self.codes.append(code)
+
+    def finish(self) -> dict:
+        self.data.close()
+        rows = len(self.offsets) - 1
+        if self.codes is not None and len(self.lookup) * 2 <= max(rows, 1):
+            typecode = "B" if len(self.lookup) <= 1 << 8 else "H"
+            _write_atomic(self.base.with_suffix(".codes"), array(typecode, self.codes).tobytes())
+            _write_atomic(self.base.with_suffix(".dict.json"),
+                          json.dumps(list(self.lookup), ensure_ascii=False).encode("utf-8"))
+            self.base.with_suffix(".data").unlink()
+            return {"file": self.file, "kind": "dict", "typecode": typecode, "rows": rows}
+        _write_atomic(self.base.with_suffix(".offs"), self.offsets.tobytes())
+        return {"file": self.file, "kind": "raw", "rows": rows}
+
+
+class ColumnCache:
+    """Dossier de cache d'un CSV : une entrée par colonne déjà extraite."""
+
+    def __init__(self, csv_path):
+        self.csv_path = Path(csv_path)
+        self.dir = cache_dir(self.csv_path)
+        self.meta_path = self.dir / "meta.json"
+        self.built: List[str] = []  # colonnes extraites du CSV par ce lancement
+
+    def _source(self) -> dict:
+        st = os.stat(self.csv_path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _load_meta(self) -> Optional[dict]:
+        """Métadonnées si le cache correspond toujours au CSV, sinon None."""
+        if not self.meta_path.exists():
+            return None
+        meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        if meta.get("version") != CACHE_VERSION:
+            return None
+        source = self._source()
+        cached = meta["source"]
+        if cached["size"] != source["size"]:
+            return None
+        if cached["mtime_ns"] != source["mtime_ns"]:
+            if file_hash(self.csv_path) != cached["hash"]:
+                return None
+            cached["mtime_ns"] = source["mtime_ns"]  # même contenu : le cache reste bon
+            self._save_meta(meta)
+        return meta
+
+    def _save_meta(self, meta: dict) -> None:
+        with open_output(self.meta_path, encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def load(self, columns: Sequence[str]) -> Tuple[List[str], Dict[str, Column]]:
+        """(colonnes présentes dans le CSV parmi `columns`, colonne -> Column) ; extrait celles qui manquent."""
+        meta = self._load_meta()
+        if meta is None:
+            if self.dir.exists():
+                shutil.rmtree(self.dir)
+            self.dir.mkdir()
+            source = self._source()
+            source["hash"] = file_hash(self.csv_path)
+            with open_csv(self.csv_path, ENCODING) as (header, _):
+                pass
+            meta = {"version": CACHE_VERSION, "source": source, "header": header, "columns": {}}
+
+        header = meta["header"]
+        present = [c for c in dict.fromkeys(columns) if c in header]
+        missing = [c for c in present if c not in meta["columns"]]
+        if missing:
+            meta["columns"].update(self._build(header, missing))
+            self._save_meta(meta)
+            self.built = missing
+        return present, {c: Column(self.dir, meta["columns"][c]) for c in present}
+
+    def _build(self, header: List[str], columns: List[str]) -> Dict[str, dict]:
+        """Extrait `columns` du CSV en une lecture."""
+        indexes = [header.index(c) for c in columns]  # première occurrence, comme Schema
+        builders = [_ColumnBuilder(self.dir, f"c{i}") for i in indexes]
+        try:
+            with open_csv(self.csv_path, ENCODING) as (_, rows):
+                for row in rows:
+                    width = len(row)
+                    for idx, builder in zip(indexes, builders):
+                        builder.add(row[idx] if idx < width else "")
+        except ValueError:
+            for builder in builders:
+                builder.data.close()
+            raise
+        return {c: builder.finish() for c, builder in zip(columns, builders)}
+
+
+@contextmanager
+def open_columns(csv_path, columns: Sequence[str]) -> Iterator[Tuple[List[str], Iterator[List[str]]]]:
+    """
+    Comme csv_stream.open_csv, limité à `columns` : renvoie (en-tête réduit,
+    itérateur des lignes réduites), lues depuis le cache quand c'est possible.
+    """
+    if os.environ.get(NO_CACHE_ENV):
+        yield from _read_csv(csv_path, columns)
+        return
+    try:
+        present, loaded = ColumnCache(csv_path).load(columns)
+    except (OSError, ValueError):
+        # Dossier non inscriptible, valeur non stockable... : lecture directe du CSV
+        yield from _read_csv(csv_path, columns)
+        return
+    try:
+        yield present, timed_rows("read", (list(values) for values in zip(*(loaded[c] for c in present))))
+    finally:
+        for column in loaded.values():
+            column.close()
+
+
+def load_columns(csv_path, columns: Sequence[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Comme open_columns, mais par colonne : renvoie (en-tête réduit, colonne ->
+    liste des valeurs) sans reconstituer les lignes, pour les scripts qui
+    traitent une colonne entière d'un coup.
+    """
+    if not os.environ.get(NO_CACHE_ENV):
+        try:
+            present, loaded = ColumnCache(csv_path).load(columns)
+        except (OSError, ValueError):
+            pass  # lecture directe du CSV, comme open_columns
+        else:
+            try:
+                with stage("read", rows=loaded[present[0]].rows if present else 0):
+                    return present, {c: loaded[c].tolist() for c in present}
+            finally:
+                for column in loaded.values():
+                    column.close()
+    reader = _read_csv(csv_path, columns)
+    present, rows = next(reader)
+    try:
+        values = list(zip(*timed_rows("read", rows))) or [()] * len(present)
+    finally:
+        reader.close()
+    return present, {c: list(v) for c, v in zip(present, values)}
+
+
+def _read_csv(csv_path, columns: Sequence[str]):
+    with open_csv(csv_path, ENCODING) as (header, rows):
+        present = [c for c in dict.fromkeys(columns) if c in header]
+        indexes = [header.index(c) for c in present]
+        yield present, ([row[i] if i < len(row) else "" for i in indexes] for row in rows)
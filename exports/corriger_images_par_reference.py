@@ -2,12 +2,29 @@
 """
 Script pour corriger les images dans le CSV : chaque référence doit utiliser son image de base.
 Exemple : toutes les variations avec référence JOJO1015-24 doivent utiliser JOJO1015-24.JPG
+
+Usage:
+  python corriger_images_par_reference.py [--resume] [--checkpoint-every 100000]
+
+Le fichier est réécrit en place par une sortie partielle qui ne remplace
+l'original qu'à la fin ; après une interruption, --resume reprend au dernier
+point de reprise (voir checkpoint.py).
+
+Le détail des corrections (ligne, SKU, référence, ancienne et nouvelle image)
+est écrit dans corrections_images.jsonl ; seul un résumé est affiché.
 """
 
+import argparse
 import csv
 from pathlib import Path
 import re
 
+from checkpoint import DEFAULT_EVERY, Checkpoint
+from csv_stream import read_header
+from instrumentation import run_script, timed_writer
+from reporting import Report
+from woo_schema import Schema
+
 def extract_reference_from_sku(sku):
     """Extrait la référence depuis le SKU de la variation"""
     # Exemple: impexo-luxury-transparent--jojo1015-24--17--argent
@@ -24,87 +41,105 @@ def get_base_image_url(reference):
     base_url = "https://www.impexo.fr/product/IMPEXO-IPHONE%2017%20SERIES12-31"
     return f"{base_url}/{reference}.JPG"
 
+def make_stage(header):
+    """Étape de pipeline : chaque variation reçoit l'image de base de sa référence."""
+    schema = Schema(header)
+    schema.require("Type", "SKU", "Attribute 3 value(s)", "Images")
+    view_class = schema.view_class
+    
+    def stage(row):
+        view = view_class(row)
+        if view.is_variation:
+            ref = extract_reference_from_sku(view.sku) or view.ref.strip()
+            if ref:
+                view.images = get_base_image_url(ref)
+        return row
+    
+    return stage
+
 def main():
+    parser = argparse.ArgumentParser(description="Donne à chaque variation l'image de base de sa référence.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre au dernier point de reprise après une interruption")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_EVERY, metavar="LIGNES",
+                        help="Lignes traitées entre deux points de reprise")
+    args = parser.parse_args()
+
     csv_path = Path(__file__).parent / "woocommerce_import_corrige_final.csv"
     
     if not csv_path.exists():
         print(f"ERREUR: Fichier introuvable : {csv_path}")
         return
     
-    # Lire le CSV
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    header = read_header(csv_path)
     
-    if not rows:
+    if not header:
         print("ERREUR: CSV vide")
         return
     
-    header = rows[0]
-    data_rows = rows[1:]
-    
-    # Indices des colonnes
-    type_idx = header.index("Type")
-    sku_idx = header.index("SKU")
-    attr3_name_idx = header.index("Attribute 3 name")
-    attr3_value_idx = header.index("Attribute 3 value(s)")
-    images_idx = header.index("Images")
+    # Colonnes résolues une fois pour tout le fichier
+    schema = Schema(header)
+    schema.require("Type", "SKU", "Attribute 3 name", "Attribute 3 value(s)", "Images")
     
     print("Correction des images par reference...")
     print("=" * 80)
     
-    corrections = []
+    details_path = csv_path.parent / "corrections_images.jsonl"
     
-    for i, row in enumerate(data_rows, start=2):  # start=2 car ligne 1 = header
-        if row[type_idx].lower() == "variation":
-            sku = row[sku_idx]
-            ref_attr = row[attr3_value_idx] if attr3_value_idx < len(row) else ""
-            current_image = row[images_idx] if images_idx < len(row) else ""
-            
-            # Extraire la référence depuis le SKU ou l'attribut
-            ref_from_sku = extract_reference_from_sku(sku)
-            ref = ref_from_sku or ref_attr.strip()
-            
-            if ref:
-                # Générer l'URL de l'image de base
-                base_image_url = get_base_image_url(ref)
+    # Le fichier est réécrit en place : la sortie partielle ne remplace l'original qu'à la fin ;
+    # le détail des corrections est repris avec lui
+    outputs = {"csv": csv_path, "details": details_path}
+    with Checkpoint(csv_path, outputs, resume=args.resume, every=args.checkpoint_every,
+                    encodings={"details": "utf-8"}) as ckpt:
+        state = ckpt.state or {"data_count": 0, "report": None}
+        report = Report(ckpt.files["details"], details_path=details_path)
+        if ckpt.resumed:
+            report.restore(state["report"])
+            print(f"Reprise apres {state['data_count']} lignes ({report.total('correction')} corrections deja faites)")
+            print()
+        writer = timed_writer("write", csv.writer(ckpt.files["csv"]))
+        if not ckpt.resumed:
+            writer.writerow(header)
+        start = state["data_count"] + 2  # +2 car ligne 1 = header
+        for i, view in enumerate(schema.views(ckpt.rows()), start=start):
+            state["data_count"] += 1
+            if view.is_variation:
+                sku = view.sku
+                current_image = view.images
                 
-                if base_image_url and current_image != base_image_url:
-                    old_image = current_image.split('/')[-1] if current_image else 'Pas d\'image'
-                    new_image = base_image_url.split('/')[-1]
-                    
-                    print(f"Ligne {i}: {sku}")
-                    print(f"  Reference: {ref}")
-                    print(f"  Ancienne image: {old_image}")
-                    print(f"  Nouvelle image: {new_image}")
-                    print()
+                # Extraire la référence depuis le SKU ou l'attribut
+                ref_from_sku = extract_reference_from_sku(sku)
+                ref = ref_from_sku or view.ref.strip()
+                
+                if ref:
+                    # Générer l'URL de l'image de base
+                    base_image_url = get_base_image_url(ref)
                     
-                    # Corriger l'image
-                    row[images_idx] = base_image_url
-                    corrections.append({
-                        'line': i,
-                        'sku': sku,
-                        'ref': ref,
-                        'old': old_image,
-                        'new': new_image
-                    })
+                    if base_image_url and current_image != base_image_url:
+                        old_image = current_image.split('/')[-1] if current_image else 'Pas d\'image'
+                        new_image = base_image_url.split('/')[-1]
+                        
+                        report.add("correction", f"Ligne {i}: {sku} ({ref}) {old_image} -> {new_image}",
+                                   line=i, sku=sku, reference=ref, old=current_image, new=base_image_url)
+                        
+                        # Corriger l'image
+                        view.images = base_image_url
+            writer.writerow(view.row)
+            ckpt.tick(lambda: dict(state, report=report.state()))
     
+    corrections = report.total("correction")
+    data_count = state["data_count"]
+    print(f"{corrections} corrections effectuees")
+    report.print_samples("correction")
+    print(f"  Detail : {details_path}")
     print("=" * 80)
-    print(f"{len(corrections)} corrections effectuees")
     print()
     
-    # Écrire le CSV corrigé
-    output_rows = [header] + data_rows
-    
-    with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(output_rows)
-    
     print(f"OK: CSV corrige sauvegarde : {csv_path}")
-    print(f"  - {len(data_rows)} lignes traitees")
-    print(f"  - {len(corrections)} images corrigees")
+    print(f"  - {data_count} lignes traitees")
+    print(f"  - {corrections} images corrigees")
     print()
     print("Vous pouvez maintenant reimporter le fichier dans WooCommerce.")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
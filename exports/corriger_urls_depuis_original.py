@@ -4,11 +4,17 @@ Reprend le fichier ORIGINAL woocommerce_import.csv qui a la BONNE image par vari
 et corrige uniquement les URLs (domaine + chemin vers le bon dossier).
 """
 
-import csv
 from pathlib import Path
 
+from csv_stream import open_csv, open_csv_writer, read_header
+from instrumentation import run_script
+from url_rewrite import Rebase, RewriteEngine
+
 BASE_URL = "https://www.impexo.fr/product/IMPEXO-IPHONE%2017%20SERIES12-31"
 
+# Toute URL (domaine et dossier quelconques) garde seulement son nom de fichier (ex: JOJO1015-1P.JPG)
+RULES = [Rebase("", BASE_URL, strip=True)]
+
 def main():
     in_path = Path(__file__).parent / "woocommerce_import.csv"
     out_path = Path(__file__).parent / "woocommerce_import_images_correctes.csv"
@@ -17,31 +23,25 @@ def main():
         print(f"ERREUR: Fichier introuvable : {in_path}")
         return
     
-    with open(in_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    header = read_header(in_path)
     
-    if not rows:
+    if not header:
         print("ERREUR: CSV vide")
         return
     
-    header = rows[0]
     try:
         images_idx = header.index("Images")
     except ValueError:
         print("ERREUR: Colonne Images introuvable")
         return
     
-    for row in rows[1:]:
-        if images_idx < len(row) and row[images_idx]:
-            url = row[images_idx].strip()
-            # Extraire le nom du fichier (ex: JOJO1015-1P.JPG)
-            filename = url.split("/")[-1]
-            row[images_idx] = f"{BASE_URL}/{filename}"
-    
-    with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
+    rewrite = RewriteEngine(RULES).rewrite
+    with open_csv_writer(out_path, header) as writer:
+        with open_csv(in_path) as (_, rows):
+            for row in rows:
+                if images_idx < len(row) and row[images_idx]:
+                    row[images_idx] = rewrite(row[images_idx])
+                writer.writerow(row)
     
     print("OK: Fichier genere avec les BONNES images par variation")
     print(f"  Source: {in_path}")
@@ -49,4 +49,4 @@ def main():
     print("  Les images sont celles du fichier original (une image specifique par variation).")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
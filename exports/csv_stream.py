@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Lecture / écriture en flux des CSV WooCommerce.
+
+Les scripts de exports/ passent par ce module au lieu de `list(csv.reader(f))` :
+les lignes circulent une par une de l'entrée vers la sortie, la mémoire ne
+dépend donc plus de la taille du catalogue. Le fichier est lu avec
+`newline=""` pour que les Descriptions entre guillemets sur plusieurs lignes
+restent intactes (ce que `splitlines()` cassait).
+"""
+
+import csv
+import io
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from instrumentation import timed_rows, timed_writer
+
+ENCODING = "utf-8-sig"
+# Fin de ligne écrite par csv.writer (dialecte par défaut)
+LINE_END = csv.get_dialect("excel").lineterminator
+WRITE_BUFFER = 1 << 20
+
+
+@contextmanager
+def open_csv(path, encoding: str = ENCODING) -> Iterator[Tuple[List[str], Iterator[List[str]]]]:
+    """
+    Ouvre un CSV en lecture et renvoie (en-tête, itérateur des lignes de données).
+
+    L'en-tête vaut [] si le fichier est vide.
+    """
+    with open(path, "r", encoding=encoding, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        yield header, timed_rows("read", reader)
+
+
+def read_header(path, encoding: str = ENCODING) -> List[str]:
+    """Renvoie l'en-tête d'un CSV ([] si le fichier est vide) sans lire le reste."""
+    with open_csv(path, encoding) as (header, _):
+        return header
+
+
+@contextmanager
+def open_output(path, encoding: str = ENCODING):
+    """
+    Ouvre en écriture texte un fichier temporaire voisin de `path`.
+
+    Le fichier temporaire remplace `path` (os.replace) uniquement si le bloc se
+    termine sans erreur : un script interrompu ne laisse jamais de CSV à moitié
+    écrit, et un script peut réécrire le fichier qu'il est en train de lire
+    (à condition de fermer la lecture avant la fin du bloc).
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding=encoding, newline="", buffering=WRITE_BUFFER) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+@contextmanager
+def open_csv_writer(path, header: Optional[List[str]] = None, encoding: str = ENCODING):
+    """Ouvre un writer CSV sur `path`, écrit de façon atomique (voir open_output)."""
+    with open_output(path, encoding) as f:
+        writer = csv.writer(f)
+        if header is not None:
+            writer.writerow(header)
+        yield timed_writer("write", writer)
+
+
+def format_csv_row(values: List[str]) -> str:
+    """Sérialise une ligne exactement comme csv.writer (fin de ligne comprise)."""
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+
+def iter_csv_lines(rows: Iterable[List[str]]) -> Iterator[str]:
+    """Sérialise des lignes une par une comme csv.writer, en réutilisant le même tampon."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def format_csv_field(value: str) -> str:
+    """Sérialise un champ isolé comme csv.writer le ferait au milieu d'une ligne."""
+    # Un champ vide seul sur sa ligne serait écrit "" : on ajoute un voisin puis on le retire
+    return format_csv_row([value, ""])[:-len("," + LINE_END)]
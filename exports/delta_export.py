@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Export incrémental : seules les lignes nouvelles ou modifiées depuis la dernière exécution.
+
+Un fichier d'état (JSON) garde, pour chaque produit parent, le hash de ses
+specs et le hash de chaque ligne (parent et variations) indexé par SKU.
+À l'exécution suivante :
+
+- un produit dont le hash de specs n'a pas changé est repris tel quel,
+  sans regénérer ses variations ;
+- les autres sont regénérés et chaque ligne est comparée à son hash précédent ;
+- les lignes nouvelles ou modifiées vont dans le CSV delta, les SKU disparus
+  dans la liste des suppressions.
+
+L'import WooCommerce ne touche alors que ce qui a changé.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from csv_stream import open_csv_writer, open_output
+
+STATE_VERSION = 1
+
+# (sku parent, hash des specs, fonction qui génère les lignes du produit, parent en premier)
+ProductSource = Tuple[str, str, Callable[[], Iterable[List[str]]]]
+
+
+def content_hash(*parts: str) -> str:
+    """Hash court et stable d'une suite de chaînes."""
+    h = hashlib.blake2b(digest_size=10)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def load_state(path) -> Dict[str, dict]:
+    """État précédent {sku parent: {"spec": hash, "rows": {sku: hash}}}, vide si absent ou périmé."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    state = json.loads(path.read_text(encoding="utf-8"))
+    if state.get("version") != STATE_VERSION:
+        return {}
+    return state["products"]
+
+
+def save_state(path, products: Dict[str, dict]) -> None:
+    with open_output(path, encoding="utf-8") as f:
+        json.dump({"version": STATE_VERSION, "products": products}, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def export_delta(sources: Iterable[ProductSource], previous: Dict[str, dict], header: List[str],
+                 delta_path, removed_path) -> Tuple[Dict[str, dict], Dict[str, int]]:
+    """
+    Écrit le CSV delta et la liste des SKU supprimés.
+
+    Renvoie le nouvel état et des compteurs (added, changed, unchanged, removed, products_skipped).
+    """
+    stats = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0, "products_skipped": 0}
+    state: Dict[str, dict] = {}
+    removed: List[str] = []
+    sku_idx = header.index("SKU")
+
+    with open_csv_writer(delta_path, header) as writer:
+        for parent_sku, spec_hash, make_rows in sources:
+            before = previous.get(parent_sku)
+            if before is not None and before["spec"] == spec_hash:
+                state[parent_sku] = before
+                stats["unchanged"] += len(before["rows"])
+                stats["products_skipped"] += 1
+                continue
+
+            old_rows = before["rows"] if before is not None else {}
+            new_rows: Dict[str, str] = {}
+            for row in make_rows():
+                sku = row[sku_idx]
+                digest = content_hash(*row)
+                new_rows[sku] = digest
+                old = old_rows.get(sku)
+                if old == digest:
+                    stats["unchanged"] += 1
+                    continue
+                stats["added" if old is None else "changed"] += 1
+                writer.writerow(row)
+
+            removed.extend(sku for sku in old_rows if sku not in new_rows)
+            state[parent_sku] = {"spec": spec_hash, "rows": new_rows}
+
+    # Produits retirés des specs : toutes leurs lignes disparaissent
+    for parent_sku, before in previous.items():
+        if parent_sku not in state:
+            removed.extend(before["rows"])
+
+    stats["removed"] = len(removed)
+    with open_output(removed_path, encoding="utf-8") as f:
+        for sku in removed:
+            f.write(sku + "\n")
+
+    return state, stats
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Compare deux exports WooCommerce ligne à ligne, par SKU.
+
+Le rapport (CSV) liste les lignes ajoutées, supprimées et, pour les lignes
+modifiées, une ligne par colonne qui a changé avec l'ancienne et la nouvelle
+valeur. Les colonnes sont comparées par nom : deux fichiers dont l'ordre des
+colonnes diffère restent comparables, une colonne présente d'un seul côté se
+lit comme "" de l'autre.
+
+Deux stratégies, choisies d'après la taille de l'ancien fichier :
+
+- jointure par hachage : l'ancien fichier est chargé en mémoire (SKU -> lignes),
+  le nouveau est lu en flux ; rapport dans l'ordre du nouveau fichier, puis
+  les suppressions dans l'ordre de l'ancien ;
+- tri externe : chaque fichier est découpé en paquets triés par SKU écrits sur
+  disque, puis les paquets sont fusionnés (heapq.merge) et les deux flux triés
+  sont comparés en un seul passage ; rapport dans l'ordre des SKU. La mémoire
+  est bornée par --memory-mb quelle que soit la taille des fichiers.
+
+Un SKU présent plusieurs fois dans un fichier est apparié dans l'ordre
+d'apparition (1re avec 1re, 2e avec 2e...).
+
+Usage:
+  python diff_exports.py ANCIEN.csv NOUVEAU.csv [--report diff.csv]
+                         [--memory-mb 256] [--strategy auto|hash|sort]
+"""
+
+import argparse
+import csv
+import heapq
+import os
+import tempfile
+from collections import Counter
+from contextlib import ExitStack
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from csv_stream import open_csv, open_csv_writer, read_header
+from instrumentation import run_script
+
+REPORT_HEADER = ["Statut", "SKU", "Colonne", "Avant", "Apres"]
+ADDED, REMOVED, CHANGED = "ajoute", "supprime", "modifie"
+
+# Coût mémoire approximatif d'un champ (objet str + pointeur de liste), en plus de sa longueur
+FIELD_OVERHEAD = 64
+# Nombre maximal de paquets fusionnés d'un coup (descripteurs de fichiers ouverts)
+MERGE_FAN_IN = 64
+
+Group = Tuple[str, List[List[str]]]
+
+
+class ExportDiff:
+    """Compare deux CSV sur les colonnes communes par nom et accumule les compteurs."""
+
+    def __init__(self, old_header: List[str], new_header: List[str]):
+        for name, header in (("ancien", old_header), ("nouveau", new_header)):
+            if "SKU" not in header:
+                raise ValueError(f"Colonne SKU absente du fichier {name}")
+        # Colonnes du nouveau fichier, puis celles qui n'existent que dans l'ancien
+        self.columns = list(dict.fromkeys(new_header + old_header))
+        self.only_old = [c for c in old_header if c not in new_header]
+        self.only_new = [c for c in new_header if c not in old_header]
+        self.sku_pos = self.columns.index("SKU")
+        self.old_indexes = self._indexes(old_header)
+        self.new_indexes = self._indexes(new_header)
+        self.strategy = ""
+        self._runs_created = 0
+        self.counts = Counter()
+        self.changed_columns = Counter()
+
+    def _indexes(self, header: List[str]) -> List[int]:
+        first = {}
+        for i, col in enumerate(header):
+            first.setdefault(col, i)
+        return [first.get(col, -1) for col in self.columns]
+
+    @staticmethod
+    def project(row: List[str], indexes: List[int]) -> List[str]:
+        """Ligne réordonnée selon les colonnes comparées ("" pour les absentes)."""
+        n = len(row)
+        return [row[i] if 0 <= i < n else "" for i in indexes]
+
+    def compare(self, sku: str, old_rows: List[List[str]], new_rows: List[List[str]], writer) -> None:
+        """Compare les occurrences d'un même SKU et écrit les lignes du rapport."""
+        columns = self.columns
+        for old, new in zip(old_rows, new_rows):
+            if old == new:
+                self.counts["unchanged"] += 1
+                continue
+            self.counts[CHANGED] += 1
+            for col, before, after in zip(columns, old, new):
+                if before != after:
+                    self.changed_columns[col] += 1
+                    writer.writerow([CHANGED, sku, col, before, after])
+        for _ in new_rows[len(old_rows):]:
+            self.counts[ADDED] += 1
+            writer.writerow([ADDED, sku, "", "", ""])
+        for _ in old_rows[len(new_rows):]:
+            self.counts[REMOVED] += 1
+            writer.writerow([REMOVED, sku, "", "", ""])
+
+    # --- Jointure par hachage -------------------------------------------------
+
+    def hash_join(self, old_path, new_path, writer) -> None:
+        old_by_sku: Dict[str, List[List[str]]] = {}
+        sku_pos = self.sku_pos
+        with open_csv(old_path) as (_, rows):
+            for row in rows:
+                row = self.project(row, self.old_indexes)
+                old_by_sku.setdefault(row[sku_pos], []).append(row)
+
+        seen = Counter()
+        with open_csv(new_path) as (_, rows):
+            for row in rows:
+                row = self.project(row, self.new_indexes)
+                sku = row[sku_pos]
+                # Appariement immédiat avec l'occurrence de même rang dans l'ancien fichier
+                rank = seen[sku]
+                seen[sku] = rank + 1
+                olds = old_by_sku.get(sku, ())
+                self.compare(sku, [olds[rank]] if rank < len(olds) else [], [row], writer)
+
+        for sku, olds in old_by_sku.items():
+            extra = olds[seen[sku]:]
+            if extra:
+                self.compare(sku, extra, [], writer)
+
+    # --- Tri externe + fusion -------------------------------------------------
+
+    def _sorted_runs(self, path, indexes: List[int], tmp_dir: str, memory_bytes: int) -> List[str]:
+        """Découpe `path` en paquets triés par (SKU, rang d'origine) écrits dans tmp_dir."""
+        runs: List[str] = []
+        chunk: List[List[str]] = []
+        size = 0
+
+        def flush():
+            chunk.sort(key=self._sort_key)
+            run_path = self._run_path(tmp_dir)
+            with open(run_path, "w", encoding="utf-8", newline="") as f:
+                csv.writer(f).writerows(chunk)
+            runs.append(run_path)
+            chunk.clear()
+
+        with open_csv(path) as (_, rows):
+            for seq, row in enumerate(rows):
+                row = self.project(row, indexes)
+                row.insert(0, str(seq))  # garde l'ordre d'origine des SKU en double
+                chunk.append(row)
+                size += sum(map(len, row)) + FIELD_OVERHEAD * len(row)
+                if size >= memory_bytes:
+                    flush()
+                    size = 0
+        if chunk or not runs:
+            flush()
+        return runs
+
+    def _merge_runs(self, runs: List[str], tmp_dir: str, stack: ExitStack) -> Iterator[List[str]]:
+        """Fusionne les paquets triés ; au-delà de MERGE_FAN_IN, fusion en plusieurs niveaux."""
+        key = self._sort_key
+        while len(runs) > MERGE_FAN_IN:
+            batch, runs = runs[:MERGE_FAN_IN], runs[MERGE_FAN_IN:]
+            run_path = self._run_path(tmp_dir)
+            with ExitStack() as files, open(run_path, "w", encoding="utf-8", newline="") as out:
+                readers = [csv.reader(files.enter_context(open(p, encoding="utf-8", newline=""))) for p in batch]
+                csv.writer(out).writerows(heapq.merge(*readers, key=key))
+            for p in batch:
+                os.unlink(p)
+            runs.append(run_path)
+        readers = [csv.reader(stack.enter_context(open(p, encoding="utf-8", newline=""))) for p in runs]
+        return heapq.merge(*readers, key=key)
+
+    def _run_path(self, tmp_dir: str) -> str:
+        self._runs_created += 1
+        return os.path.join(tmp_dir, f"run{self._runs_created:06d}.csv")
+
+    def _sort_key(self, row: List[str]):
+        return row[self.sku_pos + 1], int(row[0])
+
+    def _groups(self, merged: Iterator[List[str]]) -> Iterator[Group]:
+        sku_pos = self.sku_pos + 1
+        for sku, rows in groupby(merged, key=lambda r: r[sku_pos]):
+            yield sku, [row[1:] for row in rows]
+
+    def sort_merge(self, old_path, new_path, writer, memory_bytes: int) -> None:
+        # Chaque fichier dispose de la moitié du budget pour ses paquets
+        with tempfile.TemporaryDirectory(prefix=".diff-", dir=Path(new_path).parent) as tmp_dir, ExitStack() as stack:
+            old_dir = os.path.join(tmp_dir, "ancien")
+            new_dir = os.path.join(tmp_dir, "nouveau")
+            os.mkdir(old_dir)
+            os.mkdir(new_dir)
+            old_runs = self._sorted_runs(old_path, self.old_indexes, old_dir, memory_bytes // 2)
+            new_runs = self._sorted_runs(new_path, self.new_indexes, new_dir, memory_bytes // 2)
+            old_groups = self._groups(self._merge_runs(old_runs, old_dir, stack))
+            new_groups = self._groups(self._merge_runs(new_runs, new_dir, stack))
+
+            old = next(old_groups, None)
+            new = next(new_groups, None)
+            while old is not None or new is not None:
+                if new is None or (old is not None and old[0] < new[0]):
+                    self.compare(old[0], old[1], [], writer)
+                    old = next(old_groups, None)
+                elif old is None or new[0] < old[0]:
+                    self.compare(new[0], [], new[1], writer)
+                    new = next(new_groups, None)
+                else:
+                    self.compare(old[0], old[1], new[1], writer)
+                    old = next(old_groups, None)
+                    new = next(new_groups, None)
+
+
+def diff_exports(old_path, new_path, report_path, memory_mb: int = 256, strategy: str = "auto") -> ExportDiff:
+    """Écrit le rapport de différences et renvoie l'objet ExportDiff (compteurs)."""
+    differ = ExportDiff(read_header(old_path), read_header(new_path))
+    memory_bytes = memory_mb << 20
+    if strategy == "auto":
+        # Sur disque, un champ coûte sa longueur ; en mémoire, plusieurs fois plus
+        strategy = "hash" if os.path.getsize(old_path) * 4 <= memory_bytes else "sort"
+
+    with open_csv_writer(report_path, REPORT_HEADER) as writer:
+        if strategy == "hash":
+            differ.hash_join(old_path, new_path, writer)
+        else:
+            differ.sort_merge(old_path, new_path, writer, memory_bytes)
+    differ.strategy = strategy
+    return differ
+
+
+def main():
+    exports_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Compare deux exports WooCommerce par SKU.")
+    parser.add_argument("old", type=Path, help="Ancien CSV")
+    parser.add_argument("new", type=Path, help="Nouveau CSV")
+    parser.add_argument("--report", type=Path, default=exports_dir / "diff_exports.csv")
+    parser.add_argument("--memory-mb", type=int, default=256,
+                        help="Mémoire disponible ; au-delà, tri externe sur disque")
+    parser.add_argument("--strategy", choices=("auto", "hash", "sort"), default="auto")
+    args = parser.parse_args()
+
+    for path in (args.old, args.new):
+        if not path.exists():
+            raise SystemExit(f"ERREUR: Fichier introuvable : {path}")
+
+    try:
+        differ = diff_exports(args.old, args.new, args.report, args.memory_mb, args.strategy)
+    except ValueError as e:
+        raise SystemExit(f"ERREUR: {e}")
+
+    counts = differ.counts
+    strategy = "jointure par hachage" if differ.strategy == "hash" else "tri externe"
+    print("=" * 80)
+    print(f"DIFF {args.old.name} -> {args.new.name} ({strategy})")
+    print("=" * 80)
+    print()
+    print(f"Lignes ajoutees: {counts[ADDED]}")
+    print(f"Lignes supprimees: {counts[REMOVED]}")
+    print(f"Lignes modifiees: {counts[CHANGED]}")
+    print(f"Lignes identiques: {counts['unchanged']}")
+    if differ.only_old:
+        print(f"Colonnes uniquement dans l'ancien: {', '.join(differ.only_old)}")
+    if differ.only_new:
+        print(f"Colonnes uniquement dans le nouveau: {', '.join(differ.only_new)}")
+    if differ.changed_columns:
+        print()
+        print("Colonnes modifiees:")
+        for col, n in differ.changed_columns.most_common():
+            print(f"  - {col}: {n}")
+    print()
+    print(f"OK: Rapport sauvegarde : {args.report}")
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Catalogue réellement en ligne, relu depuis la boutique au format des CSV d'import.
+
+Au lieu d'exporter un CSV à la main depuis wp-admin, ce script interroge les
+mêmes endpoints que le proxy api/woocommerce (woo-api.php à la racine
+WordPress) :
+
+  woo-api.php?action=products&per_page=100&page=N      produits, page par page
+  woo-api.php?action=variations&product_id=ID&page=N   variations de chaque produit variable
+
+Les pages de produits sont demandées par fenêtres de --concurrency pages en
+parallèle, puis toutes les pages de variations en même temps, sur un pool de
+connexions keep-alive (http_async.py) avec nouvelles tentatives.
+
+Chaque page est gardée dans un cache local avec son ETag / Last-Modified :
+à la synchronisation suivante, la requête est conditionnelle et une page
+inchangée revient en 304, sans corps.
+
+Le résultat est écrit avec l'en-tête de generer_csv_complet.py (Type, SKU,
+Parent, Attribute 1..3, Images...), lisible par valider_catalogue.py,
+verifier_urls_images.py ou catalog_db.py :
+
+    python fetch_live_catalog.py
+    python valider_catalogue.py --input woocommerce_live.csv
+
+Les attributs globaux (taxonomies pa_xxx) sont écrits avec leur libellé et
+le nom de leurs termes : woo-api.php donne les options d'un produit en ids de
+termes et la valeur d'une variation en slug de terme, et ajoute pour ces
+attributs `label` et `terms` (id, nom, slug). Un woo-api.php plus ancien,
+sans `terms`, laisse ids et slugs tels quels : les attributs concernés sont
+signalés.
+
+woo-api.php doit être à jour sur le serveur : les SKU des produits et des
+variations (champ `sku`), les termes des attributs globaux et la pagination
+des variations n'existent que depuis cette version. Comme le reste de ses
+réponses, ces champs sont publics (endpoint sans authentification, CORS).
+
+Configuration : WOO_API_ORIGIN (ou WP_BASE_URL), comme le proxy ; défaut https://wp.impexo.fr.
+
+Usage:
+  python fetch_live_catalog.py [--base-url https://wp.impexo.fr] [--output woocommerce_live.csv]
+                               [--concurrency 8] [--status publish] [--no-cache]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from csv_stream import open_csv_writer, open_output
+from generer_csv_complet import HEADER
+from http_async import ConnectionPool, HttpError, Retry
+from instrumentation import run_script, stage
+from reporting import Report
+
+DEFAULT_ORIGIN = "https://wp.impexo.fr"
+CACHE_VERSION = 1
+# Maximum accepté par woo-api.php pour per_page
+PAGE_SIZE = 100
+# Emplacements d'attributs de l'en-tête (Attribute 1..3)
+ATTRIBUTE_SLOTS = 3
+
+
+class FetchError(Exception):
+    """Page illisible ou refusée par le serveur."""
+
+
+def attribute_key(name: str) -> str:
+    """
+    Clé d'un attribut telle que WooCommerce la range dans les variations
+    (sanitize_title, sans le préfixe pa_ des attributs globaux) : "Modèle" -> "modele".
+    """
+    key = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    key = re.sub(r"[^a-z0-9_-]+", "-", key).strip("-")
+    return key[3:] if key.startswith("pa_") else key
+
+
+# --- Cache des pages ----------------------------------------------------------
+
+def load_cache(path) -> Dict[str, dict]:
+    path = Path(path)
+    if not path.exists():
+        return {}
+    cache = json.loads(path.read_text(encoding="utf-8"))
+    return cache["pages"] if cache.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(path, pages: Dict[str, dict]) -> None:
+    with open_output(path, encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "pages": pages}, f, ensure_ascii=False, separators=(",", ":"))
+
+
+class PageFetcher:
+    """GET conditionnels : une page inchangée (304) est reprise du cache."""
+
+    def __init__(self, pool: ConnectionPool, retry: Retry, cache: Dict[str, dict]):
+        self.pool = pool
+        self.retry = retry
+        self.cache = cache
+        self.visited: Dict[str, dict] = {}  # pages de cette synchronisation (le reste du cache est périmé)
+        self.not_modified = 0
+        self.transferred = 0
+
+    async def get(self, url: str) -> list:
+        entry = self.cache.get(url)
+        headers = {"Accept": "application/json"}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = await self.retry.request(self.pool, "GET", url, headers)
+        except HttpError as e:
+            raise FetchError(f"GET {url}: {e}") from e
+
+        if response.status == 304 and entry:
+            self.not_modified += 1
+            self.visited[url] = entry
+            return entry["items"]
+        if response.status != 200:
+            raise FetchError(f"GET {url}: HTTP {response.status}")
+        try:
+            items = response.json()
+        except ValueError as e:
+            raise FetchError(f"GET {url}: reponse non JSON ({e})") from e
+        if not isinstance(items, list):
+            raise FetchError(f"GET {url}: {items.get('error', items) if isinstance(items, dict) else items}")
+        self.transferred += len(response.body)
+        self.visited[url] = {
+            "etag": response.headers.get("etag", ""),
+            "last_modified": response.headers.get("last-modified", ""),
+            "items": items,
+        }
+        return items
+
+
+# --- Récupération -------------------------------------------------------------
+
+def api_url(origin: str, **params) -> str:
+    return f"{origin.rstrip('/')}/woo-api.php?{urlencode(params)}"
+
+
+async def fetch_products(fetcher: PageFetcher, origin: str, status: str, window: int) -> List[dict]:
+    """Pages de produits par fenêtres de `window` pages en parallèle, jusqu'à la première page incomplète."""
+    products: List[dict] = []
+    page = 1
+    while True:
+        urls = [api_url(origin, action="products", per_page=PAGE_SIZE, page=p, orderby="id", order="asc",
+                        status=status) for p in range(page, page + window)]
+        for items in await asyncio.gather(*(fetcher.get(url) for url in urls)):
+            products.extend(items)
+            if len(items) < PAGE_SIZE:
+                return products
+        page += window
+
+
+async def fetch_variations(fetcher: PageFetcher, origin: str, product: dict, status: str) -> List[dict]:
+    """
+    Variations d'un produit : autant de pages que d'ids annoncés par le produit.
+    Un woo-api.php sans pagination des variations renvoie toujours la première
+    page : les doublons sont écartés (le manque est signalé par l'appelant).
+    """
+    n_pages = max(1, -(-len(product.get("variations") or []) // PAGE_SIZE))
+    urls = [api_url(origin, action="variations", product_id=product["id"], per_page=PAGE_SIZE, page=p,
+                    status=status) for p in range(1, n_pages + 1)]
+    variations: Dict[int, dict] = {}
+    for items in await asyncio.gather(*(fetcher.get(url) for url in urls)):
+        for item in items:
+            variations.setdefault(item["id"], item)
+    return list(variations.values())
+
+
+async def fetch_catalog(origin: str, cache: Dict[str, dict], status: str = "publish", concurrency: int = 8,
+                        timeout: float = 30.0) -> Tuple[List[Tuple[dict, List[dict]]], Dict[str, int], PageFetcher]:
+    """[(produit, variations)] dans l'ordre des ids, compteurs, et le fetcher (pages visitées)."""
+    async with ConnectionPool(limit=concurrency, timeout=timeout) as pool:
+        retry = Retry()
+        fetcher = PageFetcher(pool, retry, cache)
+        products = await fetch_products(fetcher, origin, status, concurrency)
+        variable = [p for p in products if p.get("type") == "variable"]
+        variations = await asyncio.gather(*(fetch_variations(fetcher, origin, p, status) for p in variable))
+        by_id = {p["id"]: v for p, v in zip(variable, variations)}
+        stats = {"requests": retry.requests, "retried": retry.retried, "connections": pool.connections_opened,
+                 "not_modified": fetcher.not_modified, "transferred": fetcher.transferred}
+        return [(p, by_id.get(p["id"], [])) for p in products], stats, fetcher
+
+
+# --- Objets woo-api.php -> lignes CSV ----------------------------------------
+
+def _parent_attributes(product: dict) -> List[dict]:
+    return [a for a in product.get("attributes") or [] if a.get("variation", True)][:ATTRIBUTE_SLOTS]
+
+
+def term_names(attr: dict) -> Optional[Dict[str, str]]:
+    """
+    Id et slug de chaque terme -> nom, pour un attribut global (id de taxonomie non
+    nul) ; {} pour un attribut local (options et valeurs sont déjà les noms) ;
+    None pour un attribut global sans `terms` (woo-api.php ancien).
+    """
+    if not attr.get("id"):
+        return {}
+    terms = attr.get("terms")
+    if terms is None:
+        return None
+    names: Dict[str, str] = {}
+    for term in terms:
+        names[str(term["id"])] = names[term["slug"]] = term["name"]
+    return names
+
+
+def _images(product: dict) -> str:
+    return ", ".join(img["src"] for img in product.get("images") or [] if img.get("src"))
+
+
+def iter_live_rows(catalog: List[Tuple[dict, List[dict]]], report: Optional[Report] = None) -> Iterator[List[str]]:
+    """Lignes au format HEADER : chaque produit variable suivi de ses variations."""
+    width = len(HEADER)
+    attr_start = HEADER.index("Attribute 1 name")
+    tail = HEADER.index("Short description")
+    for product, variations in catalog:
+        if product.get("type") != "variable":
+            if report is not None:
+                report.add("produit_non_variable", f"{product.get('sku') or product.get('slug')} ({product.get('type')})",
+                           id=product.get("id"), type=product.get("type"))
+            continue
+        sku = product.get("sku") or product.get("slug") or str(product["id"])
+        attributes = _parent_attributes(product)
+        names: List[Dict[str, str]] = []
+        for attr in attributes:
+            terms = term_names(attr)
+            if terms is None:
+                terms = {}
+                if report is not None:
+                    report.add("attribut_global", f"{sku}: {attr['name']}", product=sku, attribute=attr["name"])
+            names.append(terms)
+        labels = [attr.get("label") or attr["name"] for attr in attributes]
+        row = [""] * width
+        row[0:6] = ["variable", sku, product.get("name", ""), "", "1", ""]
+        for slot, attr in enumerate(attributes):
+            base = attr_start + 4 * slot
+            options = [names[slot].get(str(o), str(o)) for o in attr.get("options") or []]
+            row[base:base + 4] = [labels[slot], ", ".join(options),
+                                  "1" if attr.get("visible", True) else "0", "1" if attr.get("id") else "0"]
+        row[tail:tail + 3] = [product.get("short_description", ""), product.get("description", ""), _images(product)]
+        yield row
+
+        expected = len(product.get("variations") or [])
+        if report is not None and expected > len(variations):
+            report.add("variations_incompletes", f"{sku}: {len(variations)}/{expected} variations recues",
+                       product=sku, received=len(variations), expected=expected)
+
+        slots = {attribute_key(attr["name"]): slot for slot, attr in enumerate(attributes)}
+        for variation in variations:
+            row = [""] * width
+            row[0:6] = ["variation", variation.get("sku", ""), "", sku, "1", variation.get("regular_price", "")]
+            for slot, label in enumerate(labels):
+                row[attr_start + 4 * slot:attr_start + 4 * slot + 4] = [label, "", "1", "0"]
+            for attr in variation.get("attributes") or []:
+                slot = slots.get(attribute_key(attr["name"]))
+                if slot is not None:
+                    option = attr.get("option", "")
+                    row[attr_start + 4 * slot + 1] = names[slot].get(option, option)
+            image = variation.get("image") or {}
+            row[tail + 2] = image.get("src", "")
+            yield row
+
+
+def main():
+    exports_dir = Path(__file__).parent
+    origin = os.environ.get("WOO_API_ORIGIN") or os.environ.get("WP_BASE_URL") or DEFAULT_ORIGIN
+    parser = argparse.ArgumentParser(description="Relit le catalogue en ligne au format des CSV d'import.")
+    parser.add_argument("--base-url", default=origin, help="Origine WordPress où se trouve woo-api.php")
+    parser.add_argument("--output", type=Path, default=exports_dir / "woocommerce_live.csv")
+    parser.add_argument("--cache", type=Path, default=exports_dir / "live_catalog_cache.json")
+    parser.add_argument("--no-cache", action="store_true", help="Tout retransférer (le cache est réécrit)")
+    parser.add_argument("--status", default="publish", help="Statut des produits demandés (publish, draft, any...)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requêtes simultanées au maximum")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Délai par requête (secondes)")
+    args = parser.parse_args()
+
+    cache = {} if args.no_cache else load_cache(args.cache)
+    start = time.perf_counter()
+    with stage("read"):
+        try:
+            catalog, stats, fetcher = asyncio.run(fetch_catalog(args.base_url, cache, args.status,
+                                                                args.concurrency, args.timeout))
+        except FetchError as e:
+            print(f"ERREUR: {e}")
+            return
+    elapsed = time.perf_counter() - start
+    save_cache(args.cache, fetcher.visited)
+
+    report = Report()
+    with open_csv_writer(args.output, HEADER) as writer:
+        writer.writerows(iter_live_rows(catalog, report))
+
+    n_variations = sum(len(v) for _, v in catalog)
+    print("=" * 80)
+    print("CATALOGUE EN LIGNE")
+    print("=" * 80)
+    print()
+    print(f"Source : {args.base_url}/woo-api.php")
+    print(f"{len(catalog)} produits, {n_variations} variations")
+    print(f"{stats['requests']} requetes en {elapsed:.2f}s ({stats['connections']} connexions, "
+          f"{stats['retried']} nouvelles tentatives)")
+    print(f"  - {stats['not_modified']}/{len(fetcher.visited)} pages inchangees depuis la derniere synchronisation")
+    print(f"  - {stats['transferred'] / 1024:.1f} Ko transferes")
+    print()
+    report.print_summary({
+        "produit_non_variable": "produits non variables ignores",
+        "variations_incompletes": "produits dont toutes les variations n'ont pas ete recues "
+                                  "(woo-api.php sans pagination des variations ?)",
+        "attribut_global": "attributs globaux sans termes, ids et slugs laisses tels quels "
+                           "(woo-api.php a redeployer)",
+    })
+    print(f"OK: CSV sauvegarde : {args.output}")
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -4,145 +4,326 @@ Script pour corriger les conflits dans le CSV WooCommerce.
 
 Problème : Plusieurs variations avec la même combinaison Modèle + Couleur
 Solution : Garder une seule variation par combinaison Modèle + Couleur par produit parent
+
+Usage:
+  python fix_csv_conflicts.py [--policy first] [--report conflits_variations.csv]
+                              [--resume] [--checkpoint-every 100000]
 """
 
+import argparse
 import csv
+import json
+import re
+import tempfile
 from pathlib import Path
-from collections import defaultdict
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from checkpoint import DEFAULT_EVERY, Checkpoint
+from csv_stream import ENCODING, open_csv_writer, read_header
+from instrumentation import run_script, timed_rows, timed_writer
+from reporting import Report
+from woo_schema import RowView, Schema
 
 def normalize_value(s: str) -> str:
     """Normalise une valeur pour la comparaison."""
     return (s or "").strip().lower().replace(" ", "").replace("-", "")
 
-def extract_variation_key(row: List[str], header: List[str]) -> Tuple[str, str, str]:
+# Colonnes nécessaires pour construire la clé d'une variation
+KEY_COLUMNS = ("Parent", "Attribute 1 name", "Attribute 1 value(s)", "Attribute 2 name", "Attribute 2 value(s)")
+NO_KEY = ("", "", "")
+
+def extract_variation_key(view: RowView) -> Tuple[str, str, str]:
     """Extrait la clé unique d'une variation : (parent_sku, model, color)."""
+    return (view.parent, normalize_value(view.model), normalize_value(view.color))
+
+def row_kind(view: RowView, type_idx: int, parent_idx: int) -> str:
+    """Renvoie "parent", "variation" ou "" (ligne ignorée) pour une ligne de données."""
+    row = view.row
+    if type_idx >= 0 and type_idx < len(row):
+        kind = view.type.lower()
+        if kind == "variable":
+            return "parent"
+        if kind == "variation":
+            return "variation"
+        return ""
+    # Si pas de colonne Type, déterminer par la présence de Parent
+    if parent_idx >= 0 and parent_idx < len(row):
+        if view.parent.strip() == "":
+            return "parent"
+        return "variation"
+    return ""
+
+# Numéro final d'une référence (JOJO1015-16 -> 16)
+REF_NUMBER = re.compile(r"(\d+)\s*$")
+
+def _price_score(view: RowView) -> float:
     try:
-        parent_idx = header.index("Parent")
-        attr1_name_idx = header.index("Attribute 1 name")
-        attr1_value_idx = header.index("Attribute 1 value(s)")
-        attr2_name_idx = header.index("Attribute 2 name")
-        attr2_value_idx = header.index("Attribute 2 value(s)")
-        
-        parent = row[parent_idx] if parent_idx < len(row) else ""
-        model = row[attr1_value_idx] if attr1_value_idx < len(row) else ""
-        color = row[attr2_value_idx] if attr2_value_idx < len(row) else ""
-        
-        return (parent, normalize_value(model), normalize_value(color))
-    except (ValueError, IndexError):
-        return ("", "", "")
+        return -float(view.price.replace(",", "."))
+    except ValueError:
+        return float("-inf")  # une variation sans prix ne gagne jamais contre une variation avec prix
 
-def main():
-    in_path = Path(__file__).parent / "woocommerce_import.csv"
-    out_path = Path(__file__).parent / "woocommerce_import_corrige.csv"
-    
-    if not in_path.exists():
-        print(f"ERREUR: Fichier introuvable : {in_path}")
-        return
-    
-    # Lire le CSV
-    with open(in_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-    
-    if not rows:
-        print("ERREUR: CSV vide")
-        return
-    
-    header = rows[0]
-    data_rows = rows[1:]
-    
-    print(f"Analyse de {len(data_rows)} lignes...")
+def _ref_number_score(view: RowView) -> int:
+    match = REF_NUMBER.search(view.ref)
+    return int(match.group(1)) if match else -1
+
+# Politiques de résolution : score de la variation (le plus grand gagne)
+# et remplacement du gagnant en cas d'égalité
+POLICIES: Dict[str, Tuple[Callable[[RowView], object], bool]] = {
+    "first": (lambda view: 0, False),
+    "last": (lambda view: 0, True),
+    "lowest-price": (_price_score, False),
+    "highest-ref": (_ref_number_score, False),
+    "with-image": (lambda view: bool(view.images.strip()), False),
+}
+
+REPORT_HEADER = ["Parent", "Modele", "Couleur", "Decision", "SKU", "Reference", "Prix", "Images"]
+
+Key = Tuple[str, str, str]
+
+class Winners:
+    """
+    Variation retenue de chaque combinaison parent + Modèle + Couleur selon une
+    politique : seuls le gagnant courant (score, rang) et le nombre de candidats
+    de chaque clé restent en mémoire.
+    """
+
+    def __init__(self, policy: str):
+        self.score_of, self.replace_on_tie = POLICIES[policy]
+        self.best: Dict[Key, list] = {}  # clé -> [nombre de candidats, score du gagnant, rang du gagnant]
+
+    def offer(self, key: Key, view: RowView, seq: int) -> None:
+        """Candidate de rang `seq` pour `key` (le rang compte les variations dans l'ordre d'entrée)."""
+        score = self.score_of(view)
+        best = self.best.get(key)
+        if best is None:
+            self.best[key] = [1, score, seq]
+        else:
+            best[0] += 1
+            if score > best[1] or (self.replace_on_tie and score == best[1]):
+                best[1] = score
+                best[2] = seq
+
+    def kept_seqs(self) -> set:
+        return {best[2] for best in self.best.values()}
+
+    def conflicts(self) -> set:
+        return {key for key, best in self.best.items() if best[0] > 1}
+
+def make_stage(header: List[str], policy: str = "first"):
+    """
+    Étape de pipeline : garde une variation par combinaison parent + Modèle +
+    Couleur, choisie par `policy` comme dans main(), et écarte les lignes ni
+    parent ni variation.
+
+    Comme main(), les parents sortent en tête : ils passent tout de suite, les
+    variations sont mises de côté dans un fichier temporaire, et `flush` rend
+    les gagnantes à la fin de l'entrée, dans l'ordre d'entrée.
+    """
+    schema = Schema(header)
+    view_class = schema.view_class
+    type_idx = schema.index_of("Type")
+    parent_idx = schema.index_of("Parent")
+    keyed = all(schema.has(c) for c in KEY_COLUMNS)
+    winners = Winners(policy)
+    offer = winners.offer
+    spool = tempfile.TemporaryFile("w+", encoding="utf-8", newline="")
+    spool_writer = csv.writer(spool)
+    seq = 0
     
-    # Séparer les produits parents et les variations
-    parent_rows = []
-    variation_rows = []
+    def stage(row: List[str]):
+        nonlocal seq
+        view = view_class(row)
+        kind = row_kind(view, type_idx, parent_idx)
+        if kind == "parent":
+            return row
+        if kind == "variation":
+            spool_writer.writerow(row)
+            key = extract_variation_key(view) if keyed else NO_KEY
+            if key[0]:
+                offer(key, view, seq)
+            seq += 1
+        return None
     
-    type_idx = header.index("Type") if "Type" in header else -1
+    def flush():
+        kept_seqs = winners.kept_seqs()
+        winners.best.clear()
+        with spool:
+            spool.seek(0)
+            for n, view in enumerate(schema.views(csv.reader(spool))):
+                key = extract_variation_key(view) if keyed else NO_KEY
+                if not key[0] or n in kept_seqs:
+                    yield view.row
     
-    for row in data_rows:
-        if type_idx >= 0 and type_idx < len(row):
-            if row[type_idx].lower() == "variable":
-                parent_rows.append(row)
-            elif row[type_idx].lower() == "variation":
-                variation_rows.append(row)
+    stage.flush = flush
+    return stage
+
+def _load_winners(path, size: int, winners: Winners) -> None:
+    """Relit le journal des gagnants jusqu'à `size` octets (la dernière ligne d'une clé l'emporte)."""
+    with open(path, "rb") as f:
+        data = f.read(size)
+    for line in data.decode("utf-8").splitlines():
+        parent, model, color, count, score, seq = json.loads(line)
+        winners.best[(parent, model, color)] = [count, score, seq]
+
+def resolve_conflicts(in_path, out_path, report_path, policy: str = "first",
+                      resume: bool = False, checkpoint_every: int = DEFAULT_EVERY,
+                      events: Optional[Report] = None) -> Dict[str, int]:
+    """
+    Écrit `out_path` : les parents puis, pour chaque combinaison parent + Modèle +
+    Couleur, la seule variation retenue par `policy`, dans l'ordre d'entrée.
+
+    Le fichier d'entrée est lu une seule fois. Les variations sont mises de côté
+    dans un fichier de travail pendant que seuls le gagnant courant de chaque clé
+    (score, rang) et le nombre de candidats restent en mémoire ; le fichier de
+    travail est ensuite recopié sans les perdants. Chaque variation en
+    conflit (gardée ou écartée) est décrite dans `report_path` ; les variations
+    écartées sont aussi déclarées à `events` (événements "ecartee").
+
+    Pendant la lecture, un point de reprise (position dans l'entrée, tailles des
+    fichiers écrits, compteurs) est enregistré toutes les `checkpoint_every`
+    lignes ; avec `resume`, la lecture reprend au dernier. Les gagnants ne sont
+    pas recopiés à chaque point de reprise : seules les clés modifiées depuis le
+    précédent sont ajoutées à un journal (fichier de travail repris comme les
+    autres). La recopie finale, qui ne relit que le fichier de travail, est
+    refaite en entier après une interruption. Les gagnants dépendent de
+    `policy` : reprendre avec une autre politique lève ValueError.
+    """
+    header = read_header(in_path)
+    if not header:
+        raise ValueError("CSV vide")
+
+    winners = Winners(policy)
+    schema = Schema(header)
+    type_idx = schema.index_of("Type")
+    parent_idx = schema.index_of("Parent")
+    keyed = all(schema.has(c) for c in KEY_COLUMNS)
+
+    outputs = {"csv": Path(out_path), "spool": None, "winners": None}
+    with Checkpoint(in_path, outputs, resume=resume, every=checkpoint_every,
+                    encodings={"winners": "utf-8"}) as ckpt:
+        if ckpt.resumed:
+            state = ckpt.state
+            if state.get("policy") != policy:
+                raise ValueError(f"Point de reprise enregistre avec --policy {state.get('policy', '?')} : "
+                                 f"relancer avec la meme politique, ou sans --resume pour repartir de zero")
+            stats = state["stats"]
+            _load_winners(ckpt.partials["winners"], ckpt.files["winners"].buffer.tell(), winners)
         else:
-            # Si pas de colonne Type, déterminer par la présence de Parent
-            parent_idx = header.index("Parent") if "Parent" in header else -1
-            if parent_idx >= 0 and parent_idx < len(row):
-                if not row[parent_idx] or row[parent_idx].strip() == "":
-                    parent_rows.append(row)
+            state = {"phase": 1, "seq": 0, "policy": policy}
+            stats = {"rows": 0, "parents": 0, "variations": 0, "kept": 0, "conflicts": 0}
+
+        best = winners.best
+        changed = set()  # clés modifiées depuis le dernier point de reprise
+        journal = ckpt.files["winners"]
+
+        def snapshot() -> dict:
+            for key in changed:
+                journal.write(json.dumps([*key, *best[key]]) + "\n")
+            changed.clear()
+            state["stats"] = stats
+            return state
+
+        writer = timed_writer("write", csv.writer(ckpt.files["csv"]))
+        spool_writer = timed_writer("write", csv.writer(ckpt.files["spool"]))
+        if state["phase"] == 1:
+            if not ckpt.resumed:
+                writer.writerow(header)
+            seq = state["seq"]
+            offer = winners.offer
+            for view in schema.views(ckpt.rows()):
+                stats["rows"] += 1
+                kind = row_kind(view, type_idx, parent_idx)
+                if kind == "parent":
+                    stats["parents"] += 1
+                    writer.writerow(view.row)
+                elif kind == "variation":
+                    stats["variations"] += 1
+                    spool_writer.writerow(view.row)
+                    key = extract_variation_key(view) if keyed else NO_KEY
+                    if key[0]:  # Si parent existe
+                        offer(key, view, seq)
+                        changed.add(key)
+                    seq += 1
+                state["seq"] = seq
+                ckpt.tick(snapshot)
+            state["phase"] = 2
+            ckpt.save(snapshot())
+
+        kept_seqs = winners.kept_seqs()
+        conflicts = winners.conflicts()
+        best.clear()
+        stats["conflicts"] = len(conflicts)
+        stats["kept"] = 0
+
+        # Recopie des variations retenues, et rapport des conflits
+        with open(ckpt.partials["spool"], "r", encoding=ENCODING, newline="") as spool, \
+                open_csv_writer(report_path, REPORT_HEADER) as report:
+            for seq, view in enumerate(schema.views(timed_rows("read", csv.reader(spool)))):
+                key = extract_variation_key(view) if keyed else NO_KEY
+                if not key[0] or seq in kept_seqs:
+                    writer.writerow(view.row)
+                    stats["kept"] += 1
+                    decision = "gardee"
                 else:
-                    variation_rows.append(row)
+                    decision = "ecartee"
+                if key in conflicts:
+                    report.writerow([view.parent, view.model, view.color, decision,
+                                     view.sku, view.ref, view.price, view.images])
+                    if events is not None and decision == "ecartee":
+                        events.add("ecartee", f"{view.sku} ({view.model} + {view.color}, ref {view.ref})")
+
+    return stats
+
+def main():
+    exports_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Garde une seule variation par combinaison Modèle + Couleur.")
+    parser.add_argument("--policy", choices=list(POLICIES), default="first",
+                        help="Variation gardée en cas de conflit : première, dernière, prix le plus bas, "
+                             "numéro de référence le plus haut, ou première avec une image")
+    parser.add_argument("--report", type=Path, default=exports_dir / "conflits_variations.csv",
+                        help="Fichier CSV décrivant chaque variation en conflit")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre au dernier point de reprise après une interruption")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_EVERY, metavar="LIGNES",
+                        help="Lignes lues entre deux points de reprise")
+    args = parser.parse_args()
     
-    print(f"  - {len(parent_rows)} produits parents")
-    print(f"  - {len(variation_rows)} variations")
+    in_path = exports_dir / "woocommerce_import.csv"
+    out_path = exports_dir / "woocommerce_import_corrige.csv"
     
-    # Analyser les conflits
-    variation_by_key: Dict[Tuple[str, str, str], List[List[str]]] = defaultdict(list)
+    if not in_path.exists():
+        print(f"ERREUR: Fichier introuvable : {in_path}")
+        return
     
-    for row in variation_rows:
-        key = extract_variation_key(row, header)
-        if key[0]:  # Si parent existe
-            variation_by_key[key].append(row)
+    events = Report()
+    try:
+        stats = resolve_conflicts(in_path, out_path, args.report, args.policy,
+                                  args.resume, args.checkpoint_every, events)
+    except ValueError as e:
+        print(f"ERREUR: {e}")
+        return
     
-    # Identifier les conflits
-    conflicts = {k: v for k, v in variation_by_key.items() if len(v) > 1}
+    print(f"Analyse de {stats['rows']} lignes...")
+    print(f"  - {stats['parents']} produits parents")
+    print(f"  - {stats['variations']} variations")
     
-    if conflicts:
-        print(f"\nATTENTION: {len(conflicts)} conflits detectes (meme Modele + Couleur avec references differentes):")
-        for (parent, model, color), variations in list(conflicts.items())[:10]:  # Afficher les 10 premiers
-            ref_idx = header.index("Attribute 3 value(s)") if "Attribute 3 value(s)" in header else -1
-            refs = []
-            for v in variations:
-                if ref_idx >= 0 and ref_idx < len(v):
-                    refs.append(v[ref_idx])
-            print(f"  - {parent}: {model} + {color} -> {len(variations)} variations ({', '.join(refs[:3])}...)")
-        if len(conflicts) > 10:
-            print(f"  ... et {len(conflicts) - 10} autres conflits")
+    if stats["conflicts"]:
+        print(f"\nATTENTION: {stats['conflicts']} conflits detectes (meme Modele + Couleur avec references differentes)")
+        print(f"   Variations ecartees : {events.total('ecartee')}")
+        events.print_samples("ecartee", indent="   ")
+        print(f"   Detail des variations gardees / ecartees : {args.report}")
     else:
         print("\nOK: Aucun conflit detecte")
     
-    # Créer le CSV corrigé
-    # Pour chaque conflit, garder seulement la première variation (ou celle avec la référence la plus récente)
-    corrected_variations = []
-    kept_variations = set()
-    
-    for row in variation_rows:
-        key = extract_variation_key(row, header)
-        
-        if key in conflicts:
-            # Si c'est un conflit, garder seulement la première occurrence
-            if key not in kept_variations:
-                corrected_variations.append(row)
-                kept_variations.add(key)
-                
-                # Afficher quelle variation est gardée
-                ref_idx = header.index("Attribute 3 value(s)") if "Attribute 3 value(s)" in header else -1
-                sku_idx = header.index("SKU") if "SKU" in header else -1
-                ref = row[ref_idx] if ref_idx >= 0 and ref_idx < len(row) else "?"
-                sku = row[sku_idx] if sku_idx >= 0 and sku_idx < len(row) else "?"
-                print(f"  Gardee: {sku} (Ref: {ref})")
-        else:
-            # Pas de conflit, garder la variation
-            corrected_variations.append(row)
-    
-    # Écrire le CSV corrigé
-    out_rows = [header] + parent_rows + corrected_variations
-    
-    with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(out_rows)
-    
-    removed_count = len(variation_rows) - len(corrected_variations)
+    removed_count = stats["variations"] - stats["kept"]
     print(f"\nOK: CSV corrige cree : {out_path}")
-    print(f"  - {len(parent_rows)} produits parents")
-    print(f"  - {len(corrected_variations)} variations ({removed_count} supprimees)")
+    print(f"  - {stats['parents']} produits parents")
+    print(f"  - {stats['kept']} variations ({removed_count} supprimees)")
     
-    if conflicts:
-        print(f"\nATTENTION: {len(conflicts)} combinaisons Modele + Couleur avaient plusieurs references.")
-        print("   Seule la premiere reference a ete conservee pour chaque combinaison.")
+    if stats["conflicts"]:
+        print(f"\nATTENTION: {stats['conflicts']} combinaisons Modele + Couleur avaient plusieurs references.")
+        print(f"   Politique appliquee : {args.policy}.")
         print("   Verifiez manuellement si d'autres references doivent etre ajoutees.")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
@@ -3,15 +3,33 @@
 Script pour remplacer les URLs placeholder par le vrai domaine WordPress.
 """
 
-import csv
 import sys
 from pathlib import Path
 
-def main():
-    # Domaine WordPress réel
-    REAL_DOMAIN = "www.impexo.fr"
-    PLACEHOLDER = "TON-DOMAINE.TLD"
+from csv_stream import open_csv, open_csv_writer, read_header
+from instrumentation import run_script
+from reporting import Report
+from url_rewrite import Replace, RewriteEngine
+
+# Domaine WordPress réel
+REAL_DOMAIN = "www.impexo.fr"
+PLACEHOLDER = "TON-DOMAINE.TLD"
+
+RULES = [Replace(PLACEHOLDER, REAL_DOMAIN)]
+
+def make_stage(header):
+    """Étape de pipeline : remplace le domaine placeholder dans la colonne Images."""
+    images_idx = header.index("Images")
+    rewrite = RewriteEngine(RULES).rewrite
+    
+    def stage(row):
+        if images_idx < len(row) and row[images_idx]:
+            row[images_idx] = rewrite(row[images_idx])
+        return row
     
+    return stage
+
+def main():
     in_path = Path(__file__).parent / "woocommerce_import_corrige.csv"
     out_path = Path(__file__).parent / "woocommerce_import_corrige_final.csv"
     
@@ -19,18 +37,12 @@ def main():
         print(f"ERREUR: Fichier introuvable : {in_path}")
         return
     
-    # Lire le CSV
-    with open(in_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    header = read_header(in_path)
     
-    if not rows:
+    if not header:
         print("ERREUR: CSV vide")
         return
     
-    header = rows[0]
-    data_rows = rows[1:]
-    
     # Trouver l'index de la colonne Images
     try:
         images_idx = header.index("Images")
@@ -40,30 +52,29 @@ def main():
     
     print(f"Remplacement des URLs placeholder par {REAL_DOMAIN}...")
     
-    # Remplacer les URLs
-    replaced_count = 0
-    for row in data_rows:
-        if images_idx < len(row) and row[images_idx]:
-            old_url = row[images_idx]
-            if PLACEHOLDER in old_url:
-                new_url = old_url.replace(PLACEHOLDER, REAL_DOMAIN)
-                row[images_idx] = new_url
-                replaced_count += 1
-                if replaced_count <= 5:  # Afficher les 5 premiers
-                    print(f"  {old_url} -> {new_url}")
+    # Remplacer les URLs, ligne par ligne de l'entrée vers la sortie
+    rewrite = RewriteEngine(RULES).rewrite
+    report = Report()
+    data_count = 0
+    with open_csv_writer(out_path, header) as writer:
+        with open_csv(in_path) as (_, data_rows):
+            for row in data_rows:
+                data_count += 1
+                if images_idx < len(row) and row[images_idx]:
+                    old_url = row[images_idx]
+                    new_url = rewrite(old_url)
+                    if new_url != old_url:
+                        row[images_idx] = new_url
+                        report.add("url", f"{old_url} -> {new_url}")
+                writer.writerow(row)
     
+    replaced_count = report.total("url")
+    report.print_samples("url", indent="  ")
     print(f"\n{replaced_count} URLs remplacees")
     
-    # Écrire le CSV corrigé
-    out_rows = [header] + data_rows
-    
-    with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(out_rows)
-    
     print(f"\nOK: CSV final cree : {out_path}")
-    print(f"  - {len(data_rows)} lignes traitees")
+    print(f"  - {data_count} lignes traitees")
     print(f"  - {replaced_count} URLs d'images corrigees")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
@@ -1,19 +1,17 @@
-import csv
 from pathlib import Path
 
+from csv_stream import open_csv, open_csv_writer, read_header
+from instrumentation import run_script
+
 IN_PATH = Path(__file__).with_name("woocommerce_gammes_import.csv")
 OUT_PATH = Path(__file__).with_name("woocommerce_gammes_import_wc.csv")
 
 
 def main() -> None:
-    text = IN_PATH.read_text(encoding="utf-8")
-    rows = list(csv.reader(text.splitlines()))
-    if not rows:
+    header = read_header(IN_PATH, encoding="utf-8")
+    if not header:
         raise SystemExit("CSV vide.")
 
-    header = rows[0]
-    data = rows[1:]
-
     # WooCommerce CSV importer behaves best when Attribute X global is provided.
     # We force attributes to be *custom* (not global taxonomy) by setting global=0.
     def inject_global_columns(h: list[str]) -> list[str]:
@@ -49,16 +47,17 @@ def main() -> None:
             out = out[: len(out_header)]
         return out
 
-    out_rows = [out_header] + [transform_row(r) for r in data]
-
     # Write with UTF-8 BOM for maximum compatibility on Windows/Woo importers
-    with OUT_PATH.open("w", encoding="utf-8-sig", newline="") as f:
-        w = csv.writer(f)
-        w.writerows(out_rows)
+    count = 0
+    with open_csv_writer(OUT_PATH, out_header) as w:
+        with open_csv(IN_PATH, encoding="utf-8") as (_, data):
+            for r in data:
+                w.writerow(transform_row(r))
+                count += 1
 
-    print(f"Wrote {OUT_PATH} with {len(out_rows)-1} data rows.")
+    print(f"Wrote {OUT_PATH} with {count} data rows.")
 
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
 
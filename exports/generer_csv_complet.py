@@ -4,168 +4,239 @@ Script pour générer un CSV complet avec TOUTES les combinaisons Modèle × Cou
 selon les spécifications du client.
 """
 
-import csv
+import argparse
+import json
+from functools import partial
+from itertools import islice
 from pathlib import Path
 
-# Spécifications du client
-SPECS_CLIENT = {
-    "impexo-camera-protection": {
-        "name": "Coque Protection Caméra Renforcée – Série iPhone 17",
-        "short_desc": "Rebord surélevé autour du module caméra. Finesse élégante, prise en main confortable.",
-        "desc": "Conçue pour protéger efficacement l'appareil au quotidien, cette coque intègre un rebord surélevé autour du module caméra afin de limiter les rayures et les impacts directs. Sa structure absorbe les chocs tout en conservant une finesse élégante et une prise en main confortable. Compatibilité par modèle : iPhone 17 : protection précise du module caméra ; iPhone 17 Air : coque légère adaptée au format affiné ; iPhone 17 Pro : protection renforcée pour module avancé ; iPhone 17 Pro Max : maintien optimal sur grand format. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-1", "JOJO1015-3", "JOJO1015-5", "JOJO1015-9", "JOJO1015-10", "JOJO1015-13", "JOJO1015-19"],
-        "colors": ["Blanc", "Noir", "Vert", "Rose", "Bleu", "Rouge", "Gris", "Violet", "Argent", "Marron"],
-        "prices": {"JOJO1015-1": "14.90", "JOJO1015-3": "17.90", "JOJO1015-5": "17.90", "JOJO1015-9": "22.90", "JOJO1015-10": "22.90", "JOJO1015-13": "24.90", "JOJO1015-19": "26.90"},
-    },
-    "impexo-transparent": {
-        "name": "Coque Transparente Premium – Série iPhone 17",
-        "short_desc": "Préserve le design d'origine. Protection discrète contre rayures et chocs.",
-        "desc": "Idéale pour conserver le design d'origine, cette coque transparente protège contre les rayures et les chocs du quotidien tout en restant discrète et élégante. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-2", "JOJO1015-4"],
-        "colors": ["Transparent", "Gris", "Jaune", "Violet"],
-        "prices": {"JOJO1015-2": "14.90", "JOJO1015-4": "17.90"},
-    },
-    "impexo-luxury-transparent": {
-        "name": "Coque Luxury Transparente – Série iPhone 17",
-        "short_desc": "Transparence premium avec détails décoratifs raffinés. Protection fiable.",
-        "desc": "Version transparente à finition premium avec détails décoratifs raffinés, alliant esthétique et protection fiable. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-24", "JOJO1015-25"],
-        "colors": ["Argent", "Rose", "Bleu", "Violet", "Noir", "Or", "Rouge"],
-        "prices": {"JOJO1015-24": "29.90", "JOJO1015-25": "29.90"},
-    },
-    "impexo-magnetic": {
-        "name": "Coque Magnétique – Série iPhone 17",
-        "short_desc": "Système magnétique intégré. Maintien stable avec accessoires compatibles.",
-        "desc": "Équipée d'un système magnétique intégré, cette coque assure un maintien stable avec les accessoires compatibles tout en protégeant efficacement l'appareil. Note : certaines versions peuvent être compatibles MagSafe selon le design. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-6", "JOJO1015-11", "JOJO1015-21"],
-        "colors": ["Noir", "Blanc", "Violet", "Bleu", "Vert sombre", "Or désert", "Jaune", "Fuchsia"],
-        "prices": {"JOJO1015-6": "19.90", "JOJO1015-11": "22.90", "JOJO1015-21": "26.90"},
-    },
-    "impexo-luxury-metal": {
-        "name": "Coque Luxury Metal Frame – Série iPhone 17",
-        "short_desc": "Cadre à finition métallique. Protection structurelle renforcée.",
-        "desc": "Dotée d'un cadre à finition métallique, cette coque offre une protection structurelle renforcée et un rendu haut de gamme. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-22", "JOJO1015-18", "JOJO1015-23"],
-        "colors": ["Violet", "Gris", "Or désert", "Orange", "Argent", "Or rose", "Noir", "Vert sombre", "Marron", "Bleu"],
-        "prices": {"JOJO1015-22": "17.90", "JOJO1015-18": "19.90", "JOJO1015-23": "29.90"},
-    },
-    "impexo-anti-slip-matte": {
-        "name": "Coque Texture Antidérapante – Série iPhone 17",
-        "short_desc": "Surface mate et texture antidérapante. Prise en main sûre.",
-        "desc": "Surface mate et texture antidérapante pour une prise en main sûre et confortable au quotidien. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-12", "JOJO1015-15"],
-        "colors": ["Noir", "Rose", "Violet", "Marron", "Bleu nuit"],
-        "prices": {"JOJO1015-12": "24.90", "JOJO1015-15": "17.90"},
-    },
-    "impexo-jean": {
-        "name": "Coque Effet Cuir / Jean – Série iPhone 17",
-        "short_desc": "Finition texturée effet cuir / jean. Style distinctif, protection fiable.",
-        "desc": "Finition texturée effet cuir / jean, alliant style distinctif et protection fiable. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-16"],
-        "colors": ["Bleu denim", "Noir", "Gris", "Marron"],
-        "prices": {"JOJO1015-16": "26.90"},
-    },
-    "impexo-pc-tpu": {
-        "name": "Coque Renforcée PC + TPU – Série iPhone 17",
-        "short_desc": "Association de matériaux résistants. Protection renforcée au quotidien.",
-        "desc": "Association de matériaux résistants pour une protection renforcée contre les chocs et l'usure quotidienne. Mention légale : Produit compatible avec les modèles iPhone 17, 17 Air, 17 Pro et 17 Pro Max. La marque Apple® est mentionnée uniquement à titre de compatibilité. IMPEXO est une marque indépendante.",
-        "references": ["JOJO1015-7", "JOJO1015-8", "JOJO1015-14", "JOJO1015-17", "JOJO1015-20"],
-        "colors": ["Noir", "Vert", "Rose", "Violet", "Argent", "Vert sombre", "Doré", "Rouge", "Bleu", "Bordeaux", "Marron"],
-        "prices": {"JOJO1015-7": "22.90", "JOJO1015-8": "22.90", "JOJO1015-14": "24.90", "JOJO1015-17": "26.90", "JOJO1015-20": "26.90"},
-    },
-}
-
-MODELS = ["iPhone 17", "iPhone 17 Air", "iPhone 17 Pro", "iPhone 17 Pro Max"]
+from catalog_shards import generate_sharded
+from csv_stream import LINE_END, format_csv_field, format_csv_row, open_output
+from delta_export import content_hash, export_delta, load_state, save_state
+from instrumentation import run_script
+from sku_registry import REGISTRY_FILE, check_catalog, color_slug, model_slug, slug
+from specs_catalog import load_catalog
+
+# Spécifications du client (exports/specs_client.json)
+CATALOG = load_catalog()
+SPECS_CLIENT = CATALOG["products"]
+MODELS = CATALOG["models"]
+
 BASE_URL = "https://www.impexo.fr/product/IMPEXO-IPHONE%2017%20SERIES12-31"
 
+HEADER = [
+    "Type", "SKU", "Name", "Parent", "Published", "Regular price",
+    "Attribute 1 name", "Attribute 1 value(s)", "Attribute 1 visible", "Attribute 1 global",
+    "Attribute 2 name", "Attribute 2 value(s)", "Attribute 2 visible", "Attribute 2 global",
+    "Attribute 3 name", "Attribute 3 value(s)", "Attribute 3 visible", "Attribute 3 global",
+    "Short description", "Description", "Images", "material"
+]
+
+# Nombre de lignes passées d'un coup au writer CSV
+BLOCK_SIZE = 10000
+
+# À incrémenter si la forme des lignes change sans que les specs changent :
+# l'export incrémental regénère alors tous les produits
+ROWS_VERSION = 1
+
+# Dimensions de generate_sku, dans l'ordre des morceaux (vérifiées par sku_registry)
+SKU_DIMENSIONS = ("reference", "model", "color")
+
 def generate_sku(parent_sku, ref, model, color):
-    """Génère un SKU pour une variation"""
-    model_short = model.replace("iPhone 17 ", "").replace(" ", "-").lower()
-    color_slug = color.lower().replace(" ", "-").replace("é", "e")
-    return f"{parent_sku}--{ref.lower()}--{model_short}--{color_slug}"
+    """Génère un SKU pour une variation (morceaux en cache, voir sku_registry.py)"""
+    return f"{parent_sku}--{slug(ref)}--{model_slug(model)}--{color_slug(color)}"
 
-def main():
-    output_path = Path(__file__).parent / "woocommerce_import_complet.csv"
+def parent_row(product_sku, specs):
+    """Ligne du produit parent (variable)"""
+    return [
+        "variable",
+        product_sku,
+        specs["name"],
+        "",  # Parent
+        "1",  # Published
+        "",  # Regular price
+        "Modèle",
+        ", ".join(MODELS),
+        "1", "0",  # visible, global
+        "Couleur",
+        ", ".join(specs["colors"]),
+        "1", "0",  # visible, global
+        "Référence",
+        ", ".join(specs["references"]),
+        "1", "0",  # visible, global
+        specs["short_desc"],
+        specs["desc"],
+        f"{BASE_URL}/{specs['references'][0]}.JPG",  # Image du produit parent (première référence)
+        "",  # material
+    ]
+
+def iter_variation_rows(product_sku, specs, models=MODELS):
+    """
+    Génère TOUTES les variations d'un produit : Modèle × Couleur × Référence.
+
+    Les morceaux de SKU, prix et URLs d'image sont calculés une seule fois par
+    valeur de chaque dimension, puis combinés : la boucle interne ne fait plus
+    qu'assembler des chaînes déjà prêtes.
+    """
+    models = [(model, model_slug(model)) for model in models]
+    colors = [(color, color_slug(color)) for color in specs["colors"]]
+    refs = [(ref, slug(ref), specs["prices"][ref], f"{BASE_URL}/{ref}.JPG") for ref in specs["references"]]
+    prefix = f"{product_sku}--"
     
-    # En-têtes CSV
-    header = [
-        "Type", "SKU", "Name", "Parent", "Published", "Regular price",
-        "Attribute 1 name", "Attribute 1 value(s)", "Attribute 1 visible", "Attribute 1 global",
-        "Attribute 2 name", "Attribute 2 value(s)", "Attribute 2 visible", "Attribute 2 global",
-        "Attribute 3 name", "Attribute 3 value(s)", "Attribute 3 visible", "Attribute 3 global",
-        "Short description", "Description", "Images", "material"
+    for model, model_short in models:
+        for color, color_short in colors:
+            suffix = f"--{model_short}--{color_short}"
+            for ref, ref_short, price, image_url in refs:
+                yield [
+                    "variation",
+                    prefix + ref_short + suffix,
+                    "",  # Name (vide pour les variations)
+                    product_sku,  # Parent
+                    "1",  # Published
+                    price,
+                    "Modèle", model, "1", "0",
+                    "Couleur", color, "1", "0",
+                    "Référence", ref, "1", "0",
+                    "",  # Short description
+                    "",  # Description
+                    image_url,
+                    "",  # material
+                ]
+
+def iter_variation_lines(product_sku, specs, models=MODELS):
+    """
+    Mêmes variations que iter_variation_rows, déjà sérialisées en lignes CSV.
+
+    Chaque valeur de dimension est mise au format CSV une seule fois (guillemets
+    compris, avec format_csv_field, donc exactement comme csv.writer), puis les
+    fragments sont concaténés : c'est l'équivalent d'un calcul vectorisé, sans
+    passer par csv.writer à chaque ligne. Les colonnes sont celles de
+    iter_variation_rows, dans le même ordre.
+    """
+    q = format_csv_field
+    models = [(model_slug(model), f",Modèle,{q(model)},1,0") for model in models]
+    colors = [(color_slug(color), f",Couleur,{q(color)},1,0") for color in specs["colors"]]
+    refs = [
+        (slug(ref), f",{q(specs['prices'][ref])}",
+         f",Référence,{q(ref)},1,0,,,{q(f'{BASE_URL}/{ref}.JPG')},{LINE_END}")
+        for ref in specs["references"]
     ]
+    parent_field = q(product_sku)
     
-    rows = [header]
+    # csv.writer ne met de guillemets que pour un délimiteur, un guillemet ou un
+    # retour à la ligne : le SKU n'en a besoin que si un de ses morceaux en a besoin
+    sku_parts = [product_sku] + [m[0] for m in models] + [c[0] for c in colors] + [r[0] for r in refs]
+    plain_sku = all(q(part) == part for part in sku_parts)
     
-    # Générer les produits et variations
-    for product_sku, specs in SPECS_CLIENT.items():
-        # Produit parent (variable)
-        models_str = ", ".join(MODELS)
-        colors_str = ", ".join(specs["colors"])
-        refs_str = ", ".join(specs["references"])
-        
-        # Image du produit parent (première référence)
-        parent_image = f"{BASE_URL}/{specs['references'][0]}.JPG"
-        
-        parent_row = [
-            "variable",
-            product_sku,
-            specs["name"],
-            "",  # Parent
-            "1",  # Published
-            "",  # Regular price
-            "Modèle",
-            models_str,
-            "1", "0",  # visible, global
-            "Couleur",
-            colors_str,
-            "1", "0",  # visible, global
-            "Référence",
-            refs_str,
-            "1", "0",  # visible, global
-            specs["short_desc"],
-            specs["desc"],
-            parent_image,
-            "",  # material
-        ]
-        rows.append(parent_row)
-        
-        # Générer TOUTES les variations : Modèle × Couleur × Référence
-        for model in MODELS:
-            for color in specs["colors"]:
-                for ref in specs["references"]:
-                    variation_sku = generate_sku(product_sku, ref, model, color)
-                    price = specs["prices"][ref]
-                    image_url = f"{BASE_URL}/{ref}.JPG"
-                    
-                    variation_row = [
-                        "variation",
-                        variation_sku,
-                        "",  # Name (vide pour les variations)
-                        product_sku,  # Parent
-                        "1",  # Published
-                        price,
-                        "Modèle",
-                        model,
-                        "1", "0",
-                        "Couleur",
-                        color,
-                        "1", "0",
-                        "Référence",
-                        ref,
-                        "1", "0",
-                        "",  # Short description
-                        "",  # Description
-                        image_url,
-                        "",  # material
-                    ]
-                    rows.append(variation_row)
+    for model_short, model_fragment in models:
+        for color_short, color_fragment in colors:
+            suffix = f"--{model_short}--{color_short}"
+            for ref_short, price_fragment, ref_fragment in refs:
+                sku = f"{product_sku}--{ref_short}{suffix}"
+                if not plain_sku:
+                    sku = q(sku)
+                yield f"variation,{sku},,{parent_field},1{price_fragment}{model_fragment}{color_fragment}{ref_fragment}"
+
+def iter_product_rows(product_sku, specs, models=MODELS, with_parent=True):
+    """Ligne parent (si demandée) suivie des variations des modèles donnés"""
+    if with_parent:
+        yield parent_row(product_sku, specs)
+    yield from iter_variation_rows(product_sku, specs, models)
+
+def iter_product_lines(product_sku, specs, models=MODELS, with_parent=True):
+    """
+    Comme iter_product_rows, en lignes CSV déjà sérialisées.
+
+    Sert aussi de fonction de shard pour catalog_shards (sous-ensemble de modèles,
+    ligne parent seulement dans le premier shard du produit).
+    """
+    if with_parent:
+        yield format_csv_row(parent_row(product_sku, specs))
+    yield from iter_variation_lines(product_sku, specs, models)
+
+def iter_catalog_lines(specs_client):
+    """Toutes les lignes CSV du catalogue, produit par produit, dans l'ordre des specs"""
+    for product_sku, specs in specs_client.items():
+        yield from iter_product_lines(product_sku, specs)
+
+def write_lines(f, lines):
+    """Écrit les lignes par blocs de BLOCK_SIZE"""
+    lines = iter(lines)
+    while True:
+        block = "".join(islice(lines, BLOCK_SIZE))
+        if not block:
+            break
+        f.write(block)
+
+def product_spec_hash(product_sku, specs):
+    """Hash de tout ce qui détermine les lignes d'un produit (export incrémental)"""
+    return content_hash(
+        str(ROWS_VERSION),
+        product_sku,
+        json.dumps(specs, sort_keys=True, ensure_ascii=False),
+        json.dumps(MODELS, ensure_ascii=False),
+        BASE_URL,
+    )
+
+def iter_delta_sources(specs_client):
+    """Produits à comparer avec l'état précédent, dans l'ordre des specs"""
+    for product_sku, specs in specs_client.items():
+        yield product_sku, product_spec_hash(product_sku, specs), partial(iter_product_rows, product_sku, specs)
+
+def run_incremental(exports_dir):
+    """Écrit uniquement les lignes nouvelles ou modifiées et la liste des SKU supprimés"""
+    state_path = exports_dir / "woocommerce_import_complet.state.json"
+    delta_path = exports_dir / "woocommerce_import_delta.csv"
+    removed_path = exports_dir / "woocommerce_import_supprimes.txt"
+    
+    previous = load_state(state_path)
+    state, stats = export_delta(iter_delta_sources(SPECS_CLIENT), previous, HEADER, delta_path, removed_path)
+    save_state(state_path, state)
+    
+    print("=" * 80)
+    print("EXPORT INCREMENTAL")
+    print("=" * 80)
+    print()
+    if not previous:
+        print("Aucun etat precedent : toutes les lignes sont considerees comme nouvelles")
+    print(f"Produits inchanges (non regeneres): {stats['products_skipped']}/{len(SPECS_CLIENT)}")
+    print(f"Lignes nouvelles: {stats['added']}")
+    print(f"Lignes modifiees: {stats['changed']}")
+    print(f"Lignes inchangees: {stats['unchanged']}")
+    print(f"SKU supprimes: {stats['removed']}")
+    print()
+    print(f"OK: Delta sauvegarde : {delta_path}")
+    print(f"OK: SKU supprimes : {removed_path}")
+    print(f"OK: Etat sauvegarde : {state_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère le CSV complet Modèle × Couleur × Référence.")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Nombre de processus (1 = génération en série)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="N'écrire que les lignes nouvelles/modifiées depuis la dernière exécution incrémentale")
+    args = parser.parse_args()
+    
+    exports_dir = Path(__file__).parent
+    registry = check_catalog(exports_dir / REGISTRY_FILE, SPECS_CLIENT, MODELS, SKU_DIMENSIONS)
+    if registry is None:
+        return
+    if args.incremental:
+        run_incremental(exports_dir)
+        registry.save()
+        registry.print_summary()
+        return
+    
+    output_path = exports_dir / "woocommerce_import_complet.csv"
     
-    # Écrire le CSV
-    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
+    if args.jobs > 1:
+        # Un shard par produit (ou produit × modèle), fusionnés dans l'ordre des specs
+        generate_sharded(output_path, format_csv_row(HEADER), iter_product_lines, SPECS_CLIENT, MODELS, args.jobs)
+    else:
+        # Générer les produits et variations, écrits au fil de l'eau
+        with open_output(output_path) as f:
+            f.write(format_csv_row(HEADER))
+            write_lines(f, iter_catalog_lines(SPECS_CLIENT))
     
     total_variations = sum(len(MODELS) * len(specs["colors"]) * len(specs["references"]) for specs in SPECS_CLIENT.values())
     
@@ -181,7 +252,10 @@ def main():
         count = len(MODELS) * len(specs["colors"]) * len(specs["references"])
         print(f"  - {specs['name']}: {count} variations")
     print()
+    registry.save()
+    print(f"SKU uniques: {registry.count} (registre : {REGISTRY_FILE})")
+    registry.print_summary()
     print(f"OK: CSV sauvegarde : {output_path}")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
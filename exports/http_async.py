@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Client HTTP/1.1 asyncio minimal, avec connexions persistantes (keep-alive).
+
+Sert aux outils réseau de exports/ (vérification des URLs d'images, appels à
+l'API REST WooCommerce) sans dépendance externe : seulement asyncio et ssl.
+
+    async with ConnectionPool(limit=16) as pool:
+        response = await pool.request("HEAD", "https://www.impexo.fr/wp-content/uploads/JOJO1015-1.JPG")
+        response.status, response.headers.get("etag")
+
+`limit` borne le nombre de requêtes simultanées (et donc de connexions
+ouvertes). Une connexion est rendue au pool après chaque réponse lue en
+entier, sauf si le serveur demande sa fermeture. Les URLs http:// sont
+acceptées, ce qui permet de tester contre un serveur local.
+
+Si une connexion réutilisée s'avère fermée par le serveur, la requête n'est
+renvoyée sur une nouvelle connexion que si c'est sans risque (méthode
+idempotente, ou échec avant l'envoi complet de la requête) : un POST qui a
+pu être traité n'est jamais rejoué.
+
+Retry ajoute de nouvelles tentatives (erreur réseau, 429, 5xx) avec une
+attente croissante :
+
+    response = await Retry(retries=4).request(pool, "GET", url)
+
+Une requête non idempotente (POST d'un lot) n'est retentée que si elle n'a
+pas été envoyée (RequestNotSent : connexion impossible, coupée pendant
+l'envoi), ou sur un 429 / 503 avec Retry-After (le serveur demande de
+revenir plus tard, sans avoir traité la requête). Après un délai dépassé,
+une connexion coupée pendant l'attente de la réponse ou un 502 / 504, le
+serveur a pu la traiter : c'est à l'appelant de vérifier avant de la renvoyer.
+"""
+
+import asyncio
+import json
+import random
+import ssl
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+USER_AGENT = "impexo-exports/1.0"
+
+# Caractères laissés tels quels dans le chemin : une URL déjà encodée (%20) n'est pas ré-encodée
+PATH_SAFE = "/%:@&=+$,;~!*'()"
+
+ConnKey = Tuple[str, str, int]
+
+# Statuts pour lesquels une nouvelle tentative a des chances de réussir
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Méthodes renvoyables sans risque si une connexion keep-alive tombe en cours de route
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Statuts qui, avec Retry-After, garantissent qu'une requête non idempotente n'a pas été traitée
+DEFERRED_STATUSES = frozenset({429, 503})
+
+
+class HttpError(Exception):
+    """Réponse illisible ou connexion perdue."""
+
+
+class RequestNotSent(HttpError):
+    """Connexion perdue avant l'envoi complet de la requête : le serveur ne l'a pas traitée."""
+
+
+class Response(NamedTuple):
+    status: int
+    reason: str
+    headers: Dict[str, str]  # noms en minuscules
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class _Connection:
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise HttpError("Connexion fermée pendant les en-têtes")
+        line = line.rstrip(b"\r\n")
+        if not line:
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        value = value.strip()
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    parts: List[bytes] = []
+    while True:
+        size_line = await reader.readline()
+        if not size_line:
+            raise HttpError("Connexion fermée pendant un bloc chunked")
+        size = int(size_line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            await _read_headers(reader)  # en-têtes de fin (trailers)
+            return b"".join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readexactly(2)  # CRLF après chaque bloc
+
+
+async def _read_response(conn: _Connection, method: str) -> Tuple[Response, bool]:
+    """Lit une réponse complète ; renvoie (réponse, connexion réutilisable)."""
+    reader = conn.reader
+    while True:
+        status_line = await reader.readline()
+        if not status_line:
+            raise HttpError("Connexion fermée avant la réponse")
+        version, _, rest = status_line.decode("latin-1").rstrip("\r\n").partition(" ")
+        code, _, reason = rest.partition(" ")
+        status = int(code)
+        headers = await _read_headers(reader)
+        if status != 100:  # ignorer "100 Continue"
+            break
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        body = b""
+    elif "chunked" in headers.get("transfer-encoding", "").lower():
+        body = await _read_chunked(reader)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()  # corps délimité par la fermeture de la connexion
+        keep_alive = False
+
+    return Response(status, reason, headers, body), keep_alive
+
+
+class ConnectionPool:
+    """Pool de connexions keep-alive par hôte, avec un nombre borné de requêtes en vol."""
+
+    def __init__(self, limit: int = 16, timeout: float = 30.0, ssl_context: Optional[ssl.SSLContext] = None):
+        self.limit = limit
+        self.timeout = timeout
+        self._ssl_context = ssl_context
+        self._semaphore = asyncio.Semaphore(limit)
+        self._idle: Dict[ConnKey, List[_Connection]] = {}
+        self.connections_opened = 0
+
+    async def __aenter__(self) -> "ConnectionPool":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        for conns in self._idle.values():
+            for conn in conns:
+                conn.close()
+        self._idle.clear()
+
+    def _ssl(self):
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    async def _connect(self, key: ConnKey) -> _Connection:
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(host, port, ssl=self._ssl() if scheme == "https" else None)
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                      body: Optional[bytes] = None) -> Response:
+        """Envoie une requête et lit la réponse entière (délai `timeout` pour l'ensemble)."""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"URL non supportée: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+
+        target = quote(parts.path or "/", safe=PATH_SAFE)
+        if parts.query:
+            target += "?" + parts.query
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}", f"User-Agent: {USER_AGENT}",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        async with self._semaphore:
+            return await asyncio.wait_for(self._send(key, method, head, body), self.timeout)
+
+    def _pop_idle(self, idle: List[_Connection]) -> Optional[_Connection]:
+        """Connexion inactive encore ouverte (celles déjà fermées par le serveur sont jetées)."""
+        while idle:
+            conn = idle.pop()
+            if not conn.reader.at_eof() and not conn.writer.is_closing():
+                return conn
+            conn.close()
+        return None
+
+    async def _send(self, key: ConnKey, method: str, head: bytes, body: Optional[bytes]) -> Response:
+        idle = self._idle.setdefault(key, [])
+        while True:
+            conn = self._pop_idle(idle)
+            reused = conn is not None
+            if conn is None:
+                try:
+                    conn = await self._connect(key)
+                except OSError as e:
+                    raise RequestNotSent(str(e) or type(e).__name__) from e
+            sent = False
+            try:
+                conn.writer.write(head + body if body else head)
+                await conn.writer.drain()
+                sent = True
+                response, keep_alive = await _read_response(conn, method)
+            except (ConnectionError, asyncio.IncompleteReadError, HttpError) as e:
+                conn.close()
+                # Connexion keep-alive fermée par le serveur entre deux requêtes : on
+                # renvoie sur une nouvelle connexion, sauf si une requête non idempotente
+                # (POST d'un lot...) a pu être reçue et traitée avant la coupure
+                if reused and (not sent or method in IDEMPOTENT_METHODS):
+                    continue
+                raise (HttpError if sent else RequestNotSent)(str(e) or type(e).__name__) from e
+            except BaseException:
+                conn.close()
+                raise
+            if keep_alive:
+                idle.append(conn)
+            else:
+                conn.close()
+            return response
+
+
+class Retry:
+    """
+    Nouvelles tentatives sur erreur réseau, 429 ou 5xx, après une attente
+    croissante (backoff exponentiel avec un peu d'aléa, Retry-After respecté).
+    Une requête non idempotente n'est retentée que si elle n'a pas pu être
+    traitée (voir retryable). Compte les requêtes envoyées et les nouvelles tentatives.
+    """
+
+    def __init__(self, retries: int = 4, backoff: float = 0.5):
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retried = 0
+
+    def delay(self, attempt: int, response: Optional[Response]) -> float:
+        retry_after = response.headers.get("retry-after", "") if response is not None else ""
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+
+    @staticmethod
+    def retryable(method: str, error: Optional[BaseException] = None, response: Optional[Response] = None) -> bool:
+        """Nouvelle tentative possible après `error` ou `response`, sans risquer de traiter deux fois la requête ?"""
+        if method in IDEMPOTENT_METHODS:
+            return error is not None or response.status in RETRY_STATUSES
+        if error is not None:
+            return isinstance(error, RequestNotSent)
+        return response.status in DEFERRED_STATUSES and "retry-after" in response.headers
+
+    async def request(self, pool: ConnectionPool, method: str, url: str,
+                      headers: Optional[Dict[str, str]] = None, body: Optional[bytes] = None) -> Response:
+        """
+        Dernière réponse obtenue (éventuellement encore un 429 ou un 5xx) ;
+        HttpError si la dernière tentative n'a pas abouti (RequestNotSent si
+        elle n'a pas été envoyée).
+        """
+        for attempt in range(self.retries + 1):
+            response = None
+            self.requests += 1
+            try:
+                response = await pool.request(method, url, headers, body)
+            except (HttpError, OSError, asyncio.TimeoutError) as e:
+                if attempt == self.retries or not self.retryable(method, error=e):
+                    error = RequestNotSent if isinstance(e, RequestNotSent) else HttpError
+                    raise error(f"{str(e) or type(e).__name__} (apres {attempt + 1} tentatives)") from e
+            else:
+                if attempt == self.retries or not self.retryable(method, response=response):
+                    return response
+            self.retried += 1
+            await asyncio.sleep(self.delay(attempt, response))
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Faux serveur d'images local, pour essayer verifier_urls_images.py sans
+toucher au site :
+
+    python image_stub.py --port 8766 --dir medias/
+    # URLs du CSV en http://127.0.0.1:8766/<nom du fichier>
+
+Sert les images d'un dossier (ou d'un dict en mémoire dans les tests) en
+HEAD et GET, avec ETag et Last-Modified ; If-None-Match identique -> 304
+sans corps. Une image absente répond 404 ; une image ajoutée ou modifiée
+après coup est servie dès la requête suivante. Ctrl-C affiche les compteurs.
+"""
+
+import argparse
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import unquote, urlsplit
+
+
+class ImageStore:
+    """Images servies, par chemin d'URL ("/JOJO1015-6.JPG"), et compteurs de requêtes."""
+
+    def __init__(self, images: Optional[Dict[str, bytes]] = None):
+        self.lock = threading.Lock()
+        self.images: Dict[str, bytes] = {}
+        self.modified: Dict[str, float] = {}
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "not_found": 0}
+        for path, data in (images or {}).items():
+            self.put(path, data)
+
+    def put(self, path: str, data: bytes, modified: float = 1767225600.0) -> None:
+        """Ajoute ou remplace une image (Last-Modified = `modified`, 1er janvier 2026 par défaut)."""
+        with self.lock:
+            self.images[path] = data
+            self.modified[path] = modified
+
+    def remove(self, path: str) -> None:
+        with self.lock:
+            self.images.pop(path, None)
+            self.modified.pop(path, None)
+
+    def get(self, path: str):
+        """(contenu, date de modification) ou None."""
+        with self.lock:
+            if path not in self.images:
+                return None
+            return self.images[path], self.modified[path]
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] += 1
+
+
+def make_handler(store: ImageStore):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def _serve(self, with_body: bool) -> None:
+            store.count("requests")
+            found = store.get(unquote(urlsplit(self.path).path))
+            if found is None:
+                store.count("not_found")
+                body = b"Not Found"
+                self.send_response(404)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+                return
+            data, modified = found
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            if self.headers.get("If-None-Match", "").strip() == etag:
+                store.count("not_modified")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            store.count("ok")
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+            self.end_headers()
+            if with_body:
+                self.wfile.write(data)
+
+        def do_HEAD(self):
+            self._serve(with_body=False)
+
+        def do_GET(self):
+            self._serve(with_body=True)
+
+    return Handler
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8766, store: Optional[ImageStore] = None) -> ThreadingHTTPServer:
+    """Serveur prêt à servir (serve_forever) ; port 0 = port libre, lisible dans server.server_address."""
+    server = ThreadingHTTPServer((host, port), make_handler(store or ImageStore()))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur d'images local pour tester verifier_urls_images.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--dir", type=Path, help="Dossier dont les fichiers sont servis à la racine")
+    args = parser.parse_args()
+
+    store = ImageStore()
+    if args.dir is not None:
+        if not args.dir.is_dir():
+            raise SystemExit(f"ERREUR: Dossier introuvable : {args.dir}")
+        for path in args.dir.iterdir():
+            if path.is_file():
+                store.put(f"/{path.name}", path.read_bytes(), path.stat().st_mtime)
+    server = make_server(args.host, args.port, store)
+    print(f"Stub images sur http://{args.host}:{server.server_address[1]} "
+          f"({len(store.images)} images, Ctrl-C pour arreter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print()
+    print(", ".join(f"{name}: {value}" for name, value in store.stats.items()))
+
+
+if __name__ == "__main__":
+    main()
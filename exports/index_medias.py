@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Index des fichiers d'une copie locale du dossier uploads de WordPress.
+
+Les scripts qui écrivent la colonne Images devinent les noms de fichiers
+(`JOJO1015-6AIR.JPG`, `.JPG` ou `.jpg`...). Avec cet index, chaque nom est
+résolu par une simple recherche dans un dictionnaire (nom en minuscules ->
+fichier réel) et les images introuvables sont signalées avant l'import.
+
+L'index est gardé dans un fichier JSON (taille, mtime et hash de chaque
+fichier). Au rafraîchissement, un dossier dont le mtime n'a pas changé est
+repris tel quel sans être relu : seuls les dossiers où un fichier a été
+ajouté, supprimé ou renommé sont rescannés, et seuls les fichiers nouveaux
+ou modifiés (taille / mtime) sont rehachés.
+
+    index = MediaIndex.load_or_build("/chemin/vers/uploads/impexo")
+    media = index.lookup("jojo1015-6air.jpg")   # None si absent
+    media.path                                   # "2025/09/JOJO1015-6AIR.JPG"
+    media.name                                   # "JOJO1015-6AIR.JPG"
+
+Usage:
+  python index_medias.py <dossier_uploads> [--index medias_index.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from csv_stream import open_output
+from instrumentation import run_script
+
+INDEX_VERSION = 1
+INDEX_PATH = Path(__file__).with_name("medias_index.json")
+
+# Extensions essayées quand un nom d'image est donné sans extension (casse ignorée)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+class MediaFile(NamedTuple):
+    path: str  # chemin relatif à la racine, séparateur "/"
+    size: int
+    mtime_ns: int
+    hash: str
+
+    @property
+    def name(self) -> str:
+        """Nom réel du fichier, sans ses dossiers ("JOJO1015-6AIR.JPG")."""
+        return self.path.rsplit("/", 1)[-1]
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class MediaIndex:
+    """Fichiers d'un dossier racine, regroupés par dossier avec le mtime de chaque dossier."""
+
+    def __init__(self, root, dirs: Optional[Dict[str, dict]] = None):
+        self.root = Path(root).resolve()
+        # dossier relatif ("" pour la racine) -> {"mtime_ns", "subdirs", "files": {nom: [taille, mtime_ns, hash]}}
+        self.dirs: Dict[str, dict] = dirs or {}
+        self.stats = {"dirs_scanned": 0, "dirs_reused": 0, "files_hashed": 0}
+        self._by_name: Dict[str, MediaFile] = {}
+        self._build_lookup()
+
+    # --- Persistance ----------------------------------------------------------
+
+    @classmethod
+    def load(cls, root, index_path=INDEX_PATH) -> "MediaIndex":
+        """Index enregistré pour `root`, ou index vide si absent, périmé ou pour une autre racine."""
+        index_path = Path(index_path)
+        root = Path(root).resolve()
+        if index_path.exists():
+            data = json.loads(index_path.read_text(encoding="utf-8"))
+            if data.get("version") == INDEX_VERSION and data.get("root") == str(root):
+                return cls(root, data["dirs"])
+        return cls(root)
+
+    def save(self, index_path=INDEX_PATH) -> None:
+        with open_output(index_path, encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "root": str(self.root), "dirs": self.dirs},
+                      f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load_or_build(cls, root, index_path=INDEX_PATH) -> "MediaIndex":
+        """Charge l'index, le met à jour d'après le disque et l'enregistre."""
+        index = cls.load(root, index_path)
+        index.refresh()
+        index.save(index_path)
+        return index
+
+    # --- Rafraîchissement -----------------------------------------------------
+
+    def refresh(self) -> None:
+        """Met l'index à jour ; ne relit que les dossiers dont le mtime a changé."""
+        if not self.root.is_dir():
+            raise FileNotFoundError(f"Dossier introuvable : {self.root}")
+        old_dirs = self.dirs
+        self.dirs = {}
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            abs_dir = os.path.join(self.root, rel) if rel else str(self.root)
+            try:
+                mtime_ns = os.stat(abs_dir).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            old = old_dirs.get(rel)
+            if old is not None and old["mtime_ns"] == mtime_ns:
+                # Aucune entrée ajoutée, supprimée ou renommée dans ce dossier
+                entry = old
+                self.stats["dirs_reused"] += 1
+            else:
+                entry = self._scan_dir(rel, abs_dir, mtime_ns, old)
+                self.stats["dirs_scanned"] += 1
+            self.dirs[rel] = entry
+            pending.extend(f"{rel}/{name}" if rel else name for name in entry["subdirs"])
+        self._build_lookup()
+
+    def _scan_dir(self, rel: str, abs_dir: str, mtime_ns: int, old: Optional[dict]) -> dict:
+        old_files = old["files"] if old is not None else {}
+        files: Dict[str, list] = {}
+        subdirs: List[str] = []
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    st = entry.stat()
+                    known = old_files.get(entry.name)
+                    if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+                        files[entry.name] = known
+                    else:
+                        files[entry.name] = [st.st_size, st.st_mtime_ns, file_hash(entry.path)]
+                        self.stats["files_hashed"] += 1
+        return {"mtime_ns": mtime_ns, "subdirs": sorted(subdirs), "files": files}
+
+    # --- Recherche ------------------------------------------------------------
+
+    def _build_lookup(self) -> None:
+        by_name: Dict[str, MediaFile] = {}
+        # Ordre des chemins trié : si un nom existe dans plusieurs dossiers, le résultat est stable
+        for rel in sorted(self.dirs):
+            for name, (size, mtime_ns, digest) in self.dirs[rel]["files"].items():
+                path = f"{rel}/{name}" if rel else name
+                by_name.setdefault(name.casefold(), MediaFile(path, size, mtime_ns, digest))
+        self._by_name = by_name
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def lookup(self, filename: str) -> Optional[MediaFile]:
+        """Fichier réel pour `filename` (casse ignorée), ou None."""
+        return self._by_name.get(filename.strip().casefold())
+
+    def resolve(self, name: str) -> Optional[MediaFile]:
+        """Comme lookup(), en essayant les extensions d'image si `name` n'en a pas ou pas la bonne."""
+        media = self.lookup(name)
+        if media is not None:
+            return media
+        stem = name.strip().rsplit(".", 1)[0] if "." in name else name.strip()
+        for ext in IMAGE_EXTENSIONS:
+            media = self.lookup(stem + ext)
+            if media is not None:
+                return media
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexe une copie locale du dossier uploads.")
+    parser.add_argument("root", type=Path, help="Dossier uploads (ou sous-dossier des images)")
+    parser.add_argument("--index", type=Path, default=INDEX_PATH)
+    args = parser.parse_args()
+
+    try:
+        index = MediaIndex.load_or_build(args.root, args.index)
+    except FileNotFoundError as e:
+        raise SystemExit(f"ERREUR: {e}")
+    stats = index.stats
+
+    print(f"OK: Index a jour : {args.index}")
+    print(f"  - {len(index)} noms de fichiers distincts")
+    print(f"  - {stats['dirs_scanned']} dossiers rescannes, {stats['dirs_reused']} inchanges")
+    print(f"  - {stats['files_hashed']} fichiers haches")
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Mesures d'exécution communes aux scripts de exports/.
+
+Désactivées par défaut (aucun coût dans les boucles). Pour un lancement :
+
+    EXPORTS_PROFILE=1 python fix_csv_conflicts.py
+    python fix_csv_conflicts.py --profile              # équivalent
+    python fix_csv_conflicts.py --profile=memory,cprofile
+
+Options (séparées par des virgules) :
+- `1` / `on` : temps par étape, lignes/s, pic de RSS ;
+- `memory` : pic de mémoire Python (tracemalloc ; ralentit le script) ;
+- `cprofile` : profil cProfile complet (fichier .prof, lisible avec pstats
+  ou snakeviz).
+
+À la fin, un rapport JSON est écrit dans `profils/` à côté des scripts (ou
+dans EXPORTS_PROFILE_DIR) et son chemin est affiché sur la sortie d'erreur.
+
+Les étapes se partagent le temps sans double compte : le temps passé dans
+une étape imbriquée n'est compté que pour elle. csv_stream chronomètre
+lui-même la lecture (`read`) et l'écriture (`write`) ; les vérificateurs
+entourent leurs contrôles de `stage("validate")` ; le reste du script est
+compté dans `transform`.
+
+    if __name__ == "__main__":
+        run_script(main)
+
+    with stage("validate"):
+        ...
+    rows = timed_rows("read", rows)
+    writer = timed_writer("write", writer)
+"""
+
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+PROFILE_ENV = "EXPORTS_PROFILE"
+PROFILE_DIR_ENV = "EXPORTS_PROFILE_DIR"
+PROFILE_FLAG = "--profile"
+REPORT_VERSION = 1
+DEFAULT_DIR = Path(__file__).with_name("profils")
+
+# Étape racine : tout ce qui n'est pas compté dans une étape nommée
+ROOT_STAGE = "transform"
+
+
+class StageStats:
+    __slots__ = ("seconds", "calls", "rows")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows = 0
+
+
+class Run:
+    """Étapes chronométrées d'un lancement (temps propre : hors étapes imbriquées)."""
+
+    def __init__(self, script: str, options: Set[str]):
+        self.script = script
+        self.options = options
+        self.stages: Dict[str, StageStats] = {}
+        # [nom, début, temps des étapes imbriquées]
+        self._stack: List[list] = []
+
+    def enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self, rows: int = 0) -> None:
+        name, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.seconds += elapsed - nested
+        stats.calls += 1
+        stats.rows += rows
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def report(self) -> dict:
+        stages = {}
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            stages[name] = {
+                "seconds": round(stats.seconds, 6),
+                "calls": stats.calls,
+                "rows": stats.rows,
+                "rows_per_s": round(stats.rows / stats.seconds) if stats.rows and stats.seconds else None,
+            }
+        return {"stages": stages}
+
+
+# Lancement en cours, ou None quand les mesures sont désactivées
+RUN: Optional[Run] = None
+
+
+def parse_options(value: str) -> Set[str]:
+    options = {o.strip().lower() for o in value.split(",") if o.strip()}
+    options.discard("0")
+    return options
+
+
+# --- Points de mesure ---------------------------------------------------------
+
+@contextmanager
+def _stage(run: Run, name: str, rows: int):
+    run.enter(name)
+    try:
+        yield
+    finally:
+        run.exit(rows)
+
+
+def stage(name: str, rows: int = 0):
+    """Contexte chronométré sous `name` (sans effet si les mesures sont désactivées)."""
+    if RUN is None:
+        return nullcontext()
+    return _stage(RUN, name, rows)
+
+
+def timed_rows(name: str, rows: Iterable) -> Iterable:
+    """Chronomètre le temps passé à produire chaque ligne de `rows` et les compte."""
+    if RUN is None:
+        return rows
+    return _timed_rows(RUN, name, iter(rows))
+
+
+def _timed_rows(run: Run, name: str, rows: Iterator) -> Iterator:
+    while True:
+        run.enter(name)
+        try:
+            row = next(rows)
+        except StopIteration:
+            run.exit()
+            return
+        except BaseException:
+            run.exit()
+            raise
+        run.exit(1)
+        yield row
+
+
+class _TimedWriter:
+    """csv.writer dont chaque writerow est chronométré."""
+
+    __slots__ = ("_writer", "_run", "_name")
+
+    def __init__(self, run: Run, name: str, writer):
+        self._writer = writer
+        self._run = run
+        self._name = name
+
+    def writerow(self, row):
+        self._run.enter(self._name)
+        try:
+            return self._writer.writerow(row)
+        finally:
+            self._run.exit(1)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def __getattr__(self, attr):
+        return getattr(self._writer, attr)
+
+
+def timed_writer(name: str, writer):
+    if RUN is None:
+        return writer
+    return _TimedWriter(RUN, name, writer)
+
+
+# --- Lancement d'un script ----------------------------------------------------
+
+def _options_from_argv(argv: List[str]) -> Optional[Set[str]]:
+    """Retire --profile[=options] de argv ; renvoie les options, ou None si absent."""
+    for i, arg in enumerate(argv[1:], start=1):
+        if arg == PROFILE_FLAG or arg.startswith(PROFILE_FLAG + "="):
+            del argv[i]
+            _, _, value = arg.partition("=")
+            return parse_options(value or "1")
+    return None
+
+
+def run_script(main: Callable[[], object]) -> None:
+    """
+    Lance `main` ; avec EXPORTS_PROFILE ou --profile, le chronomètre et écrit
+    un rapport JSON à la fin (même si le script s'arrête sur une erreur).
+    """
+    global RUN
+    options = _options_from_argv(sys.argv)
+    if options is None:
+        options = parse_options(os.environ.get(PROFILE_ENV, ""))
+    if not options:
+        main()
+        return
+
+    script = Path(sys.argv[0]).stem
+    RUN = run = Run(script, options)
+    profiler = cProfile.Profile() if "cprofile" in options else None
+    if "memory" in options:
+        tracemalloc.start()
+
+    started = time.time()
+    cpu_start = time.process_time()
+    exit_code = 0
+    run.enter(ROOT_STAGE)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        main()
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        run.exit()
+        RUN = None
+        _write_report(run, profiler, started, time.process_time() - cpu_start, exit_code)
+
+
+def _write_report(run: Run, profiler: Optional[cProfile.Profile], started: float,
+                  cpu_seconds: float, exit_code: int) -> None:
+    directory = Path(os.environ.get(PROFILE_DIR_ENV) or DEFAULT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started))
+    base = directory / f"{run.script}-{stamp}-{os.getpid()}"
+
+    report = {
+        "version": REPORT_VERSION,
+        "script": run.script,
+        "argv": sys.argv[1:],
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "wall_s": round(time.time() - started, 6),
+        "cpu_s": round(cpu_seconds, 6),
+        "exit_code": exit_code,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "options": sorted(run.options),
+    }
+    report.update(run.report())
+    if tracemalloc.is_tracing():
+        report["tracemalloc_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    if profiler is not None:
+        profile_path = base.with_suffix(".prof")
+        profiler.dump_stats(profile_path)
+        report["cprofile"] = str(profile_path)
+
+    report_path = base.with_suffix(".json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Rapport d'execution : {report_path}", file=sys.stderr)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Chaîne de correction du CSV WooCommerce en une seule lecture et une seule écriture.
+
+Les corrections qui étaient lancées l'une après l'autre (chacune relisant et
+réécrivant tout le fichier) sont enregistrées ici comme des étapes : chaque
+ligne traverse toutes les étapes avant d'être écrite. Chaque étape mesure son
+propre temps.
+
+Usage:
+  python pipeline.py [--input woocommerce_import.csv] [--output woocommerce_import_corrige_final.csv]
+                     [--stages conflits,domaine,chemin_images,images_reference] [--policy first]
+"""
+
+import argparse
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import corriger_images_par_reference
+import fix_csv_conflicts
+import fix_image_urls
+import fix_image_urls_correct_path
+from csv_stream import open_csv, open_csv_writer, read_header
+from instrumentation import run_script
+
+# Une fabrique reçoit l'en-tête et renvoie la fonction appliquée à chaque ligne.
+# La fonction renvoie la ligne (éventuellement modifiée) ou None pour l'écarter.
+# Si elle a un attribut `flush`, il est appelé après la dernière ligne d'entrée et
+# renvoie les lignes mises de côté, qui traversent alors les étapes suivantes.
+StageFactory = Callable[[List[str]], Callable[[List[str]], Optional[List[str]]]]
+
+# Étapes disponibles, dans l'ordre de la chaîne historique :
+# woocommerce_import.csv -> fix_csv_conflicts -> fix_image_urls
+# -> fix_image_urls_correct_path -> corriger_images_par_reference
+STAGES = {
+    "conflits": fix_csv_conflicts.make_stage,
+    "domaine": fix_image_urls.make_stage,
+    "chemin_images": fix_image_urls_correct_path.make_stage,
+    "images_reference": corriger_images_par_reference.make_stage,
+}
+DEFAULT_STAGES = list(STAGES)
+
+
+class Stage:
+    """Une étape enregistrée et ses compteurs."""
+
+    __slots__ = ("name", "factory", "seconds", "rows_in", "rows_out")
+
+    def __init__(self, name: str, factory: StageFactory):
+        self.name = name
+        self.factory = factory
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+
+
+class Pipeline:
+    """Applique une suite d'étapes ligne par ligne, en un seul passage."""
+
+    def __init__(self):
+        self.stages: List[Stage] = []
+        self.total_seconds = 0.0
+
+    def add_stage(self, name: str, factory: StageFactory) -> "Pipeline":
+        self.stages.append(Stage(name, factory))
+        return self
+
+    def run(self, in_path, out_path) -> int:
+        """Lit `in_path`, applique les étapes et écrit `out_path`. Renvoie le nombre de lignes écrites."""
+        header = read_header(in_path)
+        if not header:
+            raise ValueError(f"CSV vide: {in_path}")
+
+        funcs = [(stage, stage.factory(header)) for stage in self.stages]
+        clock = time.perf_counter
+        written = 0
+        start = clock()
+
+        with open_csv_writer(out_path, header) as writer:
+            with open_csv(in_path) as (_, rows):
+                for row in rows:
+                    for stage, func in funcs:
+                        stage.rows_in += 1
+                        t0 = clock()
+                        row = func(row)
+                        stage.seconds += clock() - t0
+                        if row is None:
+                            break
+                        stage.rows_out += 1
+                    else:
+                        writer.writerow(row)
+                        written += 1
+
+            # Lignes retenues jusqu'à la fin par une étape, dans l'ordre des étapes
+            for i, (stage, func) in enumerate(funcs):
+                flush = getattr(func, "flush", None)
+                if flush is None:
+                    continue
+                for row in flush():
+                    stage.rows_out += 1
+                    for next_stage, next_func in funcs[i + 1:]:
+                        next_stage.rows_in += 1
+                        t0 = clock()
+                        row = next_func(row)
+                        next_stage.seconds += clock() - t0
+                        if row is None:
+                            break
+                        next_stage.rows_out += 1
+                    else:
+                        writer.writerow(row)
+                        written += 1
+
+        self.total_seconds = clock() - start
+        return written
+
+    def print_report(self) -> None:
+        stages_seconds = sum(stage.seconds for stage in self.stages)
+        print("Temps par etape:")
+        for stage in self.stages:
+            print(f"  - {stage.name:<18} {stage.seconds:8.3f}s  {stage.rows_in} -> {stage.rows_out} lignes")
+        print(f"  - {'lecture/ecriture':<18} {self.total_seconds - stages_seconds:8.3f}s")
+        print(f"  Total: {self.total_seconds:.3f}s")
+
+
+def main() -> None:
+    exports_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Chaîne de correction du CSV WooCommerce en un seul passage.")
+    parser.add_argument("--input", type=Path, default=exports_dir / "woocommerce_import.csv")
+    parser.add_argument("--output", type=Path, default=exports_dir / "woocommerce_import_corrige_final.csv")
+    parser.add_argument(
+        "--stages",
+        default=",".join(DEFAULT_STAGES),
+        help=f"Étapes séparées par des virgules parmi: {', '.join(STAGES)}",
+    )
+    parser.add_argument("--policy", choices=list(fix_csv_conflicts.POLICIES), default="first",
+                        help="Variation gardée par l'étape conflits (voir fix_csv_conflicts.py --policy)")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        raise SystemExit(f"ERREUR: Fichier introuvable : {args.input}")
+
+    pipeline = Pipeline()
+    for name in (n.strip() for n in args.stages.split(",")):
+        if name not in STAGES:
+            raise SystemExit(f"Etape inconnue: {name} (disponibles: {', '.join(STAGES)})")
+        factory = STAGES[name]
+        if name == "conflits":
+            factory = partial(factory, policy=args.policy)
+        pipeline.add_stage(name, factory)
+
+    written = pipeline.run(args.input, args.output)
+
+    print(f"OK: CSV corrige cree : {args.output}")
+    print(f"  - {written} lignes ecrites")
+    pipeline.print_report()
+
+
+if __name__ == "__main__":
+    run_script(main)
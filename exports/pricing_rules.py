@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Moteur de règles de prix des variations, appliqué en colonnes sur tout un export.
+
+Les prix sont fixés par référence dans specs_client.json ("prices"). Les
+règles de pricing_rules.json ajoutent par-dessus des suppléments (modèle Pro
+Max), des prix imposés (une couleur d'un produit), des prix promo et des
+campagnes de changement de prix :
+
+    {"rules": [
+      {"kind": "surcharge", "model": "iPhone 17 Pro Max", "amount": "2.00"},
+      {"kind": "override", "product": "impexo-magnetic", "color": "Or désert", "price": "19.90"},
+      {"kind": "adjust", "campaign": "hausse-2027", "percent": 3},
+      {"kind": "sale", "campaign": "soldes-hiver", "percent": 20, "start": "2027-01-06", "end": "2027-02-02"}
+    ]}
+
+Chaque règle choisit ses variations par product (SKU parent), model, color et
+reference : une valeur, une liste, ou rien (toutes). Calcul du prix régulier :
+
+  base      prix de la référence dans specs_client.json (premier prix du produit
+            sans référence), remplacé par la dernière règle "base" qui s'applique
+  surcharge + somme des montants (négatifs possibles)
+  adjust    × (1 + percent/100) pour chaque ajustement, arrondi au centime
+  override  remplacé par la dernière règle "override" qui s'applique
+
+Les montants ont au plus 2 décimales. Une variation dont le prix régulier
+calculé est négatif est signalée et n'est pas écrite.
+
+Le prix promo vient de la dernière règle "sale" qui s'applique : "price" fixe,
+"percent" ou "amount" de remise sur le prix régulier, avec des dates
+facultatives (start, end). Une règle avec "campaign" ne compte que si la
+campagne est activée par --campaign.
+
+Les règles ne sont pas évaluées variation par variation : chaque dimension
+est codée en entiers, les règles sont compilées en tables de correspondance
+par groupe de dimensions (ex. modèle seul, ou produit × couleur), puis chaque
+table est appliquée à toute la colonne d'un coup (map sur les tableaux de
+codes). Seules les variations dont le prix change sont écrites, dans un CSV
+réduit aux colonnes de prix, importable par WooCommerce (mise à jour des
+produits existants par SKU).
+
+Usage:
+  python pricing_rules.py [--input woocommerce_import_corrige_final.csv] [--rules pricing_rules.json]
+                          [--campaign soldes-hiver ...] [--output prix_delta.csv]
+"""
+
+import argparse
+import json
+import operator
+from datetime import date
+from functools import lru_cache
+from itertools import compress, repeat
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from column_cache import load_columns
+from csv_stream import open_csv_writer
+from instrumentation import run_script, stage
+from reporting import Report
+from specs_catalog import load_catalog
+from woo_schema import Schema
+
+# Dimensions sur lesquelles une règle peut choisir ses variations
+DIMENSIONS = ("product", "model", "color", "reference")
+KINDS = ("base", "surcharge", "adjust", "override", "sale")
+SALE_KEYS = ("price", "percent", "amount")
+
+SALE_COLUMNS = ("Sale price", "Date sale price starts", "Date sale price ends")
+COLUMNS = ("Type", "SKU", "Parent", "Attribute 1 value(s)", "Attribute 2 value(s)", "Attribute 3 value(s)",
+           "Regular price") + SALE_COLUMNS
+DELTA_HEADER = ["Type", "SKU", "Parent", "Regular price", *SALE_COLUMNS]
+
+# (priorité, valeur) d'une colonne "dernière règle gagnante" sans règle applicable ;
+# les prix de specs_client.json ont la priorité -1, les règles 0, 1, 2...
+NO_RULE = (-2, None)
+
+
+def parse_money(value) -> int:
+    """ "14.90", "14,90", 14.9 -> 1490 centimes ; ValueError au-delà du centime ("1.999")."""
+    text = str(value).strip().replace(",", ".")
+    units, _, cents = text.partition(".")
+    if cents.rstrip("0")[2:] or not (cents or "0").isdigit():
+        raise ValueError(f"montant invalide (2 decimales au plus) : {value}")
+    negative = units.startswith("-")
+    total = abs(int(units or "0")) * 100 + int((cents + "00")[:2])
+    return -total if negative else total
+
+
+def format_money(cents: int) -> str:
+    """1490 -> "14.90", -150 -> "-1.50"."""
+    sign = "-" if cents < 0 else ""
+    units, cents = divmod(abs(cents), 100)
+    return f"{sign}{units}.{cents:02d}"
+
+
+def key(value: str) -> str:
+    """Forme de comparaison des valeurs de dimension (casse et espaces ignorés)."""
+    return value.strip().casefold()
+
+
+class Rule(NamedTuple):
+    kind: str
+    selector: Dict[str, Tuple[str, ...]]  # dimension -> valeurs acceptées (clés de comparaison)
+    value: object                         # centimes, facteur, ou (type de remise, montant) pour "sale"
+    start: str = ""
+    end: str = ""
+
+
+def load_rules(path, campaigns: Sequence[str] = ()) -> List[Rule]:
+    """Règles du fichier dans leur ordre (priorité croissante) ; celles d'une campagne inactive sont écartées."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    rules = []
+    for n, raw in enumerate(data.get("rules", []), start=1):
+        kind = raw.get("kind")
+        if kind not in KINDS:
+            raise ValueError(f"regle {n}: kind doit valoir {', '.join(KINDS)}")
+        if raw.get("campaign") and raw["campaign"] not in campaigns:
+            continue
+        selector = {}
+        for dim in DIMENSIONS:
+            values = raw.get(dim)
+            if values is None or values == "*":
+                continue
+            values = [values] if isinstance(values, str) else values
+            selector[dim] = tuple(key(v) for v in values)
+        if kind in ("base", "override"):
+            value = parse_money(raw["price"])
+        elif kind == "surcharge":
+            value = parse_money(raw["amount"])
+        elif kind == "adjust":
+            value = 1 + float(raw["percent"]) / 100
+        else:
+            given = [k for k in SALE_KEYS if k in raw]
+            if len(given) != 1:
+                raise ValueError(f"regle {n}: une regle sale a exactement une cle parmi {', '.join(SALE_KEYS)}")
+            amount = float(raw["percent"]) if given[0] == "percent" else parse_money(raw[given[0]])
+            value = (given[0], amount)
+        for bound in ("start", "end"):
+            if raw.get(bound):
+                date.fromisoformat(raw[bound])  # ValueError si la date est invalide
+        rules.append(Rule(kind, selector, value, raw.get("start", ""), raw.get("end", "")))
+    return rules
+
+
+# --- Colonnes codées ------------------------------------------------------------
+
+class Dimension(NamedTuple):
+    """Colonne d'une dimension codée en entiers : clé de comparaison -> code, et code de chaque variation."""
+    codes: Dict[str, int]
+    column: List[int]
+
+    def lookup(self, values: Tuple[str, ...]) -> List[int]:
+        """Codes des valeurs présentes (les autres ne concernent aucune variation)."""
+        return [self.codes[v] for v in values if v in self.codes]
+
+
+def encode(column: Sequence[str]) -> Dimension:
+    """Code une colonne : key() n'est appelée qu'une fois par valeur distincte."""
+    codes: Dict[str, int] = {}
+    by_value = {}
+    for value in dict.fromkeys(column):
+        by_value[value] = codes.setdefault(key(value), len(codes))
+    return Dimension(codes, list(map(by_value.__getitem__, column)))
+
+
+class Variations(NamedTuple):
+    skus: List[str]
+    parents: List[str]
+    dims: Dict[str, Dimension]
+    current: Dict[str, List[str]]  # Regular price et colonnes de promo, telles que dans le CSV
+
+
+def load_variations(csv_path) -> Variations:
+    """Colonnes utiles des variations du CSV (les autres lignes sont écartées en un passage)."""
+    present, data = load_columns(csv_path, COLUMNS)
+    Schema(present).require("Type", "SKU", "Parent", "Regular price")
+    types = data["Type"]
+    is_variation = {t: t.lower() == "variation" for t in set(types)}
+    mask = list(map(is_variation.__getitem__, types))
+    n = sum(mask)
+
+    def column(name: str) -> List[str]:
+        return list(compress(data[name], mask)) if name in data else [""] * n
+
+    parents = column("Parent")
+    dims = {
+        "product": encode(parents),
+        "model": encode(column("Attribute 1 value(s)")),
+        "color": encode(column("Attribute 2 value(s)")),
+        "reference": encode(column("Attribute 3 value(s)")),
+    }
+    current = {name: column(name) for name in ("Regular price",) + SALE_COLUMNS}
+    return Variations(column("SKU"), parents, dims, current)
+
+
+# --- Compilation des règles en tables -------------------------------------------
+
+def _keys(rule: Rule, dims: Dict[str, Dimension]) -> Tuple[Tuple[str, ...], List[tuple]]:
+    """(dimensions de la règle, clés de codes concernées : produit cartésien des valeurs choisies)."""
+    group = tuple(d for d in DIMENSIONS if d in rule.selector)
+    keys: List[tuple] = [()]
+    for dim in group:
+        codes = dims[dim].lookup(rule.selector[dim])
+        keys = [k + (c,) for k in keys for c in codes]
+    return group, keys
+
+
+def compile_tables(rules: List[Rule], kind: str, dims: Dict[str, Dimension],
+                   combine=None) -> Dict[Tuple[str, ...], dict]:
+    """
+    Groupe de dimensions -> {clé de codes: valeur} pour les règles de `kind`.
+    Sans `combine`, la dernière règle gagne et la valeur est (priorité, valeur),
+    la valeur d'une règle "sale" étant sa priorité ; sinon les valeurs d'une
+    même clé sont combinées (somme, produit).
+    """
+    tables: Dict[Tuple[str, ...], dict] = {}
+    for priority, rule in enumerate(rules):
+        if rule.kind != kind:
+            continue
+        group, keys = _keys(rule, dims)
+        table = tables.setdefault(group, {})
+        for k in keys:
+            if combine is None:
+                table[k] = (priority, priority if kind == "sale" else rule.value)
+            else:
+                table[k] = combine(table[k], rule.value) if k in table else rule.value
+    return tables
+
+
+def lookup_column(table: dict, group: Tuple[str, ...], dims: Dict[str, Dimension], n: int, default) -> list:
+    """Valeur de la table pour chaque variation, en un seul passage sur les colonnes de codes."""
+    if not group:
+        return [table.get((), default)] * n
+    if len(group) == 1:
+        dimension = dims[group[0]]
+        dense = [table.get((code,), default) for code in range(len(dimension.codes))]
+        return list(map(dense.__getitem__, dimension.column))
+    return list(map(table.get, zip(*(dims[d].column for d in group)), repeat(default)))
+
+
+def _fold(columns: List[list], op, start: list) -> list:
+    result = start
+    for column in columns:
+        result = list(map(op, result, column))
+    return result
+
+
+def _regular(base: tuple, surcharge: int, factor: float, override: tuple) -> Optional[int]:
+    if override[1] is not None:
+        return override[1]
+    if base[1] is None:
+        return None
+    cents = base[1] + surcharge
+    return int(cents * factor + 0.5) if factor != 1 else cents
+
+
+# --- Prix ----------------------------------------------------------------------
+
+def base_column(variations: Variations, products: dict) -> list:
+    """(priorité -1, centimes) du prix de specs_client.json, par (produit, référence)."""
+    dims = variations.dims
+    table = {}
+    for sku, specs in products.items():
+        product_code = dims["product"].codes.get(key(sku))
+        if product_code is None:
+            continue
+        prices = {key(ref): price for ref, price in specs["prices"].items()}
+        first = next(iter(prices.values()), "")
+        for ref, ref_code in dims["reference"].codes.items():
+            price = prices.get(ref, "") if ref else first
+            if price:
+                table[(product_code, ref_code)] = (-1, parse_money(price))
+    return lookup_column(table, ("product", "reference"), dims, len(variations.skus), NO_RULE)
+
+
+def compute_prices(variations: Variations, rules: List[Rule], products: dict) -> Tuple[list, list]:
+    """
+    Prix régulier (centimes, None si inconnu) et règle de promo (indice dans
+    `rules`, None sans promo) de chaque variation.
+    """
+    dims = variations.dims
+    n = len(variations.skus)
+
+    def columns(kind, default, combine=None):
+        return [lookup_column(table, group, dims, n, default)
+                for group, table in compile_tables(rules, kind, dims, combine).items()]
+
+    base = _fold(columns("base", NO_RULE), max, base_column(variations, products))
+    surcharge = _fold(columns("surcharge", 0, operator.add), operator.add, [0] * n)
+    factor = _fold(columns("adjust", 1.0, operator.mul), operator.mul, [1.0] * n)
+    override = _fold(columns("override", NO_RULE), max, [NO_RULE] * n)
+    sale = _fold(columns("sale", NO_RULE), max, [NO_RULE] * n)
+    return list(map(_regular, base, surcharge, factor, override)), list(map(operator.itemgetter(1), sale))
+
+
+def sale_price(regular: int, rule: Rule) -> Optional[int]:
+    """Prix promo en centimes, None s'il n'est pas inférieur au prix régulier (refusé par WooCommerce)."""
+    how, amount = rule.value
+    if how == "price":
+        price = amount
+    elif how == "amount":
+        price = regular - amount
+    else:
+        price = int(regular * (1 - amount / 100) + 0.5)
+    return price if 0 <= price < regular else None
+
+
+def normalize_money(text: str) -> str:
+    """ "14.9" -> "14.90" pour comparer aux prix calculés ; une valeur illisible est gardée telle quelle."""
+    try:
+        return format_money(parse_money(text)) if text.strip() else ""
+    except ValueError:
+        return text
+
+
+def iter_delta(variations: Variations, rules: List[Rule], regular: list, sales: list,
+               report: Optional[Report] = None):
+    """
+    Lignes DELTA_HEADER des variations dont le prix ou la promo change. Une
+    variation sans prix ("sans_prix") ou dont le prix calculé est négatif
+    ("prix_negatif", suppléments négatifs trop grands) n'est pas écrite.
+    """
+
+    @lru_cache(maxsize=None)
+    def fields(price: int, sale: Optional[int]) -> tuple:
+        if sale is not None:
+            rule = rules[sale]
+            promo = sale_price(price, rule)
+            if promo is not None:
+                return format_money(price), format_money(promo), rule.start, rule.end
+        return format_money(price), "", "", ""
+
+    normalize = lru_cache(maxsize=None)(normalize_money)
+    current = variations.current
+    old = zip(map(normalize, current["Regular price"]), map(normalize, current["Sale price"]),
+              current["Date sale price starts"], current["Date sale price ends"])
+    for sku, parent, before, price, sale in zip(variations.skus, variations.parents, old, regular, sales):
+        if price is None:
+            if report is not None:
+                report.add("sans_prix", sku, sku=sku)
+        elif price < 0:
+            if report is not None:
+                report.add("prix_negatif", f"{sku}: {format_money(price)}", sku=sku)
+        else:
+            after = fields(price, sale)
+            if before != after:
+                yield ["variation", sku, parent, *after]
+
+
+def main():
+    exports_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Applique les règles de prix et écrit les variations dont le prix change.")
+    parser.add_argument("--input", type=Path, default=exports_dir / "woocommerce_import_corrige_final.csv")
+    parser.add_argument("--rules", type=Path, default=exports_dir / "pricing_rules.json")
+    parser.add_argument("--campaign", action="append", default=[], help="Campagne à activer (répétable)")
+    parser.add_argument("--output", type=Path, default=exports_dir / "prix_delta.csv")
+    args = parser.parse_args()
+
+    for path in (args.input, args.rules):
+        if not path.exists():
+            print(f"ERREUR: Fichier introuvable : {path}")
+            return
+    try:
+        rules = load_rules(args.rules, args.campaign)
+    except KeyError as e:
+        print(f"ERREUR: Regles invalides ({args.rules.name}) : cle manquante {e}")
+        return
+    except ValueError as e:
+        print(f"ERREUR: Regles invalides ({args.rules.name}) : {e}")
+        return
+    try:
+        variations = load_variations(args.input)
+    except ValueError as e:
+        print(f"ERREUR: {args.input.name} : {e}")
+        return
+
+    report = Report()
+    with stage("transform"):
+        regular, sales = compute_prices(variations, rules, load_catalog()["products"])
+        delta = list(iter_delta(variations, rules, regular, sales, report))
+    with open_csv_writer(args.output, DELTA_HEADER) as writer:
+        writer.writerows(delta)
+
+    on_sale = len(sales) - sales.count(None)
+    print("=" * 80)
+    print("REGLES DE PRIX")
+    print("=" * 80)
+    print()
+    print(f"{len(rules)} regles actives" + (f" (campagnes: {', '.join(args.campaign)})" if args.campaign else ""))
+    print(f"{len(variations.skus)} variations, {on_sale} concernees par une promo")
+    print(f"{len(delta)} variations dont le prix change")
+    report.print_summary({
+        "sans_prix": "variations sans prix de base (produit ou reference absent des specs), ignorees:",
+        "prix_negatif": "variations avec un prix regulier negatif (verifier les supplements), ignorees:",
+    })
+    print()
+    print(f"OK: Delta sauvegarde : {args.output}")
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -1,7 +1,9 @@
-import csv
 import re
 from pathlib import Path
 
+from csv_stream import open_csv, open_csv_writer, read_header
+from instrumentation import run_script
+
 
 def version_to_ref(value: str) -> str:
     """
@@ -27,13 +29,10 @@ def main() -> None:
         if not in_path.exists():
             raise SystemExit(f"Fichier introuvable: {in_path}")
 
-        rows = list(csv.reader(in_path.read_text(encoding="utf-8-sig").splitlines()))
-        if not rows:
+        header = read_header(in_path)
+        if not header:
             raise SystemExit(f"CSV vide: {in_path}")
 
-        header = rows[0]
-        data = rows[1:]
-
         def idx(name: str) -> int:
             try:
                 return header.index(name)
@@ -44,44 +43,41 @@ def main() -> None:
         a3_name_i = idx("Attribute 3 name")
         a3_vals_i = idx("Attribute 3 value(s)")
 
-        out_rows = [header]
-
-        for r in data:
-            rr = r.copy()
-
-            # Attribute 3: rename to client wording + values are JOJO refs
-            rr[a3_name_i] = "Référence"
-
-            if rr[a3_vals_i]:
-                # list (parents): "Version 01, Version 03" etc
-                if "," in rr[a3_vals_i]:
-                    parts = [p.strip() for p in rr[a3_vals_i].split(",")]
-                    parts = [version_to_ref(p) for p in parts if p]
-                    rr[a3_vals_i] = ", ".join(parts)
-                else:
-                    rr[a3_vals_i] = version_to_ref(rr[a3_vals_i])
-
-            # SKU: replace --v01-- with --jojo1015-1--
-            sku = rr[sku_i]
-            if "--v" in sku:
-                sku = re.sub(
-                    r"--v(\d{1,2})--",
-                    lambda m: f"--jojo1015-{int(m.group(1))}--",
-                    sku,
-                    flags=re.IGNORECASE,
-                )
-                rr[sku_i] = sku
-
-            out_rows.append(rr)
-
         out_path = in_path.with_name(in_path.stem + "_refs.csv")
-        with out_path.open("w", encoding="utf-8-sig", newline="") as f:
-            w = csv.writer(f)
-            w.writerows(out_rows)
-
-        print(f"Wrote {out_path} ({len(out_rows)-1} lignes).")
+        count = 0
+
+        with open_csv_writer(out_path, header) as w:
+            with open_csv(in_path) as (_, data):
+                for rr in data:
+                    # Attribute 3: rename to client wording + values are JOJO refs
+                    rr[a3_name_i] = "Référence"
+
+                    if rr[a3_vals_i]:
+                        # list (parents): "Version 01, Version 03" etc
+                        if "," in rr[a3_vals_i]:
+                            parts = [p.strip() for p in rr[a3_vals_i].split(",")]
+                            parts = [version_to_ref(p) for p in parts if p]
+                            rr[a3_vals_i] = ", ".join(parts)
+                        else:
+                            rr[a3_vals_i] = version_to_ref(rr[a3_vals_i])
+
+                    # SKU: replace --v01-- with --jojo1015-1--
+                    sku = rr[sku_i]
+                    if "--v" in sku:
+                        sku = re.sub(
+                            r"--v(\d{1,2})--",
+                            lambda m: f"--jojo1015-{int(m.group(1))}--",
+                            sku,
+                            flags=re.IGNORECASE,
+                        )
+                        rr[sku_i] = sku
+
+                    w.writerow(rr)
+                    count += 1
+
+        print(f"Wrote {out_path} ({count} lignes).")
 
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
 
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compte rendu des scripts de exports/ : compteurs, exemples bornés, détail en JSON Lines.
+
+Au lieu d'afficher un bloc de lignes par ligne corrigée ou par problème
+trouvé (illisible et coûteux en entrées/sorties sur un gros catalogue),
+un script déclare chaque événement au Report :
+
+- un compteur par type d'événement ;
+- les `samples` premiers messages de chaque type, gardés pour le résumé ;
+- le détail complet, écrit au fil de l'eau dans un fichier JSON Lines
+  (une ligne par événement) au travers d'un tampon d'écriture.
+
+À la fin, le script n'affiche qu'un résumé : nombres et quelques exemples.
+
+    with open_report(exports_dir / "corrections_images.jsonl") as report:
+        for ...:
+            report.add("correction", f"{sku}: {old} -> {new}", sku=sku, old=old, new=new)
+    print(f"{report.total('correction')} corrections")
+    report.print_samples("correction")
+"""
+
+import json
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from csv_stream import open_output
+
+DEFAULT_SAMPLES = 5
+
+
+class Report:
+    """Compteurs et exemples par type d'événement ; détail optionnel dans un fichier JSON Lines."""
+
+    def __init__(self, details: Optional[TextIO] = None, samples: int = DEFAULT_SAMPLES,
+                 details_path=None):
+        self.details = details
+        self.details_path = details_path
+        self.sample_size = samples
+        self.counts: Counter = Counter()
+        self.samples: Dict[str, List[str]] = {}
+        self._dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def add(self, kind: str, message: str, **fields) -> None:
+        """Enregistre un événement : compté, gardé en exemple s'il reste de la place, écrit dans le détail."""
+        self.counts[kind] += 1
+        samples = self.samples.get(kind)
+        if samples is None:
+            samples = self.samples[kind] = []
+        if len(samples) < self.sample_size:
+            samples.append(message)
+        if self.details is not None:
+            self.details.write(self._dumps({"type": kind, "message": message, **fields}) + "\n")
+
+    def count(self, kind: str, n: int = 1) -> None:
+        """Compteur seul (lignes lues, lignes écrites...), sans exemple ni détail."""
+        self.counts[kind] += n
+
+    def total(self, kind: str) -> int:
+        return self.counts[kind]
+
+    def print_samples(self, kind: str, indent: str = "  ") -> None:
+        """Affiche les exemples gardés pour `kind`, puis le nombre d'événements non affichés."""
+        samples = self.samples.get(kind, [])
+        for message in samples:
+            print(f"{indent}- {message}")
+        hidden = self.counts[kind] - len(samples)
+        if hidden > 0:
+            print(f"{indent}... et {hidden} autres")
+
+    def print_summary(self, labels: Dict[str, str], indent: str = "  ") -> int:
+        """
+        Pour chaque type de `labels` (type -> libellé) rencontré au moins une fois :
+        « ATTENTION: N libellé » puis ses exemples. Renvoie le nombre d'événements affichés.
+        """
+        shown = 0
+        for kind, label in labels.items():
+            n = self.counts[kind]
+            if n:
+                print(f"ATTENTION: {n} {label}")
+                self.print_samples(kind, indent)
+                shown += n
+        return shown
+
+    # --- Reprise (voir checkpoint.py) ----------------------------------------
+
+    def state(self) -> dict:
+        return {"counts": dict(self.counts), "samples": self.samples}
+
+    def restore(self, state: dict) -> None:
+        self.counts = Counter(state["counts"])
+        self.samples = {kind: list(messages) for kind, messages in state["samples"].items()}
+
+
+@contextmanager
+def open_report(details_path=None, samples: int = DEFAULT_SAMPLES) -> Iterator[Report]:
+    """
+    Report dont le détail est écrit dans `details_path` (de façon atomique, voir
+    csv_stream.open_output) ; sans chemin, seuls compteurs et exemples sont gardés.
+    """
+    if details_path is None:
+        yield Report(samples=samples)
+        return
+    with open_output(details_path, encoding="utf-8") as f:
+        yield Report(f, samples, details_path)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Registre des SKU de variation, partagé par generer_csv_complet.py et
+generer_csv_sans_reference.py.
+
+Un SKU de variation assemble le SKU parent et un morceau par dimension :
+"impexo-magnetic--jojo1015-6--pro-max--or-desert". Chaque valeur distincte
+(modèle, couleur, référence) n'est convertie qu'une fois (slug gardé en
+cache) : accents retirés par une table str.translate complète, minuscules,
+espaces remplacés par des tirets ("Doré" -> "dore", "Or désert" -> "or-desert").
+
+Les collisions se vérifient sur les valeurs, sans développer les lignes du
+catalogue : tant qu'aucun morceau ne contient "--" (ni ne commence ou ne finit
+par "-"), un SKU de variation se découpe d'une seule façon, donc
+
+- deux variations d'un même produit ont le même SKU si et seulement si deux
+  valeurs distinctes d'une dimension ont le même morceau ("Doré" et "Dore") ;
+- une variation a le SKU d'un autre produit parent si ce SKU parent est le
+  SKU du produit suivi de "--" et de morceaux existants.
+
+Ces cas, et les morceaux ambigus, sont des collisions : l'import WooCommerce
+échouerait ou mélangerait les lignes, le générateur s'arrête avant d'écrire
+le CSV. La vérification coûte O(nombre de valeurs), pas O(nombre de variations).
+
+Le registre garde, pour la dernière génération de chaque format de SKU, les
+morceaux de chaque produit (morceau -> valeur par dimension) dans
+sku_registry.json. Un morceau qui désignait une autre valeur lors de la
+génération précédente (couleur renommée "Doré" -> "DORÉ") est signalé comme
+réattribué : WooCommerce mettra à jour les variations existantes.
+
+Usage (dans un générateur, avant d'écrire le CSV):
+    registry = check_catalog(exports_dir / REGISTRY_FILE, SPECS_CLIENT, MODELS, SKU_DIMENSIONS)
+    if registry is None:
+        return  # collisions affichées
+    ...
+    registry.save()
+    registry.print_summary()
+"""
+
+import json
+import unicodedata
+from functools import lru_cache
+from math import prod
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+from csv_stream import open_output
+from reporting import Report
+
+REGISTRY_FILE = "sku_registry.json"
+REGISTRY_VERSION = 2
+
+# Séparateur des morceaux d'un SKU de variation
+SEPARATOR = "--"
+
+# Préfixe retiré du modèle dans le SKU ("iPhone 17 Pro Max" -> "pro-max")
+MODEL_PREFIX = "iPhone 17 "
+
+LABELS = {
+    "collision": "SKU en collision (valeurs differentes donnant le meme SKU):",
+    "reattribue": "Morceaux de SKU designant une autre valeur lors de la generation precedente:",
+}
+
+DIMENSION_LABELS = {"reference": "reference", "model": "modele", "color": "couleur"}
+
+# Morceaux d'un produit : dimension -> (morceau -> valeur)
+Parts = Dict[str, Dict[str, str]]
+
+
+def _fold_table() -> Dict[int, str]:
+    """Lettres latines accentuées -> lettres ASCII (décomposition Unicode, plus les ligatures)."""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+        if base != char and base.isascii():
+            table[code] = base
+    for char, base in {"Æ": "AE", "æ": "ae", "Œ": "OE", "œ": "oe", "ß": "ss", "Ø": "O", "ø": "o",
+                       "Đ": "D", "đ": "d", "Ł": "L", "ł": "l"}.items():
+        table[ord(char)] = base
+    return table
+
+
+FOLD = str.maketrans(_fold_table())
+
+
+@lru_cache(maxsize=None)
+def slug(value: str) -> str:
+    """Morceau de SKU d'une valeur ("Or désert" -> "or-desert", "JOJO1015-6" -> "jojo1015-6")"""
+    return value.translate(FOLD).lower().replace(" ", "-")
+
+
+@lru_cache(maxsize=None)
+def model_slug(model: str) -> str:
+    """Partie Modèle du SKU (ex: "iPhone 17 Pro Max" -> "pro-max", "iPhone 17" -> "iphone-17")"""
+    return slug(model.replace(MODEL_PREFIX, ""))
+
+
+def color_slug(color: str) -> str:
+    """Partie Couleur du SKU (ex: "Vert sombre" -> "vert-sombre")"""
+    return slug(color)
+
+
+
+
+# Fonction de morceau de chaque dimension
+SLUGS = {"reference": slug, "model": model_slug, "color": color_slug}
+
+
+def variation_sku(product_sku: str, parts: Sequence[str]) -> str:
+    """SKU d'une variation à partir des morceaux, dans l'ordre des dimensions"""
+    return SEPARATOR.join((product_sku, *parts))
+
+
+def _ambiguous(part: str) -> bool:
+    """Morceau qui permettrait de découper un SKU de plusieurs façons ("", "a--b", "-a", "a-")"""
+    return SEPARATOR in f"-{part}-"
+
+
+class SkuRegistry:
+    """Morceaux de SKU par produit et par dimension, vérifiés à chaque génération."""
+
+    def __init__(self, path=None, dimensions: Sequence[str] = ("model", "color"),
+                 known: Optional[Dict[str, Parts]] = None, saved: Optional[dict] = None):
+        self.path = Path(path) if path is not None else None
+        self.dimensions = tuple(dimensions)
+        self.known: Dict[str, Parts] = known or {}   # génération précédente
+        self.parts: Dict[str, Parts] = {}            # cette génération
+        self.count = 0                                # SKU de cette génération, parents compris
+        self.report = Report()
+        self._saved = saved or {}                     # fichier lu (autres formats de SKU)
+
+    @property
+    def layout(self) -> str:
+        """Format de SKU ("reference--model--color"), clé du registre enregistré"""
+        return SEPARATOR.join(self.dimensions)
+
+    @classmethod
+    def open(cls, path, dimensions: Sequence[str]) -> "SkuRegistry":
+        """Registre enregistré dans `path` (vide si le fichier manque ou n'est pas lisible)."""
+        registry = cls(path, dimensions)
+        try:
+            data = json.loads(registry.path.read_text(encoding="utf-8"))
+            if data.get("version") == REGISTRY_VERSION:
+                registry._saved = data
+                registry.known = data["layouts"].get(registry.layout, {})
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        return registry
+
+    def check_product(self, product_sku: str, values: Dict[str, Iterable[str]]) -> int:
+        """
+        Vérifie les morceaux de chaque dimension d'un produit (`values` : dimension
+        -> valeurs) et compte ses SKU. Renvoie le nombre de collisions trouvées.
+        """
+        before = self.report.total("collision")
+        known = self.known.get(product_sku, {})
+        parts: Parts = {}
+        for dimension in self.dimensions:
+            slug_of, label = SLUGS[dimension], DIMENSION_LABELS[dimension]
+            seen: Dict[str, str] = {}
+            for value in values[dimension]:
+                part = slug_of(value)
+                first = seen.setdefault(part, value)
+                if first != value:
+                    self.report.add("collision", f"{product_sku}: {label} {first} et {value} -> {part}",
+                                    sku=product_sku)
+            for part, value in seen.items():
+                if _ambiguous(part):
+                    self.report.add("collision", f"{product_sku}: {label} {value} -> morceau ambigu '{part}'",
+                                    sku=product_sku)
+                previous = known.get(dimension, {}).get(part)
+                if previous is not None and previous != value:
+                    self.report.add("reattribue", f"{product_sku}: {label} {part}: {previous} -> {value}",
+                                    sku=product_sku)
+            parts[dimension] = seen
+        self.parts[product_sku] = parts
+        self.count += 1 + prod(len(seen) for seen in parts.values())
+        return self.report.total("collision") - before
+
+    def check_parents(self) -> int:
+        """
+        Vérifie qu'aucun SKU parent n'est le SKU d'une variation d'un autre produit
+        (SKU du produit, "--", puis un morceau existant par dimension). Renvoie le
+        nombre de collisions trouvées.
+        """
+        before = self.report.total("collision")
+        for product_sku in self.parts:
+            start = product_sku.find(SEPARATOR)
+            while start != -1:
+                owner = product_sku[:start]
+                parts = self.parts.get(owner)
+                if parts is not None:
+                    rest = product_sku[start + len(SEPARATOR):].split(SEPARATOR)
+                    if len(rest) == len(self.dimensions) and all(
+                            part in parts[dimension] for part, dimension in zip(rest, self.dimensions)):
+                        values = [parts[dimension][part] for part, dimension in zip(rest, self.dimensions)]
+                        self.report.add("collision", f"{product_sku}: {' / '.join([owner, *values])} "
+                                                     f"et produit parent {product_sku}", sku=product_sku)
+                start = product_sku.find(SEPARATOR, start + 1)
+        return self.report.total("collision") - before
+
+    def print_summary(self, indent: str = "  ") -> int:
+        """Affiche collisions et réattributions ; renvoie le nombre de collisions."""
+        self.report.print_summary(LABELS, indent)
+        return self.report.total("collision")
+
+    def save(self) -> None:
+        """Remplace les morceaux enregistrés pour ce format de SKU par ceux de cette génération."""
+        if self.path is None:
+            return
+        layouts = dict(self._saved.get("layouts", {}))
+        layouts[self.layout] = self.parts
+        with open_output(self.path, encoding="utf-8") as f:
+            json.dump({"version": REGISTRY_VERSION, "layouts": layouts}, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def check_catalog(path, specs_client: dict, models: Sequence[str],
+                  dimensions: Sequence[str]) -> Optional[SkuRegistry]:
+    """
+    Vérifie les morceaux de SKU de tout le catalogue avant la génération. En cas
+    de collision, les affiche et renvoie None : le CSV ne doit pas être écrit.
+    """
+    registry = SkuRegistry.open(path, dimensions)
+    collisions = 0
+    for product_sku, specs in specs_client.items():
+        values = {"reference": specs["references"], "model": models, "color": specs["colors"]}
+        collisions += registry.check_product(product_sku, values)
+    collisions += registry.check_parents()
+    if collisions:
+        registry.print_summary()
+        print("ERREUR: CSV non genere, corriger les valeurs en collision dans specs_client.json")
+        return None
+    return registry
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Couverture des combinaisons Modèle × Couleur × Référence d'un produit.
+
+Chaque dimension des specs reçoit des codes entiers (0..n-1) et la couverture
+est un cube de booléens à plat (bytearray, une case par combinaison attendue)
+au lieu de deux ensembles de tuples de chaînes :
+
+    cube = CoverageCube(MODELS, [normalize_color(c) for c in specs["colors"]], specs["references"])
+    for v in variations:
+        cube.mark(v.model, normalize_color(v.color), v.ref)
+    cube.missing_count()     # combinaisons attendues absentes (bytearray.count, en C)
+    cube.iter_missing()      # ... détaillées, dans l'ordre des specs
+    cube.extras              # combinaisons présentes hors specs, dans l'ordre du CSV
+
+La mémoire est d'un octet par combinaison attendue, et les combinaisons
+manquantes sont trouvées par bytearray.count / bytearray.find.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+Combo = Tuple[str, str, str]
+
+
+def _codes(values: Iterable[str]) -> Dict[str, int]:
+    codes: Dict[str, int] = {}
+    for value in values:
+        codes.setdefault(value, len(codes))
+    return codes
+
+
+class CoverageCube:
+    """Combinaisons attendues (produit cartésien des specs) et combinaisons vues."""
+
+    __slots__ = ("models", "colors", "refs", "_model_codes", "_color_codes", "_ref_codes",
+                 "_cells", "extras")
+
+    def __init__(self, models: Iterable[str], colors: Iterable[str], refs: Iterable[str]):
+        self._model_codes = _codes(models)
+        self._color_codes = _codes(colors)
+        self._ref_codes = _codes(refs)
+        # Valeurs distinctes, dans l'ordre des specs (indice = code)
+        self.models: List[str] = list(self._model_codes)
+        self.colors: List[str] = list(self._color_codes)
+        self.refs: List[str] = list(self._ref_codes)
+        self._cells = bytearray(len(self.models) * len(self.colors) * len(self.refs))
+        # Combinaisons hors specs (dict utilisé comme ensemble ordonné)
+        self.extras: Dict[Combo, None] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self._cells)
+
+    def mark(self, model: str, color: str, ref: str) -> bool:
+        """Marque une combinaison présente ; renvoie False si elle est hors specs."""
+        m = self._model_codes.get(model)
+        c = self._color_codes.get(color)
+        r = self._ref_codes.get(ref)
+        if m is None or c is None or r is None:
+            self.extras[(model, color, ref)] = None
+            return False
+        self._cells[(m * len(self.colors) + c) * len(self.refs) + r] = 1
+        return True
+
+    def missing_count(self) -> int:
+        return self._cells.count(0)
+
+    def covered_count(self) -> int:
+        return self.size - self.missing_count()
+
+    def iter_missing(self) -> Iterator[Combo]:
+        """Combinaisons attendues jamais marquées, dans l'ordre Modèle, Couleur, Référence."""
+        cells = self._cells
+        n_colors = len(self.colors)
+        n_refs = len(self.refs)
+        i = cells.find(0)
+        while i >= 0:
+            mc, r = divmod(i, n_refs)
+            m, c = divmod(mc, n_colors)
+            yield self.models[m], self.colors[c], self.refs[r]
+            i = cells.find(0, i + 1)
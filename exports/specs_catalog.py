@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Chargement des spécifications client (specs_client.json) partagé par les
+générateurs et les vérificateurs.
+
+Le catalogue n'existe plus qu'à un seul endroit. Après la première lecture,
+il est conservé sous forme compilée (marshal) dans __pycache__/, dans un
+fichier dont le nom contient le hash du contenu du JSON : les exécutions
+suivantes sautent le parsing JSON, et toute modification du fichier produit
+un nouveau cache.
+
+    CATALOG = load_catalog()
+    SPECS_CLIENT = CATALOG["products"]   # {sku_parent: {name, short_desc, desc, references, colors, prices}}
+    MODELS = CATALOG["models"]
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+from pathlib import Path
+
+CATALOG_PATH = Path(__file__).with_name("specs_client.json")
+CACHE_DIR = Path(__file__).with_name("__pycache__")
+
+REQUIRED_PRODUCT_KEYS = ("name", "short_desc", "desc", "references", "colors", "prices")
+
+
+def _cache_path(path: Path, digest: str) -> Path:
+    # Le format marshal dépend de la version de Python : elle fait partie du nom
+    return CACHE_DIR / f"{path.stem}.{digest[:16]}.{sys.implementation.cache_tag}.marshal"
+
+
+def _validate(catalog: dict, path: Path) -> None:
+    if not isinstance(catalog.get("models"), list) or not isinstance(catalog.get("products"), dict):
+        raise ValueError(f"{path.name}: les clés 'models' (liste) et 'products' (objet) sont obligatoires")
+    for sku, specs in catalog["products"].items():
+        missing = [k for k in REQUIRED_PRODUCT_KEYS if k not in specs]
+        if missing:
+            raise ValueError(f"{path.name}: produit {sku} sans {', '.join(missing)}")
+        unpriced = [ref for ref in specs["references"] if ref not in specs["prices"]]
+        if unpriced:
+            raise ValueError(f"{path.name}: produit {sku} sans prix pour {', '.join(unpriced)}")
+
+
+def load_catalog(path=CATALOG_PATH) -> dict:
+    """Charge le catalogue depuis le cache compilé, ou depuis le JSON si le contenu a changé."""
+    path = Path(path)
+    data = path.read_bytes()
+    cache_path = _cache_path(path, hashlib.sha256(data).hexdigest())
+
+    try:
+        with open(cache_path, "rb") as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    catalog = json.loads(data.decode("utf-8"))
+    _validate(catalog, path)
+
+    # Écriture best-effort : un dossier en lecture seule ne doit pas empêcher le chargement
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        for old in CACHE_DIR.glob(f"{path.stem}.*.marshal"):
+            old.unlink()
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            marshal.dump(catalog, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+    return catalog
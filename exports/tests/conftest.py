@@ -0,0 +1,8 @@
+"""Les scripts de exports/ s'importent entre eux par leur nom de module : exports/ est mis dans sys.path."""
+
+import sys
+from pathlib import Path
+
+EXPORTS_DIR = Path(__file__).resolve().parent.parent
+if str(EXPORTS_DIR) not in sys.path:
+    sys.path.insert(0, str(EXPORTS_DIR))
@@ -0,0 +1,79 @@
+import csv
+
+import pytest
+
+from checkpoint import Checkpoint
+
+HEADER = ["SKU", "Description"]
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_input(path, n):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(n):
+            # Champs sur plusieurs lignes physiques : la position de reprise doit rester juste
+            writer.writerow([f"sku-{i}", f"ligne 1\nligne 2, \"{i}\"" if i % 3 == 0 else f"desc {i}"])
+
+
+def transform(in_path, out_path, resume=False, stop_after=None, every=4):
+    """Met le SKU en majuscules ; s'interrompt après `stop_after` lignes de cette exécution."""
+    with Checkpoint(in_path, {"out": out_path}, resume=resume, every=every) as ckpt:
+        state = ckpt.state or {"count": 0}
+        writer = csv.writer(ckpt.files["out"])
+        if not ckpt.resumed:
+            writer.writerow(ckpt.header)
+        for done, row in enumerate(ckpt.rows(), start=1):
+            row[0] = row[0].upper()
+            writer.writerow(row)
+            state["count"] += 1
+            ckpt.tick(lambda: state)
+            if stop_after is not None and done == stop_after:
+                raise Interrupted
+        return ckpt.resumed, state["count"]
+
+
+def test_resume_after_interruption_matches_uninterrupted_run(tmp_path):
+    in_path = tmp_path / "in.csv"
+    write_input(in_path, 23)
+    expected = tmp_path / "expected.csv"
+    transform(in_path, expected)
+
+    out = tmp_path / "out.csv"
+    with pytest.raises(Interrupted):
+        transform(in_path, out, stop_after=10)  # point de reprise après 8 lignes
+    assert not out.exists()
+    resumed, count = transform(in_path, out, resume=True)
+
+    assert resumed
+    assert count == 23  # l'état enregistré (8) plus les 15 lignes restantes
+    assert out.read_bytes() == expected.read_bytes()
+    assert not list(tmp_path.glob(".out.csv.*"))
+
+
+def test_resume_ignored_when_input_changed(tmp_path):
+    in_path = tmp_path / "in.csv"
+    write_input(in_path, 12)
+    out = tmp_path / "out.csv"
+    with pytest.raises(Interrupted):
+        transform(in_path, out, stop_after=6)
+
+    write_input(in_path, 13)
+    resumed, count = transform(in_path, out, resume=True)
+
+    assert not resumed
+    assert count == 13
+    expected = tmp_path / "expected.csv"
+    transform(in_path, expected)
+    assert out.read_bytes() == expected.read_bytes()
+
+
+def test_resume_without_checkpoint_starts_over(tmp_path):
+    in_path = tmp_path / "in.csv"
+    write_input(in_path, 5)
+    resumed, count = transform(in_path, tmp_path / "out.csv", resume=True)
+    assert (resumed, count) == (False, 5)
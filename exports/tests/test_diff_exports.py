@@ -0,0 +1,69 @@
+import csv
+
+import pytest
+
+import diff_exports
+from diff_exports import diff_exports as run_diff
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def read_report(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    return rows[0], rows[1:]
+
+
+@pytest.fixture
+def exports(tmp_path):
+    old = tmp_path / "old.csv"
+    new = tmp_path / "new.csv"
+    write_csv(old, ["SKU", "Price", "Images"], [
+        [f"sku-{i:03d}", str(i), f"img-{i}.jpg"] for i in range(200)
+    ] + [["dup", "1", "a"], ["dup", "2", "b"], ["gone", "9", "x"]])
+    # Colonnes dans un autre ordre, une colonne en plus ; prix changés, SKU ajoutés
+    write_csv(new, ["Images", "SKU", "Price", "Stock"], [
+        [f"img-{i}.jpg", f"sku-{i:03d}", str(i + (i % 7 == 0)), ""] for i in reversed(range(200))
+    ] + [["a", "dup", "1", ""], ["b2", "dup", "2", ""], ["b3", "dup", "3", ""], ["n", "new", "5", ""]])
+    return old, new
+
+
+def test_sort_merge_matches_hash_join(tmp_path, exports, monkeypatch):
+    old, new = exports
+    hashed = run_diff(old, new, tmp_path / "hash.csv", strategy="hash")
+
+    # Paquets minuscules et fusion en plusieurs niveaux
+    monkeypatch.setattr(diff_exports, "MERGE_FAN_IN", 3)
+    differ = diff_exports.ExportDiff(["SKU", "Price", "Images"], ["Images", "SKU", "Price", "Stock"])
+    report = tmp_path / "sort.csv"
+    with diff_exports.open_csv_writer(report, diff_exports.REPORT_HEADER) as writer:
+        differ.sort_merge(old, new, writer, memory_bytes=2048)
+
+    assert differ._runs_created > 2 * diff_exports.MERGE_FAN_IN
+    assert differ.counts == hashed.counts
+    hash_header, hash_rows = read_report(tmp_path / "hash.csv")
+    sort_header, sort_rows = read_report(report)
+    assert hash_header == sort_header == diff_exports.REPORT_HEADER
+    assert sorted(hash_rows) == sorted(sort_rows)
+    # Le tri externe rend le rapport dans l'ordre des SKU
+    assert [r[1] for r in sort_rows] == sorted(r[1] for r in sort_rows)
+    assert not list(tmp_path.glob(".diff-*"))
+
+
+def test_counts_and_duplicate_pairing(tmp_path, exports):
+    old, new = exports
+    differ = run_diff(old, new, tmp_path / "report.csv", strategy="sort", memory_mb=1)
+    _, rows = read_report(tmp_path / "report.csv")
+
+    changed_prices = sum(1 for i in range(200) if i % 7 == 0)
+    assert differ.counts[diff_exports.ADDED] == 2  # 3e "dup" et "new"
+    assert differ.counts[diff_exports.REMOVED] == 1  # "gone"
+    assert differ.counts[diff_exports.CHANGED] == changed_prices + 1  # 2e "dup" : Images b -> b2
+    assert ["modifie", "dup", "Images", "b", "b2"] in rows
+    assert differ.only_new == ["Stock"]
+    assert differ.changed_columns["Price"] == changed_prices
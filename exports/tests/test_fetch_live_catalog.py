@@ -0,0 +1,48 @@
+from fetch_live_catalog import iter_live_rows
+from generer_csv_complet import HEADER
+from reporting import Report
+from woo_schema import Schema
+
+NAME = HEADER.index("Attribute 1 name")
+
+
+def product(attributes, variations=(101,)):
+    return {"id": 1, "sku": "impexo-a", "name": "A", "type": "variable",
+            "attributes": attributes, "variations": list(variations)}
+
+
+def global_model(**extra):
+    return dict({"id": 3, "name": "pa_modele", "visible": True, "variation": True, "options": [21, 22]}, **extra)
+
+
+TERMS = {"label": "Modèle", "terms": [{"id": 21, "name": "iPhone 17", "slug": "iphone-17"},
+                                      {"id": 22, "name": "iPhone 17 Pro", "slug": "iphone-17-pro"}]}
+
+VARIATION = {"id": 101, "sku": "impexo-a--pro--noir", "regular_price": "29.90",
+             "attributes": [{"id": 0, "name": "pa_modele", "option": "iphone-17-pro"},
+                            {"id": 0, "name": "couleur", "option": "Noir"}]}
+
+COLOR = {"id": 0, "name": "Couleur", "visible": True, "variation": True, "options": ["Noir", "Bleu"]}
+
+
+def rows_of(attributes):
+    report = Report()
+    rows = list(iter_live_rows([(product(attributes), [VARIATION])], report))
+    parent, variation = Schema(HEADER).views(rows)
+    return parent, variation, report
+
+
+def test_global_attribute_terms_become_names():
+    parent, variation, report = rows_of([global_model(**TERMS), COLOR])
+    assert parent.row[NAME:NAME + 4] == ["Modèle", "iPhone 17, iPhone 17 Pro", "1", "1"]
+    assert (variation.model, variation.color) == ("iPhone 17 Pro", "Noir")
+    assert variation.row[NAME] == "Modèle"
+    assert report.total("attribut_global") == 0
+
+
+def test_global_attribute_without_terms_is_reported():
+    parent, variation, report = rows_of([global_model(), COLOR])
+    assert parent.row[NAME:NAME + 2] == ["pa_modele", "21, 22"]
+    assert variation.row[NAME + 1] == "iphone-17-pro"
+    assert variation.color == "Noir"
+    assert report.total("attribut_global") == 1
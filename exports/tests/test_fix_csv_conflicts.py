@@ -0,0 +1,107 @@
+import csv
+import json
+from functools import partial
+
+import pytest
+
+import checkpoint
+from fix_csv_conflicts import make_stage, resolve_conflicts
+from pipeline import Pipeline
+
+HEADER = ["Type", "SKU", "Parent", "Regular price",
+          "Attribute 1 name", "Attribute 1 value(s)", "Attribute 2 name", "Attribute 2 value(s)"]
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_input(path):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for p in range(3):
+            writer.writerow(["variable", f"p{p}", "", "", "Modèle", "", "Couleur", ""])
+            for i in range(6):
+                # Deux variations par combinaison, prix différents
+                writer.writerow(["variation", f"p{p}-v{i}", f"p{p}", f"{20 - i}.90",
+                                 "Modèle", f"iPhone 17 {i % 3}", "Couleur", "Noir"])
+
+
+@pytest.fixture
+def interrupt_after(monkeypatch):
+    """Interrompt resolve_conflicts après `n` lignes (points de reprise toutes les 4 lignes)."""
+    def install(n):
+        original = checkpoint.Checkpoint.tick
+
+        def tick(self, get_state):
+            original(self, get_state)
+            if self.rows_done == n:
+                raise Interrupted
+
+        monkeypatch.setattr(checkpoint.Checkpoint, "tick", tick)
+        return lambda: monkeypatch.setattr(checkpoint.Checkpoint, "tick", original)
+    return install
+
+
+def run(tmp_path, policy, resume=False):
+    return resolve_conflicts(tmp_path / "in.csv", tmp_path / "out.csv", tmp_path / "report.csv",
+                             policy, resume, checkpoint_every=4)
+
+
+def test_resume_with_same_policy(tmp_path, interrupt_after):
+    write_input(tmp_path / "in.csv")
+    expected = run(tmp_path, "lowest-price")
+    expected_bytes = (tmp_path / "out.csv").read_bytes()
+    (tmp_path / "out.csv").unlink()
+
+    restore = interrupt_after(10)
+    with pytest.raises(Interrupted):
+        run(tmp_path, "lowest-price")
+    restore()
+    assert run(tmp_path, "lowest-price", resume=True) == expected
+    assert (tmp_path / "out.csv").read_bytes() == expected_bytes
+
+
+def test_resume_with_other_policy_rejected(tmp_path, interrupt_after):
+    write_input(tmp_path / "in.csv")
+    restore = interrupt_after(10)
+    with pytest.raises(Interrupted):
+        run(tmp_path, "lowest-price")
+    restore()
+
+    with pytest.raises(ValueError, match="--policy lowest-price"):
+        run(tmp_path, "first", resume=True)
+    assert not (tmp_path / "out.csv").exists()
+
+    # Le point de reprise reste utilisable avec la bonne politique
+    stats = run(tmp_path, "lowest-price", resume=True)
+    assert stats["kept"] == 9 and stats["conflicts"] == 9
+
+
+@pytest.mark.parametrize("policy", ["first", "last", "lowest-price"])
+def test_pipeline_stage_matches_main(tmp_path, policy):
+    # Entrée produit par produit (parent puis ses variations) : parents regroupés en tête à la sortie
+    write_input(tmp_path / "in.csv")
+    run(tmp_path, policy)
+    pipeline = Pipeline().add_stage("conflits", partial(make_stage, policy=policy))
+    written = pipeline.run(tmp_path / "in.csv", tmp_path / "pipeline.csv")
+
+    assert written == 3 + 9
+    assert pipeline.stages[0].rows_out == written
+    assert (tmp_path / "pipeline.csv").read_bytes() == (tmp_path / "out.csv").read_bytes()
+
+
+def test_checkpoint_keeps_winners_out_of_state(tmp_path, interrupt_after):
+    write_input(tmp_path / "in.csv")
+    restore = interrupt_after(14)
+    with pytest.raises(Interrupted):
+        run(tmp_path, "lowest-price")
+    restore()
+
+    saved = json.loads((tmp_path / ".out.csv.checkpoint.json").read_text(encoding="utf-8"))
+    assert "winners" not in saved["state"]
+    # Journal : une ligne par clé modifiée depuis le point de reprise précédent
+    journal = (tmp_path / ".out.csv.winners.partial").read_bytes()[:saved["outputs"]["winners"]]
+    keys = [tuple(json.loads(line)[:3]) for line in journal.decode("utf-8").splitlines()]
+    assert len(keys) > len(set(keys)) and len(set(keys)) == 6
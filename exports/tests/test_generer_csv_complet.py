@@ -0,0 +1,73 @@
+import csv
+import io
+
+import pytest
+
+from catalog_shards import generate_sharded
+from csv_stream import LINE_END, format_csv_field, format_csv_row, read_header
+from generer_csv_complet import HEADER, MODELS, iter_product_lines, iter_product_rows
+
+# Valeurs qui demandent des guillemets : guillemet, virgule, retour à la ligne
+SPECS = {
+    'impexo-"quote"': {
+        "name": 'Coque "Magnetic", édition 2',
+        "short_desc": "Courte",
+        "desc": "Ligne 1\nLigne 2, avec virgule\r\n\"fin\"",
+        "references": ["JOJO1015-6", 'REF "7"', "REF, 8"],
+        "colors": ["Noir", "Or désert", 'Vert "sombre"', "Bleu,\nclair"],
+        "prices": {"JOJO1015-6": "29.90", 'REF "7"': "1,5", "REF, 8": ""},
+    },
+    # Seul un morceau de SKU (la référence) demande des guillemets
+    "impexo-ref": {
+        "name": "Ref",
+        "short_desc": " espace devant",
+        "desc": "",
+        "references": ["JOJO,1", "JOJO2"],
+        "colors": [" Noir ", "Rouge\rvif"],
+        "prices": {"JOJO,1": "", "JOJO2": "9.90"},
+    },
+    "impexo-simple": {
+        "name": "Simple",
+        "short_desc": "",
+        "desc": "",
+        "references": ["JOJO1010-1"],
+        "colors": ["Noir"],
+        "prices": {"JOJO1010-1": "19.90"},
+    },
+}
+
+
+def writer_output(rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("value", ["", "a", "a,b", 'a"b', "a\nb", "a\rb", " a ", '"', ",", "é"])
+def test_format_csv_field_matches_writer(value):
+    line = format_csv_row(["x", value, "y"])
+    assert line == f"x,{format_csv_field(value)},y{LINE_END}"
+
+
+def test_lines_equal_csv_writer_output():
+    for product_sku, specs in SPECS.items():
+        rows = list(iter_product_rows(product_sku, specs))
+        assert "".join(iter_product_lines(product_sku, specs)) == writer_output(rows)
+        assert list(csv.reader(io.StringIO(writer_output(rows)))) == rows
+
+
+def test_shard_without_parent():
+    product_sku, specs = next(iter(SPECS.items()))
+    rows = list(iter_product_rows(product_sku, specs, MODELS[1:2], with_parent=False))
+    assert rows and all(row[0] == "variation" for row in rows)
+    assert "".join(iter_product_lines(product_sku, specs, MODELS[1:2], False)) == writer_output(rows)
+
+
+def test_sharded_equals_serial(tmp_path):
+    out = tmp_path / "catalogue.csv"
+    generate_sharded(out, format_csv_row(HEADER), iter_product_lines, SPECS, MODELS, 3)
+    expected = format_csv_row(HEADER) + "".join(
+        writer_output(iter_product_rows(product_sku, specs)) for product_sku, specs in SPECS.items()
+    )
+    assert read_header(out) == HEADER
+    assert out.read_bytes() == expected.encode("utf-8-sig")
@@ -0,0 +1,190 @@
+import asyncio
+
+import pytest
+
+from http_async import ConnectionPool, HttpError, RequestNotSent, Retry
+
+
+class Server:
+    """
+    Serveur HTTP/1.1 local minimal. `handler(method, path, n)` (n : rang de la
+    requête sur sa connexion) renvoie (statut, corps[, en-têtes]), ou None pour
+    fermer la connexion sans répondre après avoir lu la requête.
+    """
+
+    def __init__(self, handler, close_idle_after_first=False):
+        self.handler = handler
+        self.close_idle_after_first = close_idle_after_first
+        self.requests = []
+        self.connections = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        n = 0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                length = 0
+                while (header := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                body = await reader.readexactly(length)
+                self.requests.append((method, path, body))
+                n += 1
+                result = self.handler(method, path, n)
+                if result is None:
+                    return
+                status, payload, *extra = result
+                head = "".join(f"{name}: {value}\r\n" for name, value in (extra[0] if extra else {}).items())
+                writer.write(b"HTTP/1.1 %d X\r\n%sContent-Length: %d\r\n\r\n%s"
+                             % (status, head.encode("latin-1"), len(payload), payload))
+                await writer.drain()
+                if self.close_idle_after_first:
+                    return  # keep-alive annoncé, mais connexion fermée aussitôt
+        finally:
+            writer.close()
+
+
+def ok(method, path, n):
+    return 200, path.encode()
+
+
+def test_keep_alive_reuses_one_connection():
+    async def scenario():
+        async with Server(ok) as server, ConnectionPool(limit=1) as pool:
+            bodies = [(await pool.request("GET", f"{server.url}/p{i}")).body for i in range(5)]
+            return bodies, pool.connections_opened, server.connections
+
+    bodies, opened, accepted = asyncio.run(scenario())
+    assert bodies == [b"/p%d" % i for i in range(5)]
+    assert opened == accepted == 1
+
+
+def test_connection_closed_by_server_is_not_reused():
+    async def scenario():
+        async with Server(ok, close_idle_after_first=True) as server, ConnectionPool(limit=1) as pool:
+            first = await pool.request("POST", f"{server.url}/batch", body=b"1")
+            await asyncio.sleep(0.05)  # la fermeture du serveur est reçue
+            second = await pool.request("POST", f"{server.url}/batch", body=b"2")
+            return first.status, second.status, server.requests, pool.connections_opened
+
+    first, second, requests, opened = asyncio.run(scenario())
+    assert (first, second) == (200, 200)
+    assert [r[2] for r in requests] == [b"1", b"2"]
+    assert opened == 2
+
+
+def drop_second_request(method, path, n):
+    """Lit la 2e requête d'une connexion, puis coupe sans répondre (requête peut-être traitée)."""
+    return None if n == 2 else (200, b"ok")
+
+
+def test_stale_connection_retries_idempotent_request():
+    async def scenario():
+        async with Server(drop_second_request) as server, ConnectionPool(limit=1) as pool:
+            await pool.request("GET", f"{server.url}/a")
+            response = await pool.request("GET", f"{server.url}/b")
+            return response.status, [r[:2] for r in server.requests]
+
+    status, requests = asyncio.run(scenario())
+    assert status == 200
+    assert requests == [("GET", "/a"), ("GET", "/b"), ("GET", "/b")]
+
+
+def test_stale_connection_does_not_replay_post():
+    async def scenario():
+        async with Server(drop_second_request) as server, ConnectionPool(limit=1) as pool:
+            await pool.request("POST", f"{server.url}/batch", body=b"lot-1")
+            with pytest.raises(HttpError):
+                await pool.request("POST", f"{server.url}/batch", body=b"lot-2")
+            return [r[2] for r in server.requests]
+
+    assert asyncio.run(scenario()) == [b"lot-1", b"lot-2"]  # lot-2 envoyé une seule fois
+
+
+def test_retry_does_not_replay_post():
+    async def scenario():
+        retry = Retry(retries=4, backoff=0)
+        async with Server(drop_second_request) as server, ConnectionPool(limit=1) as pool:
+            await retry.request(pool, "POST", f"{server.url}/batch", body=b"lot-1")
+            with pytest.raises(HttpError) as error:
+                await retry.request(pool, "POST", f"{server.url}/batch", body=b"lot-2")
+            return [r[2] for r in server.requests], retry.retried, error.value
+
+    requests, retried, error = asyncio.run(scenario())
+    assert requests == [b"lot-1", b"lot-2"]
+    assert retried == 0
+    assert not isinstance(error, RequestNotSent)
+
+
+def test_retry_post_only_when_not_processed():
+    statuses = {"/busy": [(503, b"", {"Retry-After": "0"}), (200, b"ok")],
+                "/overloaded": [(503, b""), (200, b"ok")],
+                "/gateway": [(502, b""), (200, b"ok")]}
+
+    def handler(method, path, n):
+        return statuses[path].pop(0)
+
+    async def scenario():
+        retry = Retry(retries=2, backoff=0)
+        async with Server(handler) as server, ConnectionPool() as pool:
+            return [(await retry.request(pool, "POST", f"{server.url}{path}", body=b"lot")).status
+                    for path in ("/busy", "/overloaded", "/gateway")]
+
+    assert asyncio.run(scenario()) == [200, 503, 502]
+
+
+def test_retry_post_when_connection_refused():
+    async def scenario():
+        server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/batch"
+        server.close()
+        await server.wait_closed()
+        retry = Retry(retries=2, backoff=0)
+        async with ConnectionPool() as pool:
+            with pytest.raises(RequestNotSent):
+                await retry.request(pool, "POST", url, body=b"lot")
+        return retry.requests
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_retry_on_5xx_then_success():
+    calls = []
+
+    def flaky(method, path, n):
+        calls.append(path)
+        return (503, b"busy") if len(calls) < 3 else (200, b"done")
+
+    async def scenario():
+        retry = Retry(retries=4, backoff=0)
+        async with Server(flaky) as server, ConnectionPool() as pool:
+            response = await retry.request(pool, "GET", f"{server.url}/x")
+        return response, retry
+
+    response, retry = asyncio.run(scenario())
+    assert (response.status, response.body) == (200, b"done")
+    assert (retry.requests, retry.retried) == (3, 2)
+
+
+def test_retry_gives_up_with_last_response():
+    async def scenario():
+        retry = Retry(retries=2, backoff=0)
+        async with Server(lambda *a: (429, b"")) as server, ConnectionPool() as pool:
+            response = await retry.request(pool, "GET", f"{server.url}/x")
+        return response.status, retry.requests
+
+    assert asyncio.run(scenario()) == (429, 3)
@@ -0,0 +1,61 @@
+import csv
+import json
+
+import pytest
+
+from pricing_rules import compute_prices, format_money, iter_delta, load_rules, load_variations, parse_money
+from reporting import Report
+
+HEADER = ["Type", "SKU", "Parent", "Regular price", "Attribute 1 value(s)", "Attribute 2 value(s)",
+          "Attribute 3 value(s)"]
+PRODUCTS = {"impexo-a": {"prices": {"REF-1": "2.00", "REF-2": "29.90"}}}
+
+
+@pytest.mark.parametrize("cents, text", [
+    (0, "0.00"), (5, "0.05"), (1490, "14.90"), (-5, "-0.05"), (-150, "-1.50"), (-1490, "-14.90"),
+])
+def test_format_money_round_trip(cents, text):
+    assert format_money(cents) == text
+    assert parse_money(text) == cents
+
+
+@pytest.mark.parametrize("value, cents", [("14,90", 1490), ("14.9", 1490), (14.9, 1490), ("14", 1400),
+                                          ("14.900", 1490), (" -2.5 ", -250)])
+def test_parse_money(value, cents):
+    assert parse_money(value) == cents
+
+
+@pytest.mark.parametrize("value", ["1.999", "0.005", "1.2.3", "1.-5", "abc"])
+def test_parse_money_rejects_sub_cent_and_garbage(value):
+    with pytest.raises(ValueError):
+        parse_money(value)
+
+
+def test_negative_regular_price_reported_not_written(tmp_path):
+    csv_path = tmp_path / "catalogue.csv"
+    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerow(["variable", "impexo-a", "", "", "", "", ""])
+        writer.writerow(["variation", "a-1", "impexo-a", "2.00", "iPhone 17", "Noir", "REF-1"])
+        writer.writerow(["variation", "a-2", "impexo-a", "29.90", "iPhone 17", "Noir", "REF-2"])
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": [{"kind": "surcharge", "model": "iPhone 17", "amount": "-3.50"}]}))
+
+    rules = load_rules(rules_path)
+    variations = load_variations(csv_path)
+    regular, sales = compute_prices(variations, rules, PRODUCTS)
+    report = Report()
+    delta = list(iter_delta(variations, rules, regular, sales, report))
+
+    assert regular == [-150, 2640]
+    assert delta == [["variation", "a-2", "impexo-a", "26.40", "", "", ""]]
+    assert report.total("prix_negatif") == 1
+    assert report.samples["prix_negatif"] == ["a-1: -1.50"]
+
+
+def test_rule_with_sub_cent_amount_rejected(tmp_path):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": [{"kind": "override", "price": "19.999"}]}))
+    with pytest.raises(ValueError, match="19.999"):
+        load_rules(rules_path)
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import generer_csv_complet
+import generer_csv_sans_reference
+from csv_stream import format_csv_row, open_csv
+from sku_registry import SLUGS, SkuRegistry, check_catalog, variation_sku
+
+
+def product(name, colors, references=("JOJO1015-6",)):
+    return {
+        "name": name,
+        "short_desc": "",
+        "desc": "",
+        "references": list(references),
+        "colors": list(colors),
+        "prices": {ref: "29.90" for ref in references},
+    }
+
+
+def check(gen, path, specs):
+    return check_catalog(path, specs, gen.MODELS, gen.SKU_DIMENSIONS)
+
+
+@pytest.mark.parametrize("gen", [generer_csv_complet, generer_csv_sans_reference])
+def test_parts_match_written_skus(tmp_path, gen):
+    specs = {"impexo-a": product("A", ["Noir", "Or désert"], ["JOJO1015-6", "REF 7"]),
+             "impexo-b": product("B", ["Bleu"])}
+    registry = check(gen, tmp_path / "registry.json", specs)
+    assert registry is not None
+
+    out = tmp_path / "catalogue.csv"
+    out.write_text(format_csv_row(gen.HEADER) + "".join(
+        "".join(gen.iter_product_lines(product_sku, product_specs)) for product_sku, product_specs in specs.items()
+    ), encoding="utf-8")
+    with open_csv(out) as (_, rows):
+        written = sorted(row[1] for row in rows)
+
+    expected = list(specs)
+    for product_sku, product_specs in specs.items():
+        values = {"reference": product_specs["references"], "model": gen.MODELS, "color": product_specs["colors"]}
+        combos = [[]]
+        for dimension in gen.SKU_DIMENSIONS:
+            combos = [parts + [SLUGS[dimension](value)] for parts in combos for value in values[dimension]]
+        expected += [variation_sku(product_sku, parts) for parts in combos]
+    assert written == sorted(expected)
+    assert registry.count == len(written)
+
+
+def test_variation_colliding_with_parent(tmp_path, capsys):
+    gen = generer_csv_sans_reference
+    # La variation iPhone 17 / Noir de impexo-a a le SKU du produit impexo-a--iphone-17--noir
+    specs = {"impexo-a": product("A", ["Noir"]), "impexo-a--iphone-17--noir": product("B", ["Bleu"])}
+    assert check(gen, tmp_path / "registry.json", specs) is None
+    out = capsys.readouterr().out
+    assert "impexo-a--iphone-17--noir: impexo-a / iPhone 17 / Noir et produit parent impexo-a--iphone-17--noir" in out
+    assert "ERREUR: CSV non genere" in out
+
+
+def test_parent_with_product_prefix_but_no_variation(tmp_path):
+    gen = generer_csv_sans_reference
+    specs = {"impexo-a": product("A", ["Noir"]), "impexo-a--iphone-17--rouge": product("B", ["Bleu"]),
+             "impexo-a--promo": product("C", ["Bleu"])}
+    assert check(gen, tmp_path / "registry.json", specs) is not None
+
+
+def test_folded_colors_collide(tmp_path, capsys):
+    gen = generer_csv_complet
+    specs = {"impexo-a": product("A", ["Doré", "Noir", "Dore"])}
+    assert check(gen, tmp_path / "registry.json", specs) is None
+    assert "impexo-a: couleur Doré et Dore -> dore" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("color", ["Noir  mat", " Noir", "Noir ", ""])
+def test_ambiguous_part_collides(tmp_path, color):
+    gen = generer_csv_sans_reference
+    assert check(gen, tmp_path / "registry.json", {"impexo-a": product("A", [color])}) is None
+
+
+def test_reassigned_between_runs(tmp_path):
+    gen = generer_csv_sans_reference
+    path = tmp_path / "registry.json"
+    check(gen, path, {"impexo-a": product("A", ["Doré", "Noir"])}).save()
+
+    registry = check(gen, path, {"impexo-a": product("A", ["DORÉ", "Bleu"])})
+    assert registry is not None
+    assert registry.report.total("reattribue") == 1
+    registry.save()
+    # Seule la dernière génération est gardée : Noir n'y est plus
+    assert SkuRegistry.open(path, gen.SKU_DIMENSIONS).known["impexo-a"]["color"] == {"dore": "DORÉ", "bleu": "Bleu"}
+
+
+def test_layouts_saved_side_by_side(tmp_path):
+    path = tmp_path / "registry.json"
+    specs = {"impexo-a": product("A", ["Noir"])}
+    check(generer_csv_complet, path, specs).save()
+    check(generer_csv_sans_reference, path, specs).save()
+    layouts = json.loads(path.read_text(encoding="utf-8"))["layouts"]
+    assert sorted(layouts) == ["model--color", "reference--model--color"]
+    assert layouts["reference--model--color"]["impexo-a"]["reference"] == {"jojo1015-6": "JOJO1015-6"}
@@ -0,0 +1,29 @@
+import csv
+
+from index_medias import MediaIndex
+from update_csv_images import BASE_URL, IMAGE_PATH, update_csv
+
+
+def test_real_name_without_subfolders_resolved_once_per_name(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    (uploads / "2025" / "09").mkdir(parents=True)
+    (uploads / "2025" / "09" / "JOJO1015-6 AIR.jpg").write_bytes(b"jpeg")
+    medias = MediaIndex.load_or_build(uploads, tmp_path / "index.json")
+
+    calls = []
+    resolve = medias.resolve
+    monkeypatch.setattr(medias, "resolve", lambda name: calls.append(name) or resolve(name))
+
+    in_path, out_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    in_path.write_text("SKU,Images\na,jojo1015-6 air\nb,JOJO1015-7.JPG\nc,\nd,jojo1015-6 air\n", encoding="utf-8")
+    update_csv(in_path, out_path, medias)
+
+    with open(out_path, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    assert rows == [
+        ["a", f"{BASE_URL}{IMAGE_PATH}/JOJO1015-6%20AIR.jpg"],
+        ["b", f"{BASE_URL}{IMAGE_PATH}/JOJO1015-7.JPG"],
+        ["c", ""],
+        ["d", f"{BASE_URL}{IMAGE_PATH}/JOJO1015-6%20AIR.jpg"],
+    ]
+    assert calls == ["jojo1015-6 air", "JOJO1015-7.JPG"]
@@ -0,0 +1,54 @@
+import pytest
+
+from update_domain import OLD_URL, iter_matches, update_domain_in_csv
+
+OLD = OLD_URL.encode("utf-8")
+
+
+def sample(size=4000):
+    """Occurrences à toutes les positions par rapport aux limites de blocs, y compris collées."""
+    parts = []
+    for i in range(size // 60):
+        parts.append(b"x" * (i % 11))
+        parts.append(OLD + b"/img-%d.jpg," % i)
+        if i % 5 == 0:
+            parts.append(OLD * 2)
+    return b"".join(parts) + b"\r\nfin " + OLD
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(OLD) - 1, len(OLD), len(OLD) + 1, 64, 1 << 20])
+def test_iter_matches_across_chunk_boundaries(chunk_size):
+    data = sample()
+    expected = []
+    pos = data.find(OLD)
+    while pos != -1:
+        expected.append(pos)
+        pos = data.find(OLD, pos + len(OLD))
+    assert list(iter_matches(data, OLD, chunk_size)) == expected
+
+
+# Même longueur que votre-domaine.com (remplacement sur place), plus court, plus long
+@pytest.mark.parametrize("domain", ["autre-domaine.com", "court.fr", "un-domaine-bien-plus-long.example.com"])
+@pytest.mark.parametrize("chunk_size", [5, len(OLD) + 3, 1 << 20])
+def test_update_domain_in_place_and_rewrite(tmp_path, domain, chunk_size):
+    data = sample()
+    path = tmp_path / "export.csv"
+    path.write_bytes(data)
+
+    count = update_domain_in_csv(path, domain, chunk_size)
+
+    new = f"https://{domain}".encode("utf-8")
+    assert count == data.count(OLD)
+    assert path.read_bytes() == data.replace(OLD, new)
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_update_domain_empty_and_absent(tmp_path):
+    empty = tmp_path / "vide.csv"
+    empty.write_bytes(b"")
+    assert update_domain_in_csv(empty, "autre.fr") == 0
+
+    untouched = tmp_path / "sans.csv"
+    untouched.write_bytes(b"SKU\r\nabc\r\n")
+    assert update_domain_in_csv(untouched, "un-domaine-plus-long.fr") == 0
+    assert untouched.read_bytes() == b"SKU\r\nabc\r\n"
@@ -0,0 +1,76 @@
+import re
+
+import pytest
+
+import url_rewrite
+from url_rewrite import NormalizeFilename, Quote, Rebase, Replace, RewriteEngine, trie_pattern
+
+
+@pytest.mark.parametrize("literals", [
+    ["ab", "abc", "abcd"],
+    ["abcd", "ab", "abc"],
+    ["a", "b", "ab", "ba"],
+    ["TON-DOMAINE.TLD", "TON-DOMAINE.TLD/wp", "TON-AUTRE.TLD"],
+])
+def test_trie_pattern_prefers_longest_match(literals):
+    regex = re.compile(trie_pattern(literals))
+    for literal in literals:
+        assert regex.fullmatch(literal)
+        # Le motif le plus long possible est reconnu, quel que soit l'ordre de déclaration
+        longest = max((other for other in literals if literal.startswith(other)), key=len)
+        assert regex.match(literal + "zz").group(0) == longest
+    assert regex.fullmatch("zz") is None
+
+
+def test_trie_pattern_escapes_metacharacters():
+    regex = re.compile(trie_pattern(["a.b", "a*b", "(x)"]))
+    assert regex.fullmatch("a.b") and regex.fullmatch("a*b") and regex.fullmatch("(x)")
+    assert regex.fullmatch("axb") is None
+
+
+def test_replace_group_longest_match_and_single_pass():
+    engine = RewriteEngine([
+        Replace("impexo.fr", "A"),
+        Replace("impexo.fr/wp", "B"),
+        Replace("A", "never"),  # un seul parcours : les remplacements ne se recombinent pas
+    ])
+    assert engine.rewrite("https://impexo.fr/wp/x.jpg") == "https://B/x.jpg"
+    assert engine.rewrite("https://impexo.fr/img/x.jpg") == "https://A/img/x.jpg"
+
+
+def test_rules_applied_in_order():
+    engine = RewriteEngine([
+        Replace("TON-DOMAINE.TLD", "www.impexo.fr"),
+        Rebase("/uploads/impexo", "https://www.impexo.fr/product/IMPEXO-IPHONE%2017%20SERIES12-31"),
+        NormalizeFilename(lambda name: name.upper()),
+        Quote(),
+    ])
+    assert engine.rewrite("https://TON-DOMAINE.TLD/uploads/impexo/jojo 1.jpg") == (
+        "https://www.impexo.fr/product/IMPEXO-IPHONE%2017%20SERIES12-31/JOJO%201.JPG")
+    assert engine.rewrite("https://ailleurs.fr/x y.jpg") == "https://ailleurs.fr/X%20Y.JPG"
+
+
+def test_normalize_to_empty_clears_url_and_quote_whole():
+    assert RewriteEngine([NormalizeFilename(lambda name: None), Rebase("", "https://b")]).rewrite("a/x.jpg") == ""
+    assert RewriteEngine([Quote(whole=True)]).rewrite("IMPEXO 17/é x.jpg") == "IMPEXO%2017/%C3%A9%20x.jpg"
+    assert RewriteEngine([Quote()]).rewrite("IMPEXO 17/é x.jpg") == "IMPEXO 17/%C3%A9%20x.jpg"
+
+
+def test_memo_computes_each_distinct_value_once(monkeypatch):
+    calls = []
+    engine = RewriteEngine([NormalizeFilename(lambda name: calls.append(name) or name.lower())])
+    urls = ["A.JPG", "B.JPG", "A.JPG", "A.JPG", "B.JPG"]
+    assert [engine.rewrite(url) for url in urls] == ["a.jpg", "b.jpg", "a.jpg", "a.jpg", "b.jpg"]
+    assert calls == ["A.JPG", "B.JPG"]
+    assert (engine.hits, engine.misses) == (3, 2)
+
+    # Mémoire bornée : vidée quand elle est pleine, résultats inchangés
+    monkeypatch.setattr(url_rewrite, "MEMO_LIMIT", 2)
+    engine = RewriteEngine([Replace("x", "y")])
+    assert [engine.rewrite(url) for url in ["x1", "x2", "x3", "x1"]] == ["y1", "y2", "y3", "y1"]
+    assert len(engine._memo) <= 2 and engine.misses == 4
+
+
+def test_empty_replace_pattern_rejected():
+    with pytest.raises(ValueError):
+        RewriteEngine([Replace("", "x")])
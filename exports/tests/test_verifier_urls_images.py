@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+
+from image_stub import ImageStore, make_server
+from verifier_urls_images import check_urls
+
+
+@pytest.fixture
+def images():
+    store = ImageStore({"/JOJO1015-6.JPG": b"jpeg-6", "/JOJO1015-7.JPG": b"jpeg-7"})
+    server = make_server(port=0, store=store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", store
+    server.shutdown()
+    server.server_close()
+
+
+def check(urls, cache, max_age=3600.0):
+    return asyncio.run(check_urls(urls, cache, concurrency=4, max_age=max_age, timeout=5.0))
+
+
+def test_ok_cached_404_rechecked_until_fixed(images):
+    base_url, store = images
+    ok, missing = f"{base_url}/JOJO1015-6.JPG", f"{base_url}/JOJO1015-9.JPG"
+    cache = {}
+
+    stats = check([ok, missing], cache)
+    assert stats["checked"] == 2
+    assert cache[ok]["ok"] and cache[ok]["status"] == 200 and cache[ok]["etag"]
+    assert not cache[missing]["ok"] and cache[missing]["status"] == 404
+
+    # Le 200 reste en cache, le 404 est retesté
+    stats = check([ok, missing], cache)
+    assert stats["cached"] == 1 and stats["checked"] == 1
+    assert cache[missing]["status"] == 404
+    assert store.stats["not_found"] == 2
+
+    # Image mise en ligne entre deux vérifications : plus signalée
+    store.put("/JOJO1015-9.JPG", b"jpeg-9")
+    stats = check([ok, missing], cache)
+    assert stats["checked"] == 1
+    assert cache[missing]["ok"] and cache[missing]["status"] == 200
+    assert check([ok, missing], cache)["cached"] == 2
+
+
+def test_stale_entry_revalidated_with_304(images):
+    base_url, store = images
+    url = f"{base_url}/JOJO1015-7.JPG"
+    cache = {}
+    check([url], cache)
+    etag = cache[url]["etag"]
+
+    stats = check([url], cache, max_age=0)
+    assert stats["checked"] == 1 and stats["not_modified"] == 1
+    assert store.stats["not_modified"] == 1
+    assert cache[url]["ok"] and cache[url]["etag"] == etag
+
+    # Image remplacée : nouvelle réponse 200, nouvel ETag
+    store.put("/JOJO1015-7.JPG", b"jpeg-7-v2")
+    stats = check([url], cache, max_age=0)
+    assert stats["not_modified"] == 0
+    assert cache[url]["status"] == 200 and cache[url]["etag"] != etag
+
+
+def test_image_removed_after_being_ok(images):
+    base_url, store = images
+    url = f"{base_url}/JOJO1015-6.JPG"
+    cache = {}
+    check([url], cache)
+    store.remove("/JOJO1015-6.JPG")
+    check([url], cache, max_age=0)
+    assert not cache[url]["ok"] and cache[url]["status"] == 404
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from itertools import islice
+
+import pytest
+
+import generer_csv_complet
+from reporting import Report
+from woo_push import load_records, push_catalog, same_media
+from woo_stub import Store, make_server
+
+
+@pytest.fixture
+def stub():
+    store = Store()
+    server = make_server(port=0, store=store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", store
+    server.shutdown()
+    server.server_close()
+
+
+def catalog(products=2):
+    rows = []
+    for product_sku, specs in islice(generer_csv_complet.SPECS_CLIENT.items(), products):
+        rows.extend(generer_csv_complet.iter_product_rows(product_sku, specs))
+    return load_records(generer_csv_complet.HEADER, rows)
+
+
+def push(base_url, parents, variations):
+    report = Report()
+    asyncio.run(push_catalog(parents, variations, base_url, "ck", "cs", report))
+    assert report.total("erreur") == 0
+    return report
+
+
+def test_second_push_updates_without_new_media(stub):
+    base_url, store = stub
+    parents, variations = catalog()
+    n_variations = sum(len(v) for v in variations.values())
+
+    first = push(base_url, parents, variations)
+    downloads = store.stats["media_downloads"]
+    distinct = len({img["src"] for p in parents for img in p["images"]}
+                   | {v["image"]["src"] for vs in variations.values() for v in vs if "image" in v})
+    assert first.total("variation_cree") == n_variations
+    assert downloads == distinct
+
+    for _ in range(2):
+        again = push(base_url, parents, variations)
+        assert again.total("produit_mis_a_jour") == len(parents)
+        assert again.total("variation_mis_a_jour") == n_variations
+        assert store.stats["media_downloads"] == downloads
+    assert len(store.media) == downloads
+
+
+def test_changed_image_is_downloaded_once(stub):
+    base_url, store = stub
+    parents, variations = catalog(products=1)
+    push(base_url, parents, variations)
+    downloads = store.stats["media_downloads"]
+
+    sku = parents[0]["sku"]
+    new_src = "https://www.impexo.fr/product/NOUVELLE-PHOTO.JPG"
+    for v in variations[sku][:3]:
+        v["image"] = {"src": new_src}
+    push(base_url, parents, variations)
+
+    assert store.stats["media_downloads"] == downloads + 1
+    images = {v["image"]["src"] for v in store.variations[next(iter(store.products))].values()}
+    assert "http://stub/wp-content/uploads/NOUVELLE-PHOTO.JPG" in images
+
+
+@pytest.mark.parametrize("online, expected", [
+    ("https://wp.impexo.fr/wp-content/uploads/2026/10/JOJO1015-1.JPG", True),
+    ("https://wp.impexo.fr/wp-content/uploads/2026/10/jojo1015-1-2.jpg", True),
+    ("https://wp.impexo.fr/wp-content/uploads/2026/10/JOJO1015-1-scaled.jpg", True),
+    ("https://wp.impexo.fr/wp-content/uploads/2026/10/JOJO1015-12.JPG", False),
+    ("https://wp.impexo.fr/wp-content/uploads/2026/10/JOJO1015-2.JPG", False),
+])
+def test_same_media(online, expected):
+    src = "https://www.impexo.fr/product/IMPEXO-IPHONE%2017%20SERIES12-31/JOJO1015-1.JPG"
+    assert same_media(src, online) is expected
+
+
+def test_lost_batch_response_is_reconciled(stub):
+    base_url, store = stub
+    parents, variations = catalog()
+    store.lost_responses = 1  # lot des parents appliqué, réponse perdue
+
+    report = push(base_url, parents, variations)
+    assert store.stats["lost_responses"] == 1
+    assert report.total("lot_rapproche") == 1
+    assert report.total("produit_mis_a_jour") == len(parents)  # créations renvoyées en mises à jour
+    assert len(store.products) == len(parents)
+    skus = [v["sku"] for vs in store.variations.values() for v in vs.values()]
+    assert sorted(skus) == sorted(v["sku"] for vs in variations.values() for v in vs)
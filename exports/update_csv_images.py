@@ -2,24 +2,43 @@
 # -*- coding: utf-8 -*-
 """
 Script pour mettre à jour le CSV avec des URLs complètes pour les images
+
+Usage : python update_csv_images.py [dossier_medias]
+(dossier_medias : copie locale des uploads, voir index_medias.py)
 """
 
-import csv
+import argparse
 import os
-import urllib.parse
+import sys
+from pathlib import Path
+
+from csv_stream import open_csv, open_csv_writer, read_header
+from index_medias import MediaIndex
+from instrumentation import run_script
+from reporting import Report
+from url_rewrite import NormalizeFilename, Quote, Rebase, RewriteEngine
 
 # Configuration
 BASE_URL = "https://votre-domaine.com"  # À modifier avec votre domaine WordPress
 IMAGE_PATH = "/wp-content/uploads/IMPEXO-IPHONE%2017%20SERIES12-31"
 
-def normalize_filename(filename):
-    """Normalise le nom de fichier pour correspondre aux fichiers réels"""
+def normalize_filename(filename, media=None):
+    """
+    Normalise le nom de fichier pour correspondre aux fichiers réels.
+    
+    Avec `media` (le fichier trouvé par index_medias.MediaIndex.resolve), son
+    vrai nom est utilisé (casse, extension), sans ses dossiers : les images
+    sont toutes sous IMAGE_PATH ; sinon le nom est deviné.
+    """
     if not filename or filename.strip() == "":
         return None
     
     # Supprime les espaces et convertit en majuscules pour correspondre aux fichiers
     filename = filename.strip()
     
+    if media is not None:
+        return media.name
+    
     # Vérifie les différentes extensions possibles
     base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
     
@@ -33,70 +52,92 @@ def normalize_filename(filename):
         # Par défaut, on utilise .JPG
         return f"{base_name}.JPG"
 
-def create_image_url(filename):
-    """Crée une URL complète pour l'image"""
-    if not filename:
-        return ""
-    
-    normalized = normalize_filename(filename)
-    if not normalized:
-        return ""
-    
-    # Encode l'URL correctement
-    encoded_filename = urllib.parse.quote(normalized)
-    full_url = f"{BASE_URL}{IMAGE_PATH}/{encoded_filename}"
-    return full_url
+def make_rewrite(medias=None, report=None):
+    """
+    Règles appliquées à chaque nom d'image : nom réel (ou deviné), dossier des
+    images, encodage du nom. Chaque nom distinct n'est résolu qu'une fois ;
+    les noms absents de `medias` sont déclarés à `report` ("image_introuvable").
+    """
+    def real_name(filename):
+        media = None
+        if medias is not None:
+            media = medias.resolve(filename)
+            if media is None and report is not None:
+                report.add("image_introuvable", filename)
+        return normalize_filename(filename, media)
+    
+    return RewriteEngine([
+        NormalizeFilename(real_name),
+        Rebase("", f"{BASE_URL}{IMAGE_PATH}"),
+        Quote(),
+    ]).rewrite
 
-def update_csv(input_file, output_file):
+def update_csv(input_file, output_file, medias=None):
     """Met à jour le CSV avec les URLs d'images"""
-    rows = []
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-        rows.append(header)
-        
-        # Trouve l'index de la colonne Images
-        try:
-            images_index = header.index('Images')
-        except ValueError:
-            print("Erreur: Colonne 'Images' non trouvée dans le CSV")
-            return
-        
-        # Traite chaque ligne
-        for row in reader:
-            if len(row) > images_index:
-                image_filename = row[images_index].strip()
-                if image_filename:
-                    # Crée l'URL complète
-                    image_url = create_image_url(image_filename)
-                    row[images_index] = image_url
-                else:
-                    row[images_index] = ""
-            rows.append(row)
-    
-    # Écrit le nouveau CSV
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
+    header = read_header(input_file, encoding='utf-8')
+    
+    # Trouve l'index de la colonne Images
+    try:
+        images_index = header.index('Images')
+    except ValueError:
+        print("Erreur: Colonne 'Images' non trouvée dans le CSV")
+        return
+    
+    count = 0
+    report = Report(samples=20)
+    rewrite = make_rewrite(medias, report)
+    with open_csv_writer(output_file, header, encoding='utf-8') as writer:
+        with open_csv(input_file, encoding='utf-8') as (_, reader):
+            # Traite chaque ligne
+            for row in reader:
+                if len(row) > images_index:
+                    image_filename = row[images_index].strip()
+                    if image_filename:
+                        # Crée l'URL complète
+                        row[images_index] = rewrite(image_filename)
+                    else:
+                        row[images_index] = ""
+                writer.writerow(row)
+                count += 1
     
     print(f"CSV mis a jour: {output_file}")
-    print(f"{len(rows)-1} lignes traitees")
+    print(f"{count} lignes traitees")
+    misses = report.total("image_introuvable")
+    if misses:
+        print(f"ATTENTION: {misses} images introuvables dans {medias.root}:")
+        report.print_samples("image_introuvable")
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Met à jour la colonne Images avec des URLs complètes.")
+    parser.add_argument("medias", nargs="?", type=Path, metavar="dossier_medias",
+                        help="Copie locale des uploads, pour utiliser les vrais noms de fichiers (voir index_medias.py)")
+    args = parser.parse_args()
+    
     input_file = "woocommerce_gammes_import.csv"
     output_file = "woocommerce_gammes_import_with_urls.csv"
     
     if not os.path.exists(input_file):
         print(f"ERREUR: Fichier introuvable: {input_file}")
-        exit(1)
+        sys.exit(1)
     
     print(f"Traitement de {input_file}...")
     print(f"Base URL: {BASE_URL}")
     print(f"Chemin images: {IMAGE_PATH}")
+    
+    # Optionnel : copie locale du dossier des images, pour utiliser les vrais noms de fichiers
+    medias = None
+    if args.medias is not None:
+        try:
+            medias = MediaIndex.load_or_build(args.medias)
+        except FileNotFoundError as e:
+            raise SystemExit(f"ERREUR: {e}")
+        print(f"Index des medias: {len(medias)} fichiers ({medias.root})")
     print()
     
-    update_csv(input_file, output_file)
+    update_csv(input_file, output_file, medias)
     
     print()
     print("ATTENTION: N'oubliez pas de modifier BASE_URL dans le script avec votre domaine WordPress reel!")
+
+if __name__ == "__main__":
+    run_script(main)
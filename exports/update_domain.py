@@ -2,36 +2,115 @@
 # -*- coding: utf-8 -*-
 """
 Script pour remplacer le domaine WordPress dans le CSV
-Usage: python update_domain.py votre-domaine.com
+Usage: python update_domain.py votre-domaine.com [fichier.csv]
+
+Le fichier est parcouru par blocs au travers de mmap : la mémoire utilisée ne
+dépend pas de sa taille.
+- Si le nouveau domaine a la même longueur que l'ancien, les octets sont
+  remplacés sur place (relancer le script après une interruption termine le
+  travail : les occurrences déjà remplacées ne sont plus trouvées).
+- Sinon le résultat est écrit dans un fichier temporaire qui remplace
+  l'original d'un coup (os.replace) : une interruption laisse l'original intact.
+Les fins de ligne et l'encodage du fichier sont conservés tels quels.
 """
 
+import mmap
+import os
 import sys
-import re
-
-def update_domain_in_csv(csv_file, new_domain):
-    """Remplace le domaine dans le CSV"""
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Remplace le domaine
-    old_pattern = r'https://votre-domaine\.com'
+from pathlib import Path
+
+from instrumentation import run_script
+
+OLD_URL = 'https://votre-domaine.com'
+
+# Taille des blocs parcourus (les occurrences à cheval sur deux blocs sont trouvées)
+CHUNK_SIZE = 16 << 20
+
+def iter_matches(mm, pattern, chunk_size=CHUNK_SIZE):
+    """
+    Positions des occurrences de `pattern` (sans chevauchement, de gauche à
+    droite) dans `mm`, lu par blocs. Chaque bloc est prolongé de len(pattern) - 1
+    octets pour trouver les occurrences qui commencent juste avant sa fin.
+    """
+    n = len(pattern)
+    size = len(mm)
+    next_pos = 0
+    for start in range(0, size, chunk_size):
+        window = mm[start:min(size, start + chunk_size + n - 1)]
+        i = window.find(pattern, max(next_pos - start, 0))
+        while i != -1 and i < chunk_size:
+            yield start + i
+            next_pos = start + i + n
+            i = window.find(pattern, i + n)
+
+def patch_in_place(csv_file, old, new, chunk_size=CHUNK_SIZE):
+    """Remplace `old` par `new` (même longueur) directement dans le fichier."""
+    count = 0
+    with open(csv_file, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+        for pos in iter_matches(mm, old, chunk_size):
+            mm[pos:pos + len(new)] = new
+            count += 1
+        mm.flush()
+    return count
+
+def rewrite_to_temp(csv_file, old, new, chunk_size=CHUNK_SIZE):
+    """Écrit le fichier avec `old` remplacé par `new` dans un temporaire, puis remplace l'original."""
+    path = Path(csv_file)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    count = 0
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                open(tmp_path, 'wb') as out:
+            copied = 0
+            for pos in iter_matches(mm, old, chunk_size):
+                # Recopier par blocs ce qui précède l'occurrence
+                while copied < pos:
+                    end = min(pos, copied + chunk_size)
+                    out.write(mm[copied:end])
+                    copied = end
+                out.write(new)
+                copied = pos + len(old)
+                count += 1
+            while copied < len(mm):
+                end = min(len(mm), copied + chunk_size)
+                out.write(mm[copied:end])
+                copied = end
+            out.flush()
+            os.fsync(out.fileno())
+        if count:
+            os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return count
+
+def update_domain_in_csv(csv_file, new_domain, chunk_size=CHUNK_SIZE):
+    """Remplace le domaine dans le CSV ; renvoie le nombre de remplacements"""
     new_url = f'https://{new_domain}'
-    updated_content = re.sub(old_pattern, new_url, content)
-    
-    # Écrit le fichier mis à jour
-    with open(csv_file, 'w', encoding='utf-8') as f:
-        f.write(updated_content)
-    
+    old = OLD_URL.encode('utf-8')
+    new = new_url.encode('utf-8')
+
+    if os.path.getsize(csv_file) == 0:  # mmap refuse les fichiers vides
+        count = 0
+    elif len(new) == len(old):
+        count = patch_in_place(csv_file, old, new, chunk_size)
+    else:
+        count = rewrite_to_temp(csv_file, old, new, chunk_size)
+
     print(f"Domaine mis a jour: {new_url}")
-    print(f"Fichier modifie: {csv_file}")
+    print(f"Fichier modifie: {csv_file} ({count} remplacements)")
+    return count
 
-if __name__ == "__main__":
+def main():
     if len(sys.argv) < 2:
-        print("Usage: python update_domain.py votre-domaine.com")
+        print("Usage: python update_domain.py votre-domaine.com [fichier.csv]")
         print("Exemple: python update_domain.py mon-site.com")
         sys.exit(1)
-    
+
     domain = sys.argv[1]
-    csv_file = "woocommerce_gammes_import.csv"
-    
+    csv_file = sys.argv[2] if len(sys.argv) >= 3 else "woocommerce_gammes_import.csv"
+
     update_domain_in_csv(csv_file, domain)
+
+if __name__ == "__main__":
+    run_script(main)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Réécriture des URLs d'images à partir d'une table de règles.
+
+Les scripts de correction (changement de domaine, déplacement du dossier des
+images, normalisation du nom de fichier, encodage) décrivent leurs
+corrections comme des règles ; le moteur les compile une fois :
+
+- les remplacements littéraux consécutifs (domaines, préfixes) sont fusionnés
+  en une seule expression régulière construite comme un trie des motifs
+  (préfixes communs factorisés, correspondance la plus longue) : une URL est
+  parcourue une seule fois quel que soit le nombre de motifs ;
+- le résultat est mémorisé par valeur distincte : un catalogue qui réutilise
+  quelques centaines d'URLs sur des millions de lignes ne calcule chaque
+  réécriture qu'une fois.
+
+    engine = RewriteEngine([
+        Replace("TON-DOMAINE.TLD", "www.impexo.fr"),
+        Rebase("https://www.impexo.fr/wp-content/uploads/impexo", CORRECT_BASE_URL),
+    ])
+    new_url = engine.rewrite(url)
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import quote
+
+# Au-delà, la mémoire des réécritures est vidée (valeurs presque toutes distinctes)
+MEMO_LIMIT = 1 << 16
+
+
+class Replace(NamedTuple):
+    """Remplace chaque occurrence de `old` par `new` (changement de domaine, de préfixe)."""
+    old: str
+    new: str
+
+
+class Rebase(NamedTuple):
+    """
+    Si l'URL contient `marker` (toujours si `marker` est vide), la remplace par
+    `base` + "/" + nom du fichier (dernier segment de l'URL).
+    """
+    marker: str
+    base: str
+    strip: bool = False  # enlever les espaces autour de l'URL avant d'extraire le nom
+
+
+class NormalizeFilename(NamedTuple):
+    """Applique `func` au nom du fichier (dernier segment) ; None ou "" vide l'URL."""
+    func: Callable[[str], Optional[str]]
+
+
+class Quote(NamedTuple):
+    """
+    Encode le nom du fichier (espaces, accents) avec urllib.parse.quote ; avec
+    `whole`, toute la valeur (chemin relatif "dossier/sous-dossier/nom").
+    """
+    safe: str = "/"
+    whole: bool = False
+
+
+Rule = Union[Replace, Rebase, NormalizeFilename, Quote]
+
+
+def trie_pattern(literals: Iterable[str]) -> str:
+    """
+    Expression régulière qui reconnaît l'un des `literals`, construite à partir
+    de leur trie : les préfixes communs ne sont testés qu'une fois, et le motif
+    le plus long l'emporte quand l'un est préfixe d'un autre.
+    """
+    trie: dict = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = True  # fin d'un motif
+
+    def emit(node: dict) -> str:
+        end = "" in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # Plus long d'abord : la suite est optionnelle mais gourmande
+            return body + "?" if len(branches) == 1 and len(body) == 1 else "(?:" + body + ")?"
+        return body
+
+    return emit(trie)
+
+
+def _split_filename(url: str) -> Tuple[str, str]:
+    head, sep, name = url.rpartition("/")
+    return head + sep, name
+
+
+class _ReplaceGroup:
+    """Remplacements littéraux fusionnés en une seule expression (un seul parcours)."""
+
+    __slots__ = ("regex", "table")
+
+    def __init__(self, rules: List[Replace]):
+        self.table: Dict[str, str] = {}
+        for rule in rules:
+            if not rule.old:
+                raise ValueError("Replace: motif vide")
+            self.table.setdefault(rule.old, rule.new)
+        self.regex = re.compile(trie_pattern(self.table))
+
+    def apply(self, url: str) -> str:
+        table = self.table
+        return self.regex.sub(lambda m: table[m.group(0)], url)
+
+
+class RewriteEngine:
+    """Table de règles compilée, appliquée dans l'ordre, avec mémoire par valeur distincte."""
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules: List[Rule] = list(rules)
+        self._steps: List[Callable[[str], str]] = []
+        pending: List[Replace] = []
+        for rule in self.rules + [None]:
+            if isinstance(rule, Replace):
+                pending.append(rule)
+                continue
+            if pending:
+                self._steps.append(_ReplaceGroup(pending).apply)
+                pending = []
+            if rule is not None:
+                self._steps.append(self._compile(rule))
+        self._memo: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _compile(rule: Rule) -> Callable[[str], str]:
+        if isinstance(rule, Rebase):
+            marker, base, strip = rule
+
+            def rebase(url: str) -> str:
+                if not url or marker not in url:
+                    return url
+                if strip:
+                    url = url.strip()
+                return f"{base}/{url.split('/')[-1]}"
+            return rebase
+
+        if isinstance(rule, NormalizeFilename):
+            func = rule.func
+
+            def normalize(url: str) -> str:
+                head, name = _split_filename(url)
+                name = func(name)
+                return head + name if name else ""
+            return normalize
+
+        if isinstance(rule, Quote):
+            safe = rule.safe
+            if rule.whole:
+                return lambda url: quote(url, safe=safe)
+
+            def quote_filename(url: str) -> str:
+                head, name = _split_filename(url)
+                return head + quote(name, safe=safe)
+            return quote_filename
+
+        raise TypeError(f"Règle inconnue: {rule!r}")
+
+    def rewrite(self, url: str) -> str:
+        """URL réécrite par toutes les règles (calculée une fois par valeur distincte)."""
+        memo = self._memo
+        result = memo.get(url)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = url
+        for step in self._steps:
+            result = step(result)
+        if len(memo) >= MEMO_LIMIT:
+            memo.clear()
+        memo[url] = result
+        return result
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Validation du catalogue en une seule lecture du CSV.
+
+Les contrôles de verifier_csv_produits.py, verifier_images_variations.py et
+verifier_variations_client.py sont enregistrés ici comme des règles. Le CSV
+est lu une fois : chaque produit parent et ses variations sont réduits à
+quelques champs, puis toutes les règles sont évaluées produit par produit.
+
+Les règles ne voient qu'un produit à la fois : sur un gros fichier
+(--jobs > 1), les produits sont répartis par hash du SKU parent entre les
+processus d'un pool.
+
+Usage:
+  python valider_catalogue.py [--input woocommerce_import_corrige_final.csv]
+                              [--rules doublons_modele_couleur,...] [--jobs 4]
+                              [--report validation_catalogue.csv]
+"""
+
+import argparse
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from column_cache import open_columns
+from csv_stream import open_csv_writer, read_header
+from instrumentation import run_script, stage
+from reporting import Report
+from spec_coverage import CoverageCube
+from specs_catalog import load_catalog
+from verifier_images_variations import extract_ref_from_image_url, normalize as normalize_ref
+from woo_schema import Schema
+
+CATALOG = load_catalog()
+SPECS_CLIENT = CATALOG["products"]
+MODELS = CATALOG["models"]
+
+REPORT_HEADER = ["Regle", "Produit", "SKU", "Message"]
+
+# Colonnes lues pour construire les produits
+LOADED_COLUMNS = ("Type", "SKU", "Name", "Parent", "Attribute 1 value(s)", "Attribute 2 value(s)",
+                  "Attribute 3 value(s)", "Images")
+
+# En dessous de ce nombre de variations, le pool coûte plus qu'il ne rapporte
+PARALLEL_MIN_VARIATIONS = 50000
+
+
+def normalize(s: str) -> str:
+    return (s or "").strip().lower().replace(" ", "").replace("-", "")
+
+
+class Variation(NamedTuple):
+    sku: str
+    model: str
+    color: str
+    ref: str
+    images: str
+
+
+class Product:
+    """Un produit parent (absent du CSV si `name` vaut None) et ses variations."""
+
+    __slots__ = ("sku", "name", "refs", "variations")
+
+    def __init__(self, sku: str):
+        self.sku = sku
+        self.name: Optional[str] = None
+        self.refs = ""  # Attribute 3 value(s) du parent
+        self.variations: List[Variation] = []
+
+
+class Issue(NamedTuple):
+    rule: str
+    product: str
+    sku: str
+    message: str
+
+
+# --- Registre des règles ------------------------------------------------------
+
+# Une règle reçoit un produit et renvoie des couples (sku concerné, message)
+RuleFunc = Callable[[Product], Iterable[Tuple[str, str]]]
+
+
+class Rule(NamedTuple):
+    name: str
+    description: str
+    func: RuleFunc
+
+
+RULES: Dict[str, Rule] = {}
+
+
+def rule(name: str, description: str):
+    """Décorateur : enregistre une règle sous `name`."""
+    def register(func: RuleFunc) -> RuleFunc:
+        RULES[name] = Rule(name, description, func)
+        return func
+    return register
+
+
+@rule("doublons_modele_couleur", "Plusieurs variations pour la même combinaison Modèle + Couleur")
+def check_model_color_duplicates(product: Product):
+    combos = defaultdict(list)
+    for v in product.variations:
+        combos[(normalize(v.model), normalize(v.color))].append(v)
+    for (model, color), variations in combos.items():
+        if len(variations) > 1:
+            refs = ", ".join(v.ref for v in variations)
+            yield variations[0].sku, f"{model} + {color}: {len(variations)} variations ({refs})"
+
+
+@rule("references_parent", "Références des variations différentes de celles du produit parent")
+def check_parent_references(product: Product):
+    if product.name is None:
+        return
+    parent_refs = {r.strip() for r in product.refs.split(",")} if product.refs else set()
+    variation_refs = {v.ref for v in product.variations if v.ref}
+    for ref in sorted(variation_refs - parent_refs):
+        yield product.sku, f"Reference {ref} dans les variations mais pas dans le parent"
+    for ref in sorted(parent_refs - variation_refs):
+        yield product.sku, f"Reference {ref} dans le parent mais pas dans les variations"
+
+
+@rule("image_reference", "Image d'une variation qui ne correspond pas à sa référence")
+def check_image_reference(product: Product):
+    for v in product.variations:
+        image_ref = extract_ref_from_image_url(v.images)
+        if v.ref and image_ref and normalize_ref(v.ref) != normalize_ref(image_ref):
+            yield v.sku, f"{v.model} + {v.color}: reference {v.ref}, image {image_ref}"
+
+
+@rule("images_dupliquees", "Même image utilisée par plusieurs variations d'un produit")
+def check_duplicate_images(product: Product):
+    by_image = defaultdict(list)
+    for v in product.variations:
+        image_ref = extract_ref_from_image_url(v.images)
+        if image_ref:
+            by_image[image_ref].append(v)
+    for image_ref, variations in by_image.items():
+        if len(variations) > 1:
+            yield variations[0].sku, f"{image_ref}: utilisee par {len(variations)} variations"
+
+
+@rule("couverture_specs", "Combinaisons Modèle × Couleur × Référence manquantes ou en trop par rapport aux specs client")
+def check_spec_coverage(product: Product):
+    specs = SPECS_CLIENT.get(product.sku)
+    if specs is None:
+        if product.name is not None:
+            yield product.sku, "Produit non trouve dans les specs client"
+        return
+
+    coverage = CoverageCube(MODELS, [normalize(c) for c in specs["colors"]], specs["references"])
+    for v in product.variations:
+        coverage.mark(v.model, normalize(v.color), v.ref)
+    for model, color, ref in coverage.iter_missing():
+        yield product.sku, f"Combinaison manquante: {model} + {color} + {ref}"
+    for model, color, ref in coverage.extras:
+        yield product.sku, f"Combinaison en trop: {model} + {color} + {ref}"
+
+
+# --- Lecture et évaluation ----------------------------------------------------
+
+def load_products(csv_path) -> Dict[str, Product]:
+    """Lit le CSV une fois et regroupe les variations par SKU parent (ordre du fichier)."""
+    Schema(read_header(csv_path)).require("Type", "SKU", "Parent", "Attribute 1 value(s)",
+                                          "Attribute 2 value(s)", "Attribute 3 value(s)", "Images")
+    products: Dict[str, Product] = {}
+
+    # Seules les colonnes utiles sont lues (cache en colonnes voisin du CSV)
+    with open_columns(csv_path, LOADED_COLUMNS) as (columns, rows):
+        for view in Schema(columns).views(rows):
+            if view.is_variable:
+                product = products.get(view.sku)
+                if product is None:
+                    product = products[view.sku] = Product(view.sku)
+                product.name = view.name
+                product.refs = view.ref
+            elif view.is_variation and view.parent:
+                product = products.get(view.parent)
+                if product is None:
+                    product = products[view.parent] = Product(view.parent)
+                product.variations.append(Variation(view.sku, view.model, view.color, view.ref, view.images))
+    return products
+
+
+def check_products(products: List[Product], rule_names: List[str]) -> List[Issue]:
+    """Évalue les règles sur une liste de produits (aussi exécuté dans les processus du pool)."""
+    issues = []
+    for product in products:
+        for name in rule_names:
+            for sku, message in RULES[name].func(product):
+                issues.append(Issue(name, product.sku, sku, message))
+    return issues
+
+
+def shard_products(products: Iterable[Product], jobs: int) -> List[List[Product]]:
+    """Répartit les produits entre `jobs` shards selon un hash stable du SKU parent."""
+    shards: List[List[Product]] = [[] for _ in range(jobs)]
+    for product in products:
+        shards[zlib.crc32(product.sku.encode("utf-8")) % jobs].append(product)
+    return shards
+
+
+def validate(products: Dict[str, Product], rule_names: List[str], jobs: int = 1) -> Iterator[Issue]:
+    """Problèmes trouvés, regroupés par produit dans l'ordre du fichier."""
+    n_variations = sum(len(p.variations) for p in products.values())
+    if jobs <= 1 or n_variations < PARALLEL_MIN_VARIATIONS:
+        yield from check_products(list(products.values()), rule_names)
+        return
+
+    by_product = defaultdict(list)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        shards = shard_products(products.values(), jobs)
+        for issues in pool.map(check_products, shards, [rule_names] * jobs):
+            for issue in issues:
+                by_product[issue.product].append(issue)
+    for sku in products:
+        yield from by_product.get(sku, ())
+
+
+def main():
+    exports_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Valide le catalogue WooCommerce en une seule lecture.")
+    parser.add_argument("--input", type=Path, default=exports_dir / "woocommerce_import_corrige_final.csv")
+    parser.add_argument("--report", type=Path, default=exports_dir / "validation_catalogue.csv")
+    parser.add_argument("--rules", default=",".join(RULES),
+                        help=f"Règles séparées par des virgules parmi: {', '.join(RULES)}")
+    parser.add_argument("--jobs", type=int, default=1, help="Nombre de processus pour les gros fichiers")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        print(f"ERREUR: Fichier introuvable : {args.input}")
+        return
+
+    rule_names = [n.strip() for n in args.rules.split(",")]
+    for name in rule_names:
+        if name not in RULES:
+            raise SystemExit(f"Regle inconnue: {name} (disponibles: {', '.join(RULES)})")
+
+    try:
+        products = load_products(args.input)
+    except ValueError as e:
+        print(f"ERREUR: {e}")
+        return
+
+    # Le détail reste un CSV (une ligne par problème) ; le Report garde compteurs et exemples
+    report = Report()
+    with stage("validate"), open_csv_writer(args.report, REPORT_HEADER) as writer:
+        for issue in validate(products, rule_names, args.jobs):
+            report.add(issue.rule, f"{issue.product}: {issue.message}")
+            writer.writerow(issue)
+
+    n_variations = sum(len(p.variations) for p in products.values())
+    print("=" * 80)
+    print("VALIDATION DU CATALOGUE")
+    print("=" * 80)
+    print()
+    print(f"Analyse de {len(products)} produits et {n_variations} variations")
+    print()
+    for name in rule_names:
+        n = report.total(name)
+        if not n:
+            print(f"OK: {name}")
+            continue
+        print(f"ATTENTION: {name} - {n} probleme(s) ({RULES[name].description})")
+        report.print_samples(name, indent="    ")
+    print()
+    print(f"OK: Rapport detaille : {args.report}")
+
+
+if __name__ == "__main__":
+    run_script(main)
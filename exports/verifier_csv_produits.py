@@ -3,10 +3,27 @@
 Script pour vérifier que le CSV est correct et qu'il n'y a pas de mélange entre produits.
 """
 
-import csv
 from pathlib import Path
 from collections import defaultdict
 
+from column_cache import open_columns
+from csv_stream import read_header
+from instrumentation import run_script, stage
+from reporting import open_report
+from woo_schema import Schema
+
+# Colonnes lues par ce script
+COLUMNS = ("Type", "SKU", "Name", "Parent", "Attribute 1 name", "Attribute 1 value(s)",
+           "Attribute 2 name", "Attribute 2 value(s)", "Attribute 3 name", "Attribute 3 value(s)", "Images")
+
+# Types de problèmes, dans l'ordre du résumé
+ISSUE_LABELS = {
+    "produit_avec_doublons": "produits avec des combinaisons Modele + Couleur en double",
+    "doublon": "combinaisons Modele + Couleur en double",
+    "reference_absente_parent": "references dans les variations mais pas dans le parent",
+    "reference_sans_variation": "references dans le parent mais pas dans les variations",
+}
+
 def normalize(s):
     return (s or "").strip().lower().replace(" ", "").replace("-", "")
 
@@ -17,105 +34,71 @@ def main():
         print(f"ERREUR: Fichier introuvable : {csv_path}")
         return
     
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    header = read_header(csv_path)
     
-    if not rows:
+    if not header:
         print("ERREUR: CSV vide")
         return
     
-    header = rows[0]
-    data_rows = rows[1:]
+    # Colonnes résolues une fois pour tout le fichier
+    Schema(header).require(*COLUMNS)
     
-    # Indices des colonnes
-    type_idx = header.index("Type")
-    sku_idx = header.index("SKU")
-    name_idx = header.index("Name")
-    parent_idx = header.index("Parent")
-    attr1_name_idx = header.index("Attribute 1 name")
-    attr1_value_idx = header.index("Attribute 1 value(s)")
-    attr2_name_idx = header.index("Attribute 2 name")
-    attr2_value_idx = header.index("Attribute 2 value(s)")
-    attr3_name_idx = header.index("Attribute 3 name")
-    attr3_value_idx = header.index("Attribute 3 value(s)")
-    images_idx = header.index("Images")
-    
-    # Séparer produits parents et variations
+    # Séparer produits parents et variations (les vues sont conservées telles quelles)
     parents = {}
     variations_by_parent = defaultdict(list)
     
-    for row in data_rows:
-        if row[type_idx].lower() == "variable":
-            sku = row[sku_idx]
-            parents[sku] = {
-                'name': row[name_idx],
-                'sku': sku,
-                'attr1': row[attr1_value_idx] if attr1_value_idx < len(row) else "",
-                'attr2': row[attr2_value_idx] if attr2_value_idx < len(row) else "",
-                'attr3': row[attr3_value_idx] if attr3_value_idx < len(row) else "",
-            }
-        elif row[type_idx].lower() == "variation":
-            parent_sku = row[parent_idx] if parent_idx < len(row) else ""
-            if parent_sku:
-                variations_by_parent[parent_sku].append({
-                    'sku': row[sku_idx],
-                    'model': row[attr1_value_idx] if attr1_value_idx < len(row) else "",
-                    'color': row[attr2_value_idx] if attr2_value_idx < len(row) else "",
-                    'ref': row[attr3_value_idx] if attr3_value_idx < len(row) else "",
-                    'image': row[images_idx] if images_idx < len(row) else "",
-                })
+    # Seules les colonnes utiles sont lues (cache en colonnes voisin du CSV)
+    with open_columns(csv_path, COLUMNS) as (columns, data_rows):
+        for view in Schema(columns).views(data_rows):
+            if view.is_variable:
+                parents[view.sku] = view
+            elif view.is_variation:
+                parent_sku = view.parent
+                if parent_sku:
+                    variations_by_parent[parent_sku].append(view)
     
     print(f"Analyse de {len(parents)} produits parents et {sum(len(v) for v in variations_by_parent.values())} variations\n")
     
-    # Vérifier chaque produit parent
-    all_issues = []
+    details_path = csv_path.parent / "verification_csv_produits.jsonl"
     
-    for parent_sku, parent_info in parents.items():
-        variations = variations_by_parent.get(parent_sku, [])
-        print(f"PRODUIT: {parent_info['name']} ({parent_sku})")
-        print(f"   {len(variations)} variations")
-        
-        # Vérifier les doublons Modèle + Couleur
-        combos = defaultdict(list)
-        for v in variations:
-            key = (normalize(v['model']), normalize(v['color']))
-            combos[key].append(v)
-        
-        duplicates = {k: v for k, v in combos.items() if len(v) > 1}
-        if duplicates:
-            print(f"   ATTENTION: DOUBLONS detectes:")
-            for (model, color), vars_list in duplicates.items():
-                print(f"      - {model} + {color}: {len(vars_list)} variations")
-                for v in vars_list:
-                    img_name = v['image'].split('/')[-1] if v['image'] else 'Pas d\'image'
-                    print(f"        • {v['sku']} (Ref: {v['ref']}, Image: {img_name})")
-            all_issues.append(f"{parent_info['name']}: {len(duplicates)} combinaisons en double")
-        else:
-            print(f"   OK: Aucun doublon Modele + Couleur")
+    # Chaque problème est compté et écrit dans le détail ; seul un résumé est affiché
+    with open_report(details_path) as report, stage("validate"):
+        # Vérifier chaque produit parent
+        for parent_sku, parent_info in parents.items():
+            variations = variations_by_parent.get(parent_sku, [])
         
-        # Vérifier que les références correspondent aux attributs du parent
-        parent_refs = set()
-        if parent_info['attr3']:
-            parent_refs = {r.strip() for r in parent_info['attr3'].split(',')}
+            # Vérifier les doublons Modèle + Couleur
+            combos = defaultdict(list)
+            for v in variations:
+                key = (normalize(v.model), normalize(v.color))
+                combos[key].append(v)
         
-        variation_refs = {v['ref'] for v in variations if v['ref']}
-        missing_refs = variation_refs - parent_refs
-        extra_refs = parent_refs - variation_refs
+            duplicates = 0
+            for (model, color), vars_list in combos.items():
+                if len(vars_list) > 1:
+                    duplicates += 1
+                    report.add("doublon", f"{parent_info.name}: {model} + {color} ({len(vars_list)} variations)",
+                               product=parent_sku, model=model, color=color,
+                               variations=[{"sku": v.sku, "reference": v.ref, "image": v.images} for v in vars_list])
+            if duplicates:
+                report.add("produit_avec_doublons", f"{parent_info.name}: {duplicates} combinaisons en double",
+                           product=parent_sku, duplicates=duplicates)
         
-        if missing_refs:
-            print(f"   ATTENTION: References dans variations mais pas dans parent: {missing_refs}")
-        if extra_refs:
-            print(f"   ATTENTION: References dans parent mais pas dans variations: {extra_refs}")
+            # Vérifier que les références correspondent aux attributs du parent
+            parent_refs = set()
+            if parent_info.ref:
+                parent_refs = {r.strip() for r in parent_info.ref.split(',')}
         
-        print()
+            variation_refs = {v.ref for v in variations if v.ref}
+            for ref in sorted(variation_refs - parent_refs):
+                report.add("reference_absente_parent", f"{parent_info.name}: {ref}", product=parent_sku, reference=ref)
+            for ref in sorted(parent_refs - variation_refs):
+                report.add("reference_sans_variation", f"{parent_info.name}: {ref}", product=parent_sku, reference=ref)
     
     # Résumé
     print("=" * 60)
-    if all_issues:
-        print(f"ATTENTION: {len(all_issues)} produits avec des problemes:")
-        for issue in all_issues:
-            print(f"  - {issue}")
+    if report.print_summary(ISSUE_LABELS):
+        print(f"Detail : {details_path}")
     else:
         print("OK: Aucun probleme detecte dans le CSV")
     
@@ -125,12 +108,12 @@ def main():
     all_images = set()
     for variations_list in variations_by_parent.values():
         for v in variations_list:
-            if v['image']:
-                filename = v['image'].split('/')[-1]
+            if v.images:
+                filename = v.images.split('/')[-1]
                 all_images.add(filename)
     
     print(f"  {len(all_images)} images uniques référencées")
     print(f"  Exemples: {', '.join(list(all_images)[:5])}")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
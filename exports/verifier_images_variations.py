@@ -3,10 +3,25 @@
 Script pour vérifier que les images correspondent bien aux variations dans le CSV.
 """
 
-import csv
 from pathlib import Path
 from collections import defaultdict
 
+from column_cache import open_columns
+from csv_stream import read_header
+from instrumentation import run_script, stage
+from reporting import open_report
+from woo_schema import Schema
+
+# Colonnes lues par ce script
+COLUMNS = ("Type", "SKU", "Name", "Parent", "Attribute 1 name", "Attribute 1 value(s)",
+           "Attribute 2 name", "Attribute 2 value(s)", "Attribute 3 name", "Attribute 3 value(s)", "Images")
+
+# Types de problèmes, dans l'ordre du résumé
+ISSUE_LABELS = {
+    "image_reference": "images ne correspondant pas a la reference de la variation",
+    "image_dupliquee": "images utilisees par plusieurs variations d'un meme produit",
+}
+
 def normalize(s):
     return (s or "").strip().lower().replace(" ", "").replace("-", "").replace("_", "")
 
@@ -30,119 +45,70 @@ def main():
         print(f"ERREUR: Fichier introuvable : {csv_path}")
         return
     
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    header = read_header(csv_path)
     
-    if not rows:
+    if not header:
         print("ERREUR: CSV vide")
         return
     
-    header = rows[0]
-    data_rows = rows[1:]
+    # Colonnes résolues une fois pour tout le fichier
+    Schema(header).require(*COLUMNS)
     
-    # Indices des colonnes
-    type_idx = header.index("Type")
-    sku_idx = header.index("SKU")
-    name_idx = header.index("Name")
-    parent_idx = header.index("Parent")
-    attr1_name_idx = header.index("Attribute 1 name")
-    attr1_value_idx = header.index("Attribute 1 value(s)")
-    attr2_name_idx = header.index("Attribute 2 name")
-    attr2_value_idx = header.index("Attribute 2 value(s)")
-    attr3_name_idx = header.index("Attribute 3 name")
-    attr3_value_idx = header.index("Attribute 3 value(s)")
-    images_idx = header.index("Images")
-    
-    # Analyser les variations
-    issues = []
-    variations_by_parent = defaultdict(list)
-    
-    for row in data_rows:
-        if row[type_idx].lower() == "variation":
-            parent_sku = row[parent_idx] if parent_idx < len(row) else ""
-            model = row[attr1_value_idx] if attr1_value_idx < len(row) else ""
-            color = row[attr2_value_idx] if attr2_value_idx < len(row) else ""
-            ref = row[attr3_value_idx] if attr3_value_idx < len(row) else ""
-            image_url = row[images_idx] if images_idx < len(row) else ""
-            
-            # Extraire la référence de l'image
-            image_ref = extract_ref_from_image_url(image_url)
-            
-            # Normaliser les références pour comparaison
-            ref_normalized = normalize(ref)
-            image_ref_normalized = normalize(image_ref) if image_ref else None
-            
-            # Vérifier la correspondance
-            if ref and image_ref:
-                if ref_normalized != image_ref_normalized:
-                    issues.append({
-                        'parent': parent_sku,
-                        'model': model,
-                        'color': color,
-                        'ref': ref,
-                        'image_url': image_url,
-                        'image_ref': image_ref,
-                        'issue': 'Reference mismatch'
-                    })
-            
-            variations_by_parent[parent_sku].append({
-                'model': model,
-                'color': color,
-                'ref': ref,
-                'image_url': image_url,
-                'image_ref': image_ref,
-            })
+    details_path = csv_path.parent / "verification_images.jsonl"
     
     print("=" * 80)
     print("VERIFICATION DES IMAGES ET VARIATIONS")
     print("=" * 80)
     print()
     
-    # Afficher les problèmes
-    if issues:
-        print(f"ATTENTION: {len(issues)} problemes detectes:")
-        print()
-        for issue in issues:
-            print(f"Produit: {issue['parent']}")
-            print(f"  Variation: {issue['model']} + {issue['color']}")
-            print(f"  Reference attendue: {issue['ref']}")
-            print(f"  Reference dans l'image: {issue['image_ref']}")
-            print(f"  URL image: {issue['image_url']}")
-            print()
-    else:
-        print("OK: Toutes les images correspondent aux references des variations")
-        print()
-    
-    # Afficher un résumé par produit
-    print("=" * 80)
-    print("RESUME PAR PRODUIT")
-    print("=" * 80)
-    print()
-    
-    for parent_sku, variations in variations_by_parent.items():
-        print(f"Produit: {parent_sku}")
-        print(f"  {len(variations)} variations")
-        
-        # Vérifier les doublons d'images
-        image_refs = {}
-        for v in variations:
-            if v['image_ref']:
-                if v['image_ref'] not in image_refs:
-                    image_refs[v['image_ref']] = []
-                image_refs[v['image_ref']].append(f"{v['model']} + {v['color']}")
+    # Chaque problème est compté et écrit dans le détail ; seul un résumé est affiché
+    with open_report(details_path) as report:
+        # Analyser les variations : par parent, (variation, référence extraite de l'image)
+        variations_by_parent = defaultdict(list)
         
-        duplicates = {ref: vars_list for ref, vars_list in image_refs.items() if len(vars_list) > 1}
-        if duplicates:
-            print(f"  ATTENTION: Images dupliquees:")
-            for ref, vars_list in duplicates.items():
-                print(f"    - {ref}: utilisee par {len(vars_list)} variations")
-                for var_combo in vars_list:
-                    print(f"      • {var_combo}")
-        else:
-            print(f"  OK: Chaque image est unique")
+        # Seules les colonnes utiles sont lues (cache en colonnes voisin du CSV)
+        with open_columns(csv_path, COLUMNS) as (columns, data_rows):
+            for view in Schema(columns).views(data_rows):
+                if view.is_variation:
+                    ref = view.ref
+                    combo = f"{view.model} + {view.color}"
+                    
+                    # Extraire la référence de l'image
+                    image_ref = extract_ref_from_image_url(view.images)
+                    
+                    # Vérifier la correspondance (références normalisées)
+                    if ref and image_ref:
+                        if normalize(ref) != normalize(image_ref):
+                            report.add("image_reference", f"{view.parent}: {combo} attend {ref}, image {image_ref}",
+                                       product=view.parent, model=view.model, color=view.color,
+                                       reference=ref, image_reference=image_ref, image=view.images)
+                    
+                    variations_by_parent[view.parent].append((combo, image_ref))
         
-        print()
+        with stage("validate"):
+            for parent_sku, variations in variations_by_parent.items():
+                report.count("produits")
+                report.count("variations", len(variations))
+            
+                # Vérifier les doublons d'images
+                image_refs = defaultdict(list)
+                for combo, image_ref in variations:
+                    if image_ref:
+                        image_refs[image_ref].append(combo)
+            
+                for ref, combos in image_refs.items():
+                    if len(combos) > 1:
+                        report.add("image_dupliquee", f"{parent_sku}: {ref} utilisee par {len(combos)} variations",
+                                   product=parent_sku, image_reference=ref, variations=combos)
+    
+    # Résumé
+    print(f"{report.total('produits')} produits, {report.total('variations')} variations")
+    print()
+    print("=" * 80)
+    if report.print_summary(ISSUE_LABELS):
+        print(f"Detail : {details_path}")
+    else:
+        print("OK: Toutes les images correspondent aux references des variations, chaque image est unique")
 
 if __name__ == "__main__":
-    main()
+    run_script(main)
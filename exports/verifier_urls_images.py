@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier que les URLs de la colonne Images répondent vraiment.
+
+Les URLs sont dédoublonnées sur tout le CSV (une image partagée par 40
+variations n'est testée qu'une fois), puis testées par des requêtes HEAD
+concurrentes sur un pool de connexions keep-alive borné.
+
+Les résultats sont gardés dans un cache JSON : une URL qui répondait il y a
+moins de --max-age-hours n'est pas retestée, et une entrée périmée est
+revérifiée par une requête conditionnelle (If-None-Match / If-Modified-Since)
+à laquelle le serveur répond 304 sans renvoyer l'image. Une URL en erreur
+(404, 5xx, réseau) est retestée à chaque exécution : une image corrigée entre
+deux vérifications n'est pas signalée à tort.
+
+Pour essayer sans toucher au site : image_stub.py.
+
+Usage:
+  python verifier_urls_images.py [--input woocommerce_import_corrige_final.csv]
+                                 [--concurrency 16] [--max-age-hours 24]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from column_cache import open_columns
+from csv_stream import open_csv_writer, open_output, read_header
+from http_async import ConnectionPool, HttpError
+from instrumentation import run_script, stage
+from woo_schema import Schema
+
+CACHE_VERSION = 1
+MAX_REDIRECTS = 5
+REPORT_HEADER = ["URL", "Statut", "Erreur", "Lignes", "Exemple SKU"]
+
+
+def iter_image_urls(csv_path) -> Iterable[Tuple[str, str]]:
+    """(url, sku) pour chaque image de chaque ligne ; la colonne Images peut en contenir plusieurs."""
+    Schema(read_header(csv_path)).require("Images")
+    with open_columns(csv_path, ("SKU", "Images")) as (columns, rows):
+        for view in Schema(columns).views(rows):
+            for url in view.images.split(","):
+                url = url.strip()
+                if url:
+                    yield url, view.sku
+
+
+def load_cache(path) -> Dict[str, dict]:
+    path = Path(path)
+    if not path.exists():
+        return {}
+    cache = json.loads(path.read_text(encoding="utf-8"))
+    return cache["urls"] if cache.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(path, entries: Dict[str, dict]) -> None:
+    with open_output(path, encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "urls": entries}, f, ensure_ascii=False, indent=0)
+
+
+def is_fresh(entry: Optional[dict], max_age: float, now: float) -> bool:
+    """Seule une URL qui répondait (2xx) lors d'une vérification récente n'est pas retestée."""
+    return entry is not None and entry.get("ok", False) and now - entry["checked"] < max_age
+
+
+async def check_url(pool: ConnectionPool, url: str, previous: Optional[dict]) -> Tuple[dict, bool]:
+    """
+    Teste une URL (redirections suivies) ; renvoie la nouvelle entrée de cache
+    et True si le serveur a confirmé l'entrée précédente (304).
+    """
+    headers = {}
+    if previous and previous.get("ok"):
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    current = url
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await pool.request("HEAD", current, headers)
+            if response.status in (405, 501):
+                # Serveur qui refuse HEAD : GET limité au premier octet
+                response = await pool.request("GET", current, dict(headers, Range="bytes=0-0"))
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                current = urljoin(current, location)
+                headers = {}  # les validateurs concernent l'URL d'origine
+                continue
+            break
+    except (HttpError, OSError, asyncio.TimeoutError, ValueError) as e:
+        return {"ok": False, "status": 0, "error": str(e) or type(e).__name__, "checked": time.time()}, False
+
+    if response.status == 304 and previous:
+        return dict(previous, checked=time.time()), True
+    entry = {
+        "ok": 200 <= response.status < 300,
+        "status": response.status,
+        "etag": response.headers.get("etag", ""),
+        "last_modified": response.headers.get("last-modified", ""),
+        "final_url": current if current != url else "",
+        "error": "",
+        "checked": time.time(),
+    }
+    return entry, False
+
+
+async def check_urls(urls: List[str], cache: Dict[str, dict], concurrency: int = 16,
+                     max_age: float = 24 * 3600, timeout: float = 15.0) -> Dict[str, int]:
+    """Met à jour `cache` pour chaque URL périmée ou absente ; renvoie des compteurs."""
+    now = time.time()
+    stale = [url for url in urls if not is_fresh(cache.get(url), max_age, now)]
+    stats = {"cached": len(urls) - len(stale), "checked": len(stale), "not_modified": 0, "connections": 0}
+
+    async with ConnectionPool(limit=concurrency, timeout=timeout) as pool:
+        async def run(url: str):
+            entry, not_modified = await check_url(pool, url, cache.get(url))
+            stats["not_modified"] += not_modified
+            cache[url] = entry
+
+        await asyncio.gather(*(run(url) for url in stale))
+        stats["connections"] = pool.connections_opened
+
+    return stats
+
+
+def main():
+    exports_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Vérifie que les URLs de la colonne Images répondent.")
+    parser.add_argument("--input", type=Path, nargs="+",
+                        default=[exports_dir / "woocommerce_import_corrige_final.csv"])
+    parser.add_argument("--cache", type=Path, default=exports_dir / "url_check_cache.json")
+    parser.add_argument("--report", type=Path, default=exports_dir / "urls_images_ko.csv")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requêtes simultanées au maximum")
+    parser.add_argument("--max-age-hours", type=float, default=24.0,
+                        help="Âge au-delà duquel un résultat en cache est revérifié")
+    parser.add_argument("--timeout", type=float, default=15.0, help="Délai par requête (secondes)")
+    args = parser.parse_args()
+
+    # URL -> [nombre de lignes, premier SKU]
+    usages: Dict[str, list] = {}
+    rows_with_images = 0
+    for csv_path in args.input:
+        if not csv_path.exists():
+            print(f"ERREUR: Fichier introuvable : {csv_path}")
+            return
+        for url, sku in iter_image_urls(csv_path):
+            rows_with_images += 1
+            usage = usages.get(url)
+            if usage is None:
+                usages[url] = [1, sku]
+            else:
+                usage[0] += 1
+
+    cache = load_cache(args.cache)
+    start = time.perf_counter()
+    with stage("validate"):
+        stats = asyncio.run(check_urls(list(usages), cache, args.concurrency,
+                                       args.max_age_hours * 3600, args.timeout))
+    elapsed = time.perf_counter() - start
+    save_cache(args.cache, cache)
+
+    failures = [(url, cache[url]) for url in usages if not cache[url]["ok"]]
+    with open_csv_writer(args.report, REPORT_HEADER) as writer:
+        for url, entry in failures:
+            count, sku = usages[url]
+            writer.writerow([url, entry["status"] or "", entry.get("error", ""), count, sku])
+
+    print("=" * 80)
+    print("VERIFICATION DES URLS D'IMAGES")
+    print("=" * 80)
+    print()
+    print(f"{rows_with_images} images referencees, {len(usages)} URLs distinctes")
+    print(f"  - {stats['cached']} deja verifiees (cache)")
+    print(f"  - {stats['checked']} verifiees en {elapsed:.2f}s ({stats['connections']} connexions, "
+          f"{stats['not_modified']} inchangees depuis la derniere verification)")
+    print()
+    if failures:
+        print(f"ATTENTION: {len(failures)} URLs en erreur:")
+        for url, entry in failures[:10]:
+            print(f"  - {entry['status'] or entry.get('error')}: {url} ({usages[url][0]} lignes)")
+        if len(failures) > 10:
+            print(f"  ... et {len(failures) - 10} autres")
+        print(f"\nDetail : {args.report}")
+    else:
+        print("OK: Toutes les URLs d'images repondent")
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Envoi du catalogue à WooCommerce par l'API REST, à la place de l'import CSV.
+
+L'importeur CSV de WooCommerce traite trop lentement les 868 lignes de
+generer_csv_complet.py sur o2switch et finit par expirer. Ce script prend
+les mêmes lignes (parents puis variations, au format HEADER des générateurs,
+ou un CSV déjà corrigé) et les envoie par lots :
+
+- POST /wp-json/wc/v3/products/batch pour les produits parents ;
+- POST /wp-json/wc/v3/products/{id}/variations/batch pour les variations.
+
+Chaque lot contient au plus 100 éléments (limite de WooCommerce). Les lots
+partent en parallèle, en nombre borné, sur un pool de connexions keep-alive
+(voir http_async.py). Une erreur réseau, un 429 ou un 5xx est retenté après
+une attente croissante (backoff exponentiel, Retry-After respecté).
+
+Un lot n'est jamais renvoyé tel quel s'il a pu être appliqué (délai dépassé,
+connexion coupée avant la réponse, 502 / 504) : les SKU en ligne sont relus,
+les créations déjà faites deviennent des mises à jour, puis le lot repart.
+
+Les produits et variations déjà en ligne sont retrouvés par SKU : relancer
+le script met à jour au lieu de dupliquer. Une image déjà envoyée est
+ensuite référencée par son id de média au lieu d'être retéléchargée par
+WordPress à chaque variation ; de même pour une image déjà en ligne sur le
+produit ou la variation mis à jour (même nom de fichier), si bien qu'un
+nouvel envoi ne retélécharge que les images qui ont changé.
+
+Configuration (variables d'environnement) :
+  WP_BASE_URL          origine WordPress (défaut https://wp.impexo.fr)
+  WC_CONSUMER_KEY      clé API REST WooCommerce (droits lecture/écriture)
+  WC_CONSUMER_SECRET
+
+Usage:
+  python woo_push.py [--generator complet|sans_reference | --input fichier.csv]
+                     [--base-url http://127.0.0.1:8765] [--concurrency 4]
+                     [--batch-size 100] [--dry-run]
+
+Pour tester sans toucher à la boutique : python woo_stub.py (serveur local
+qui imite ces endpoints), puis --base-url http://127.0.0.1:8765.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlencode, urlsplit
+
+import generer_csv_complet
+import generer_csv_sans_reference
+from csv_stream import open_csv
+from http_async import IDEMPOTENT_METHODS, ConnectionPool, HttpError, RequestNotSent, Response, Retry
+from instrumentation import run_script, stage
+from reporting import open_report
+from woo_schema import RowView, Schema
+
+DEFAULT_BASE_URL = "https://wp.impexo.fr"
+API_PATH = "/wp-json/wc/v3"
+
+# Limite de WooCommerce pour un appel /batch (create + update + delete)
+MAX_BATCH = 100
+# Taille des pages pour retrouver les SKU déjà en ligne
+PAGE_SIZE = 100
+
+MAX_RETRIES = 4
+BACKOFF = 0.5  # secondes, doublé à chaque nouvelle tentative
+
+# Réponses d'une passerelle après lesquelles un lot a pu être appliqué quand même
+UNCERTAIN_STATUSES = frozenset({502, 504})
+
+GENERATORS = {
+    "complet": generer_csv_complet,
+    "sans_reference": generer_csv_sans_reference,
+}
+
+
+class PushError(Exception):
+    """Appel à l'API refusé, ou toujours en échec après les nouvelles tentatives."""
+
+
+class UncertainBatch(PushError):
+    """Lot en échec qui a pu être appliqué (délai dépassé, connexion coupée, 502 / 504)."""
+
+
+# --- Lignes -> objets de l'API REST ------------------------------------------
+
+def attribute_columns(schema: Schema) -> List[Tuple[int, int, int]]:
+    """(nom, valeur(s), visible) pour chaque "Attribute N" présent dans l'en-tête."""
+    columns = []
+    n = 1
+    while schema.has(f"Attribute {n} name"):
+        columns.append((schema.index_of(f"Attribute {n} name"),
+                        schema.index_of(f"Attribute {n} value(s)"),
+                        schema.index_of(f"Attribute {n} visible")))
+        n += 1
+    return columns
+
+
+def _cell(row: List[str], idx: int) -> str:
+    return row[idx] if 0 <= idx < len(row) else ""
+
+
+def _split(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def product_payload(view: RowView, attributes: List[Tuple[int, int, int]]) -> dict:
+    """Produit variable : attributs de variation avec toutes leurs valeurs."""
+    row = view.row
+    payload = {
+        "sku": view.sku,
+        "name": view.name,
+        "type": "variable",
+        "status": "publish" if view.published == "1" else "draft",
+        "short_description": view.short_description,
+        "description": view.description,
+        "images": [{"src": url} for url in _split(view.images)],
+        "attributes": [],
+    }
+    for position, (name_idx, values_idx, visible_idx) in enumerate(attributes):
+        name = _cell(row, name_idx)
+        if name:
+            payload["attributes"].append({
+                "name": name,
+                "position": position,
+                "visible": _cell(row, visible_idx) != "0",
+                "variation": True,
+                "options": _split(_cell(row, values_idx)),
+            })
+    return payload
+
+
+def variation_payload(view: RowView, attributes: List[Tuple[int, int, int]]) -> dict:
+    """Variation : une valeur par attribut, prix, première image."""
+    row = view.row
+    payload = {
+        "sku": view.sku,
+        "status": "publish" if view.published == "1" else "private",
+        "regular_price": view.price,
+        "attributes": [],
+    }
+    images = _split(view.images)
+    if images:
+        payload["image"] = {"src": images[0]}
+    for name_idx, values_idx, _ in attributes:
+        name = _cell(row, name_idx)
+        if name:
+            payload["attributes"].append({"name": name, "option": _cell(row, values_idx)})
+    return payload
+
+
+def load_records(header: List[str], rows: Iterable[List[str]]) -> Tuple[List[dict], Dict[str, List[dict]]]:
+    """Parents (dans l'ordre) et variations par SKU parent, déjà au format de l'API."""
+    schema = Schema(header)
+    schema.require("Type", "SKU", "Parent")
+    attributes = attribute_columns(schema)
+    parents: List[dict] = []
+    variations: Dict[str, List[dict]] = {}
+    for view in schema.views(rows):
+        if view.is_variable:
+            parents.append(product_payload(view, attributes))
+            variations.setdefault(view.sku, [])
+        elif view.is_variation and view.parent:
+            variations.setdefault(view.parent, []).append(variation_payload(view, attributes))
+    return parents, variations
+
+
+def iter_generated_rows(generator) -> Iterator[List[str]]:
+    """Les lignes que le générateur écrirait dans son CSV."""
+    for product_sku, specs in generator.SPECS_CLIENT.items():
+        yield from generator.iter_product_rows(product_sku, specs)
+
+
+def media_key(url: str) -> str:
+    """Nom du fichier sans extension, en minuscules : ".../JOJO1015-1.JPG" -> "jojo1015-1"."""
+    name = unquote(urlsplit(url).path.rsplit("/", 1)[-1]).lower()
+    return name.rpartition(".")[0] or name
+
+
+def same_media(src: str, online_src: str) -> bool:
+    """
+    `online_src` (média WordPress) provient-il du fichier `src` ? WordPress garde
+    le nom du fichier téléchargé, suivi de -1, -2... s'il était déjà pris, ou
+    de -scaled pour une grande image réduite.
+    """
+    key, online = media_key(src), media_key(online_src)
+    return online == key or re.fullmatch(re.escape(key) + r"(?:-\d+|-scaled)+", online) is not None
+
+
+def chunks(items: List[dict], size: int) -> Iterator[List[dict]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# --- Client REST --------------------------------------------------------------
+
+class WooClient:
+    """Appels JSON à l'API REST WooCommerce, avec nouvelles tentatives."""
+
+    def __init__(self, pool: ConnectionPool, base_url: str, key: str, secret: str,
+                 retries: int = MAX_RETRIES, backoff: float = BACKOFF):
+        self.pool = pool
+        self.api_url = base_url.rstrip("/") + API_PATH
+        token = base64.b64encode(f"{key}:{secret}".encode("utf-8")).decode("ascii")
+        self.headers = {"Authorization": f"Basic {token}", "Accept": "application/json"}
+        self.retry = Retry(retries, backoff)
+
+    async def call(self, method: str, path: str, payload=None, params: Optional[dict] = None) -> Response:
+        """
+        Réponse 2xx de `path` (relatif à /wp-json/wc/v3) ; PushError sinon,
+        UncertainBatch si un appel non idempotent a pu être traité malgré l'échec.
+        """
+        url = f"{self.api_url}/{path}"
+        if params:
+            url += "?" + urlencode(params)
+        headers = self.headers
+        body = None
+        if payload is not None:
+            headers = dict(headers, **{"Content-Type": "application/json"})
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        uncertain = PushError if method in IDEMPOTENT_METHODS else UncertainBatch
+        try:
+            response = await self.retry.request(self.pool, method, url, headers, body)
+        except RequestNotSent as e:
+            raise PushError(f"{method} {path}: {e}") from e
+        except HttpError as e:
+            raise uncertain(f"{method} {path}: {e}") from e
+        if not 200 <= response.status < 300:
+            try:
+                message = response.json().get("message", "")
+            except ValueError:
+                message = response.body[:200].decode("utf-8", "replace")
+            error = uncertain if response.status in UNCERTAIN_STATUSES else PushError
+            raise error(f"{method} {path}: HTTP {response.status} {message}")
+        return response
+
+    async def list_all(self, path: str, fields: str = "id,sku") -> List[dict]:
+        """Tous les éléments d'une liste paginée : première page, puis les suivantes en parallèle."""
+        params = {"per_page": PAGE_SIZE, "_fields": fields}
+        first = await self.call("GET", path, params=dict(params, page=1))
+        items = first.json()
+        pages = int(first.headers.get("x-wp-totalpages", "1") or 1)
+        rest = await asyncio.gather(*(self.call("GET", path, params=dict(params, page=page))
+                                      for page in range(2, pages + 1)))
+        for response in rest:
+            items.extend(response.json())
+        return items
+
+
+# --- Envoi --------------------------------------------------------------------
+
+class Pusher:
+    """Envoie parents puis variations, en lots, en retenant les ids par SKU et les ids des images."""
+
+    def __init__(self, client: WooClient, report, batch_size: int = MAX_BATCH):
+        self.client = client
+        self.report = report
+        self.batch_size = min(batch_size, MAX_BATCH)
+        self.media_ids: Dict[str, int] = {}  # URL source -> id du média WordPress
+
+    def _with_media(self, images: List[dict]) -> List[dict]:
+        return [{"id": self.media_ids[image["src"]]} if image.get("src") in self.media_ids else image
+                for image in images]
+
+    def _seed_media(self, sent: List[dict], online: List[Optional[dict]]) -> None:
+        """Images de l'élément déjà en ligne : une image source du même fichier reprend son id de média."""
+        for image in sent:
+            src = image.get("src")
+            if not src or src in self.media_ids:
+                continue
+            for found in online:
+                if found and found.get("id") and same_media(src, found.get("src", "")):
+                    self.media_ids[src] = found["id"]
+                    break
+
+    def _learn_media(self, sent: List[dict], returned: List[dict]) -> None:
+        for image, created in zip(sent, returned):
+            if "src" in image and created.get("id"):
+                self.media_ids.setdefault(image["src"], created["id"])
+
+    def _body(self, items: List[Tuple[Optional[int], dict]], kind: str) -> Tuple[dict, Dict[str, List[dict]]]:
+        """Corps d'un appel /batch : (id existant ou None, objet) -> create ou update ; et les objets envoyés par action."""
+        create, update, sent = [], [], {"create": [], "update": []}
+        for item_id, payload in items:
+            if kind == "produit":
+                payload = dict(payload, images=self._with_media(payload["images"]))
+            elif "image" in payload:
+                payload = dict(payload, image=self._with_media([payload["image"]])[0])
+            if item_id is None:
+                create.append(payload)
+                sent["create"].append(payload)
+            else:
+                update.append(dict(payload, id=item_id))
+                sent["update"].append(payload)
+        body = {}
+        if create:
+            body["create"] = create
+        if update:
+            body["update"] = update
+        return body, sent
+
+    def _failed(self, items: List[Tuple[Optional[int], dict]], kind: str, error: PushError) -> Dict[str, int]:
+        for _, payload in items:
+            self.report.add("erreur", f"{payload['sku']}: {error}", kind=kind, sku=payload["sku"], error=str(error))
+        return {}
+
+    async def _reconcile(self, path: str, items: List[Tuple[Optional[int], dict]]) -> List[Tuple[Optional[int], dict]]:
+        """Après un lot peut-être appliqué : les créations dont le SKU est maintenant en ligne deviennent des mises à jour."""
+        if all(item_id is not None for item_id, _ in items):
+            return items  # que des mises à jour : les rejouer ne crée rien
+        online = {item["sku"]: item["id"] for item in await self.client.list_all(path) if item.get("sku")}
+        self.report.count("lot_rapproche")
+        return [(online.get(payload["sku"]) if item_id is None else item_id, payload) for item_id, payload in items]
+
+    async def _batch(self, path: str, items: List[Tuple[Optional[int], dict]], kind: str) -> Dict[str, int]:
+        """
+        Un appel `path`/batch : (id existant ou None, objet) -> create ou update.
+        Un lot peut-être appliqué n'est renvoyé qu'après rapprochement avec les
+        SKU en ligne (_reconcile). Renvoie SKU -> id pour les éléments acceptés ;
+        les refus sont rapportés.
+        """
+        retry = self.client.retry
+        attempt = 0
+        while True:
+            body, sent = self._body(items, kind)
+            try:
+                result = (await self.client.call("POST", f"{path}/batch", body)).json()
+                break
+            except PushError as e:
+                if not isinstance(e, UncertainBatch) or attempt == retry.retries:
+                    return self._failed(items, kind, e)
+            retry.retried += 1
+            await asyncio.sleep(retry.delay(attempt, None))
+            attempt += 1
+            try:
+                items = await self._reconcile(path, items)
+            except PushError as e:
+                return self._failed(items, kind, e)
+
+        ids = {}
+        for action in ("create", "update"):
+            for payload, returned in zip(sent[action], result.get(action, [])):
+                error = returned.get("error")
+                if error:
+                    message = error.get("message", "") if isinstance(error, dict) else str(error)
+                    self.report.add("erreur", f"{payload['sku']}: {message}", kind=kind, sku=payload["sku"],
+                                    action=action, error=message)
+                    continue
+                ids[payload["sku"]] = returned["id"]
+                self.report.count(f"{kind}_{'cree' if action == 'create' else 'mis_a_jour'}")
+                if kind == "produit":
+                    self._learn_media(payload["images"], returned.get("images", []))
+                elif "image" in payload and returned.get("image"):
+                    self._learn_media([payload["image"]], [returned["image"]])
+        return ids
+
+    async def push(self, parents: List[dict], variations: Dict[str, List[dict]]) -> None:
+        client = self.client
+
+        # Parents : ceux déjà en ligne sont mis à jour, en gardant les médias déjà téléchargés
+        online_parents = {p["sku"]: p for p in await client.list_all("products", "id,sku,images") if p.get("sku")}
+        existing = {sku: p["id"] for sku, p in online_parents.items()}
+        for p in parents:
+            if p["sku"] in online_parents:
+                self._seed_media(p["images"], online_parents[p["sku"]].get("images") or [])
+        items = [(existing.get(p["sku"]), p) for p in parents]
+        results = await asyncio.gather(*(self._batch("products", batch, "produit")
+                                         for batch in chunks(items, self.batch_size)))
+        parent_ids: Dict[str, int] = {}
+        for ids in results:
+            parent_ids.update(ids)
+
+        # Variations : un parent absent de la source peut déjà être en ligne ;
+        # seuls les parents qui existaient déjà peuvent avoir des variations en ligne
+        async def existing_variations(product_id: int) -> Dict[str, dict]:
+            found = await client.list_all(f"products/{product_id}/variations", "id,sku,image")
+            return {v["sku"]: v for v in found if v.get("sku")}
+
+        parent_ids = {**existing, **parent_ids}
+        targets = [(sku, parent_ids[sku]) for sku in variations if sku in parent_ids]
+        known = await asyncio.gather(*(existing_variations(pid) if sku in existing else _empty()
+                                       for sku, pid in targets))
+        for sku in variations:
+            if sku not in parent_ids:
+                for payload in variations[sku]:
+                    self.report.add("erreur", f"{payload['sku']}: parent {sku} non envoye",
+                                    kind="variation", sku=payload["sku"], error="parent absent")
+
+        # Deux vagues : une image encore inconnue n'est envoyée (téléchargée par
+        # WordPress) qu'avec sa première variation ; les autres partent ensuite avec l'id du média
+        for (sku, _), online in zip(targets, known):
+            for v in variations[sku]:
+                if "image" in v and v["sku"] in online:
+                    self._seed_media([v["image"]], [online[v["sku"]].get("image")])
+        seen = set()
+        waves = ([], [])
+        for (sku, pid), online in zip(targets, known):
+            ids = {v_sku: v["id"] for v_sku, v in online.items()}
+            first, later = [], []
+            for v in variations[sku]:
+                src = v.get("image", {}).get("src")
+                if src and src not in self.media_ids and src in seen:
+                    later.append((ids.get(v["sku"]), v))
+                else:
+                    seen.add(src)
+                    first.append((ids.get(v["sku"]), v))
+            waves[0].append((pid, first))
+            waves[1].append((pid, later))
+        for wave in waves:
+            await asyncio.gather(*(self._batch(f"products/{pid}/variations", batch, "variation")
+                                   for pid, items in wave for batch in chunks(items, self.batch_size)))
+
+
+async def _empty() -> Dict[str, dict]:
+    return {}
+
+
+async def push_catalog(parents: List[dict], variations: Dict[str, List[dict]], base_url: str,
+                       key: str, secret: str, report, concurrency: int = 4,
+                       batch_size: int = MAX_BATCH, timeout: float = 120.0) -> Dict[str, int]:
+    """Envoie le catalogue ; renvoie les compteurs de requêtes (les résultats vont dans `report`)."""
+    async with ConnectionPool(limit=concurrency, timeout=timeout) as pool:
+        client = WooClient(pool, base_url, key, secret)
+        await Pusher(client, report, batch_size).push(parents, variations)
+        return {"requests": client.retry.requests, "retried": client.retry.retried,
+                "connections": pool.connections_opened}
+
+
+def main():
+    exports_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Envoie le catalogue à WooCommerce par l'API REST (lots de 100).")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--generator", choices=list(GENERATORS), default="complet",
+                        help="Générateur dont les lignes sont envoyées")
+    source.add_argument("--input", type=Path, help="CSV à envoyer (au lieu des lignes du générateur)")
+    parser.add_argument("--base-url", default=os.environ.get("WP_BASE_URL", DEFAULT_BASE_URL),
+                        help="Origine WordPress (défaut: $WP_BASE_URL ou %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Lots envoyés simultanément au maximum")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH, help=f"Éléments par lot (au plus {MAX_BATCH})")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Délai par requête (secondes)")
+    parser.add_argument("--dry-run", action="store_true", help="Construire les lots sans rien envoyer")
+    args = parser.parse_args()
+
+    if args.input:
+        if not args.input.exists():
+            print(f"ERREUR: Fichier introuvable : {args.input}")
+            return
+        with open_csv(args.input) as (header, rows):
+            parents, variations = load_records(header, rows)
+        source_name = str(args.input)
+    else:
+        generator = GENERATORS[args.generator]
+        parents, variations = load_records(generator.HEADER, iter_generated_rows(generator))
+        source_name = f"{generator.__name__}.py"
+
+    n_variations = sum(len(v) for v in variations.values())
+    batch_size = min(args.batch_size, MAX_BATCH)
+    n_batches = -(-len(parents) // batch_size) + sum(-(-len(v) // batch_size) for v in variations.values())
+
+    print("=" * 80)
+    print("ENVOI DU CATALOGUE PAR L'API REST WOOCOMMERCE")
+    print("=" * 80)
+    print()
+    print(f"Source : {source_name}")
+    print(f"{len(parents)} produits parents, {n_variations} variations, {n_batches} lots de {batch_size} au plus")
+    if args.dry_run:
+        return
+
+    key = os.environ.get("WC_CONSUMER_KEY", "")
+    secret = os.environ.get("WC_CONSUMER_SECRET", "")
+    if not key or not secret:
+        print("ERREUR: WC_CONSUMER_KEY et WC_CONSUMER_SECRET doivent etre definies")
+        return
+    print(f"Destination : {args.base_url}")
+    print()
+
+    details_path = exports_dir / "woo_push.jsonl"
+    start = time.perf_counter()
+    with open_report(details_path) as report, stage("write"):
+        try:
+            stats = asyncio.run(push_catalog(parents, variations, args.base_url, key, secret, report,
+                                             args.concurrency, batch_size, args.timeout))
+        except PushError as e:
+            # Liste des SKU en ligne illisible (identifiants, URL) : rien n'a été envoyé
+            print(f"ERREUR: {e}")
+            return
+    elapsed = time.perf_counter() - start
+
+    print(f"Produits : {report.total('produit_cree')} crees, {report.total('produit_mis_a_jour')} mis a jour")
+    print(f"Variations : {report.total('variation_cree')} creees, {report.total('variation_mis_a_jour')} mises a jour")
+    print(f"{stats['requests']} requetes en {elapsed:.2f}s ({stats['connections']} connexions, "
+          f"{stats['retried']} nouvelles tentatives)")
+    print()
+    if report.print_summary({"erreur": "elements refuses ou non envoyes"}):
+        print(f"Detail : {details_path}")
+    else:
+        print("OK: Catalogue envoye")
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Schéma des colonnes d'un CSV WooCommerce, résolu une seule fois par fichier.
+
+Au lieu d'appeler header.index() et de répéter `x[idx] if idx < len(x) else ""`
+pour chaque ligne, les scripts compilent un Schema à partir de l'en-tête puis
+lisent les lignes au travers de vues légères (__slots__) :
+
+    schema = Schema(header)
+    for view in schema.views(rows):
+        if view.is_variation:
+            print(view.parent, view.model, view.color, view.ref, view.images)
+
+Une colonne absente du fichier, ou une ligne trop courte, se lit comme "".
+"""
+
+import sys
+from typing import Dict, Iterable, Iterator, List
+
+# Accesseur -> nom de colonne WooCommerce
+COLUMNS = {
+    "type": "Type",
+    "sku": "SKU",
+    "name": "Name",
+    "parent": "Parent",
+    "published": "Published",
+    "price": "Regular price",
+    "model_name": "Attribute 1 name",
+    "model": "Attribute 1 value(s)",
+    "color_name": "Attribute 2 name",
+    "color": "Attribute 2 value(s)",
+    "ref_name": "Attribute 3 name",
+    "ref": "Attribute 3 value(s)",
+    "short_description": "Short description",
+    "description": "Description",
+    "images": "Images",
+}
+
+# Indice des colonnes absentes : toujours hors de la ligne, donc lu comme ""
+MISSING = sys.maxsize
+
+
+class RowView:
+    """Vue sur une ligne CSV ; les accesseurs nommés sont ajoutés par Schema."""
+
+    __slots__ = ("row",)
+
+    def __init__(self, row: List[str]):
+        self.row = row
+
+    @property
+    def is_variable(self) -> bool:
+        return self.type.lower() == "variable"
+
+    @property
+    def is_variation(self) -> bool:
+        return self.type.lower() == "variation"
+
+
+def _getter(idx: int):
+    def get(self) -> str:
+        row = self.row
+        return row[idx] if idx < len(row) else ""
+    return get
+
+
+def _setter(attr: str, idx: int):
+    def set_(self, value: str) -> None:
+        if idx == MISSING:
+            raise KeyError(f"Colonne absente du CSV: {COLUMNS[attr]}")
+        row = self.row
+        if idx >= len(row):
+            row.extend([""] * (idx + 1 - len(row)))
+        row[idx] = value
+    return set_
+
+
+class Schema:
+    """Correspondance nom de colonne -> indice pour un en-tête donné."""
+
+    __slots__ = ("header", "width", "indexes", "view_class")
+
+    def __init__(self, header: List[str]):
+        self.header = header
+        self.width = len(header)
+        self.indexes: Dict[str, int] = {}
+        for i, col in enumerate(header):
+            self.indexes.setdefault(col, i)  # même règle que header.index()
+
+        namespace = {"__slots__": ()}
+        for attr, col in COLUMNS.items():
+            idx = self.indexes.get(col, MISSING)
+            namespace[attr] = property(_getter(idx), _setter(attr, idx))
+        self.view_class = type("WooRow", (RowView,), namespace)
+
+    def has(self, column: str) -> bool:
+        return column in self.indexes
+
+    def index_of(self, column: str) -> int:
+        """Indice de la colonne, ou -1 si elle est absente."""
+        return self.indexes.get(column, -1)
+
+    def require(self, *columns: str) -> None:
+        """Lève ValueError si une des colonnes manque."""
+        missing = [c for c in columns if c not in self.indexes]
+        if missing:
+            raise ValueError(f"Colonne(s) manquante(s): {', '.join(missing)}")
+
+    def view(self, row: List[str]) -> RowView:
+        return self.view_class(row)
+
+    def views(self, rows: Iterable[List[str]]) -> Iterator[RowView]:
+        view_class = self.view_class
+        for row in rows:
+            yield view_class(row)
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Faux WooCommerce local : les endpoints utilisés par woo_push.py et
+fetch_live_catalog.py, en mémoire.
+
+Permet d'essayer l'envoi et la relecture du catalogue (et de mesurer lots,
+connexions, nouvelles tentatives et pages inchangées) sans toucher à la boutique :
+
+    python woo_stub.py --port 8765 --fail-rate 0.1
+    WC_CONSUMER_KEY=ck WC_CONSUMER_SECRET=cs python woo_push.py --base-url http://127.0.0.1:8765
+    python fetch_live_catalog.py --base-url http://127.0.0.1:8765
+
+Endpoints imités (sous /wp-json/wc/v3) :
+  GET  products, products/{id}/variations    per_page (100 max), page, en-têtes X-WP-Total / X-WP-TotalPages
+  POST products/batch, products/{id}/variations/batch
+       create / update / delete, 100 éléments au plus, SKU unique (erreur par élément sinon)
+
+et, comme wordpress-store-proxy/woo-api.php (sans authentification) :
+  GET  /woo-api.php?action=products&per_page=&page=&orderby=&order=&status=
+  GET  /woo-api.php?action=variations&product_id=&per_page=&page=
+
+Toute réponse GET porte un ETag ; If-None-Match identique -> 304 sans corps.
+
+Les images {"src": ...} créent un média (compté comme téléchargement), nommé
+comme par WordPress : nom du fichier d'origine, suivi de -1, -2... s'il est
+déjà pris ; {"id": ...} réutilise un média existant. --fail-rate fait échouer une part des requêtes en 503
+(avec Retry-After, avant tout traitement) et --latency ajoute un délai à chaque réponse.
+Store.lost_responses coupe la connexion après avoir appliqué les lots suivants,
+sans répondre (réponse perdue, comme après un délai dépassé côté client). Toute requête à l'API REST sans
+en-tête Authorization est refusée (401). Ctrl-C affiche les compteurs.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from instrumentation import run_script
+
+API_PATH = "/wp-json/wc/v3/"
+MAX_BATCH = 100
+MAX_PAGE = 100
+
+ROUTE = re.compile(r"^products(?:/(\d+)/variations)?(/batch)?$")
+WOO_API = "/woo-api.php"
+
+
+def sanitize_title(name: str) -> str:
+    """Comme sanitize_title() de WordPress pour un nom d'attribut : "Modèle" -> "modele"."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    return re.sub(r"[^a-z0-9_-]+", "-", name).strip("-")
+
+
+class Store:
+    """Produits, variations et médias en mémoire, protégés par un verrou."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.products: Dict[int, dict] = {}
+        self.variations: Dict[int, Dict[int, dict]] = {}
+        self.media: Dict[int, str] = {}
+        self.media_names: Set[str] = set()
+        self.next_id = 1
+        self.lost_responses = 0  # lots suivants appliqués puis connexion coupée sans réponse
+        self.stats = {"requests": 0, "batches": 0, "failures": 0, "not_modified": 0,
+                      "media_downloads": 0, "connections": 0, "lost_responses": 0}
+
+    def _new_id(self) -> int:
+        item_id = self.next_id
+        self.next_id += 1
+        return item_id
+
+    def _image(self, image: dict) -> Optional[dict]:
+        if image.get("id") in self.media:
+            return {"id": image["id"], "src": self.media[image["id"]]}
+        if image.get("src"):
+            media_id = self._new_id()
+            self.stats["media_downloads"] += 1
+            self.media[media_id] = f"http://stub/wp-content/uploads/{self._upload_name(image['src'])}"
+            return {"id": media_id, "src": self.media[media_id]}
+        return None
+
+    def _upload_name(self, src: str) -> str:
+        name = unquote(urlsplit(src).path.rsplit("/", 1)[-1]) or "image"
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            stem, ext = name, ""
+        candidate, n = name, 0
+        while candidate in self.media_names:
+            n += 1
+            candidate = f"{stem}-{n}{dot}{ext}"
+        self.media_names.add(candidate)
+        return candidate
+
+    def _store(self, data: dict, item: Optional[dict]) -> dict:
+        item = dict(item or {})
+        for key, value in data.items():
+            if key == "images":
+                item["images"] = [img for img in map(self._image, value) if img]
+            elif key == "image":
+                item["image"] = self._image(value)
+            elif key != "id":
+                item[key] = value
+        item["date_modified_gmt"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        return item
+
+    def batch(self, parent_id: Optional[int], body: dict) -> Tuple[int, dict]:
+        items = self.products if parent_id is None else self.variations.setdefault(parent_id, {})
+        actions = {name: body.get(name) or [] for name in ("create", "update", "delete")}
+        if sum(len(v) for v in actions.values()) > MAX_BATCH:
+            return 413, {"code": "rest_request_entity_too_large",
+                         "message": f"Unable to accept more than {MAX_BATCH} items for this request."}
+        result = {}
+        with self.lock:
+            self.stats["batches"] += 1
+            skus = {item.get("sku"): item_id for item_id, item in items.items() if item.get("sku")}
+            if "create" in body:
+                result["create"] = []
+                for data in actions["create"]:
+                    if data.get("sku") and data["sku"] in skus:
+                        result["create"].append({"id": 0, "error": {
+                            "code": "product_invalid_sku",
+                            "message": "Invalid or duplicated SKU.", "data": {"status": 400}}})
+                        continue
+                    item_id = self._new_id()
+                    items[item_id] = self._store(data, {"id": item_id, "parent_id": parent_id or 0})
+                    skus[data.get("sku")] = item_id
+                    result["create"].append(items[item_id])
+            if "update" in body:
+                result["update"] = []
+                for data in actions["update"]:
+                    item_id = data.get("id")
+                    if item_id not in items:
+                        result["update"].append({"id": item_id or 0, "error": {
+                            "code": "woocommerce_rest_product_invalid_id",
+                            "message": "Invalid ID.", "data": {"status": 400}}})
+                        continue
+                    items[item_id] = self._store(data, items[item_id])
+                    result["update"].append(items[item_id])
+            if "delete" in body:
+                result["delete"] = [items.pop(item_id, {"id": item_id}) for item_id in actions["delete"]]
+        return 200, result
+
+    def page(self, parent_id: Optional[int], query: dict) -> Tuple[list, int]:
+        items = self.products if parent_id is None else self.variations.get(parent_id, {})
+        per_page = max(1, min(MAX_PAGE, int(query.get("per_page", ["10"])[0])))
+        page = max(1, int(query.get("page", ["1"])[0]))
+        fields = query.get("_fields", [""])[0]
+        with self.lock:
+            ordered = [items[item_id] for item_id in sorted(items)]
+        chunk = ordered[(page - 1) * per_page:page * per_page]
+        if fields:
+            keep = fields.split(",")
+            chunk = [{k: item[k] for k in keep if k in item} for item in chunk]
+        return chunk, len(ordered)
+
+    # --- woo-api.php ----------------------------------------------------------
+
+    def _woo_api_product(self, item: dict) -> dict:
+        return {
+            "id": item["id"], "name": item.get("name", ""), "slug": sanitize_title(item.get("name", "")),
+            "sku": item.get("sku", ""), "type": item.get("type", "simple"),
+            "description": item.get("description", ""), "short_description": item.get("short_description", ""),
+            "price": "", "regular_price": "", "sale_price": "", "on_sale": False,
+            "images": item.get("images", []),
+            "attributes": [{"id": 0, "name": a["name"], "slug": a["name"], "visible": a.get("visible", True),
+                            "variation": a.get("variation", True), "options": a.get("options", [])}
+                           for a in item.get("attributes", [])],
+            "variations": sorted(self.variations.get(item["id"], {})),
+            "categories": [], "stock_status": "instock",
+        }
+
+    @staticmethod
+    def _woo_api_variation(item: dict) -> dict:
+        price = item.get("regular_price", "")
+        return {
+            "id": item["id"], "price": price, "regular_price": price, "sale_price": "", "on_sale": False,
+            "image": item.get("image"),
+            "attributes": [{"id": 0, "name": sanitize_title(a["name"]), "option": a.get("option", "")}
+                           for a in item.get("attributes", [])],
+            "stock_status": "instock", "sku": item.get("sku", ""),
+        }
+
+    def woo_api(self, query: dict) -> Tuple[int, object]:
+        def arg(name: str, default: str) -> str:
+            return query.get(name, [default])[0]
+
+        action = arg("action", "")
+        status = arg("status", "publish")
+        with self.lock:
+            if action == "products":
+                per_page = max(1, min(MAX_PAGE, int(arg("per_page", "24"))))
+                page = max(1, int(arg("page", "1")))
+                ids = sorted(self.products, reverse=arg("order", "desc").lower() != "asc")
+                items = [self.products[i] for i in ids if status == "any" or self.products[i].get("status") == status]
+                return 200, [self._woo_api_product(p) for p in items[(page - 1) * per_page:page * per_page]]
+            if action == "variations":
+                product_id = int(arg("product_id", "0") or 0)
+                if product_id <= 0:
+                    return 400, {"error": "Missing or invalid product_id"}
+                product = self.products.get(product_id)
+                if product is None or product.get("type") != "variable":
+                    return 200, []
+                per_page = max(1, min(MAX_PAGE, int(arg("per_page", "100"))))
+                page = max(1, int(arg("page", "1")))
+                children = self.variations.get(product_id, {})
+                ids = sorted(children)[(page - 1) * per_page:page * per_page]
+                return 200, [self._woo_api_variation(children[i]) for i in ids]
+        return 400, {"error": "Invalid action. Use action=products|product-by-slug|variations"}
+
+
+def make_handler(store: Store, fail_rate: float = 0.0, latency: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def setup(self):
+            super().setup()
+            with store.lock:
+                store.stats["connections"] += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            if self.command == "GET" and status == 200:
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                headers = dict(headers or {}, ETag=etag)
+                if self.headers.get("If-None-Match", "").strip() == etag:
+                    with store.lock:
+                        store.stats["not_modified"] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _begin(self) -> bool:
+            """Lit le corps, applique délai et pannes simulées ; False si une 503 a été renvoyée."""
+            length = int(self.headers.get("Content-Length") or 0)
+            self.body = self.rfile.read(length) if length else b""
+            with store.lock:
+                store.stats["requests"] += 1
+            if latency:
+                time.sleep(latency)
+            if fail_rate and random.random() < fail_rate:
+                with store.lock:
+                    store.stats["failures"] += 1
+                self._send(503, {"code": "stub_unavailable", "message": "Service Unavailable"}, {"Retry-After": "1"})
+                return False
+            return True
+
+        def _route(self):
+            """(route, query) de l'API REST ; None si la requête a déjà reçu une réponse d'erreur."""
+            if not self._begin():
+                return None
+            if not self.headers.get("Authorization"):
+                self._send(401, {"code": "woocommerce_rest_cannot_view", "message": "Sorry, you cannot list resources."})
+                return None
+            parts = urlsplit(self.path)
+            match = ROUTE.match(parts.path[len(API_PATH):]) if parts.path.startswith(API_PATH) else None
+            if match is None:
+                self._send(404, {"code": "rest_no_route", "message": "No route was found matching the URL and request method."})
+                return None
+            parent_id = int(match.group(1)) if match.group(1) else None
+            if parent_id is not None and parent_id not in store.products:
+                self._send(404, {"code": "woocommerce_rest_product_invalid_id", "message": "Invalid ID."})
+                return None
+            return (parent_id, bool(match.group(2))), parse_qs(parts.query)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == WOO_API:
+                if self._begin():
+                    self._send(*store.woo_api(parse_qs(parts.query)))
+                return
+            routed = self._route()
+            if routed is None:
+                return
+            (parent_id, is_batch), query = routed
+            if is_batch:
+                self._send(404, {"code": "rest_no_route", "message": "No route was found matching the URL and request method."})
+                return
+            items, total = store.page(parent_id, query)
+            per_page = max(1, min(MAX_PAGE, int(query.get("per_page", ["10"])[0])))
+            self._send(200, items, {"X-WP-Total": str(total), "X-WP-TotalPages": str(-(-total // per_page))})
+
+        def do_POST(self):
+            routed = self._route()
+            if routed is None:
+                return
+            (parent_id, is_batch), _ = routed
+            if not is_batch:
+                self._send(404, {"code": "rest_no_route", "message": "No route was found matching the URL and request method."})
+                return
+            try:
+                body = json.loads(self.body.decode("utf-8") or "{}")
+            except ValueError:
+                self._send(400, {"code": "rest_invalid_json", "message": "Invalid JSON body passed."})
+                return
+            result = store.batch(parent_id, body)
+            with store.lock:
+                lost = store.lost_responses > 0
+                if lost:
+                    store.lost_responses -= 1
+                    store.stats["lost_responses"] += 1
+            if lost:
+                self.close_connection = True
+                return
+            self._send(*result)
+
+    return Handler
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, fail_rate: float = 0.0,
+                latency: float = 0.0, store: Optional[Store] = None) -> ThreadingHTTPServer:
+    """Serveur prêt à servir (serve_forever) ; port 0 = port libre, lisible dans server.server_address."""
+    server = ThreadingHTTPServer((host, port), make_handler(store or Store(), fail_rate, latency))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux WooCommerce local pour tester woo_push.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Part des requêtes qui échouent en 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Délai ajouté à chaque réponse (secondes)")
+    args = parser.parse_args()
+
+    store = Store()
+    server = make_server(args.host, args.port, args.fail_rate, args.latency, store)
+    print(f"Stub WooCommerce sur http://{args.host}:{server.server_address[1]} (Ctrl-C pour arreter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    variations = sum(len(v) for v in store.variations.values())
+    print()
+    print(f"{len(store.products)} produits, {variations} variations, {len(store.media)} medias")
+    print(", ".join(f"{name}: {value}" for name, value in store.stats.items()))
+
+
+if __name__ == "__main__":
+    run_script(main)
@@ -6,7 +6,16 @@
  *
  * GET woo-api.php?action=products&per_page=24&page=1&orderby=date&order=desc&search=...&status=publish
  * GET woo-api.php?action=product-by-slug&slug=xxx&status=publish
- * GET woo-api.php?action=variations&product_id=123&per_page=100&status=publish
+ * GET woo-api.php?action=variations&product_id=123&per_page=100&page=1&status=publish
+ *
+ * Les réponses portent un ETag : une requête avec If-None-Match identique reçoit 304 sans corps
+ * (utilisé par exports/fetch_live_catalog.py pour ne retransférer que les pages modifiées).
+ *
+ * Produits et variations exposent leur SKU (`sku`). Pour un attribut global (pa_xxx), `options`
+ * contient des ids de termes et la valeur d'une variation est un slug de terme : `label` et
+ * `terms` (id, name, slug) permettent de retrouver les noms. Comme tout ce fichier, ces champs
+ * sont publics (pas d'authentification, CORS) : après modification, recopier woo-api.php à la
+ * racine WordPress du serveur.
  */
 
 $origin = $_SERVER['HTTP_ORIGIN'] ?? '';
@@ -38,6 +47,19 @@ if (!function_exists('wc_get_products')) {
 
 $action = isset($_GET['action']) ? sanitize_text_field($_GET['action']) : '';
 
+function impexo_send_json($data) {
+    $json = wp_json_encode($data);
+    $etag = '"' . md5($json) . '"';
+    header('ETag: ' . $etag);
+    $if_none_match = isset($_SERVER['HTTP_IF_NONE_MATCH']) ? trim($_SERVER['HTTP_IF_NONE_MATCH']) : '';
+    if ($if_none_match !== '' && $if_none_match === $etag) {
+        http_response_code(304);
+        exit;
+    }
+    echo $json;
+    exit;
+}
+
 function impexo_product_to_array($product) {
     if (!is_object($product) || !method_exists($product, 'get_id')) {
         return null;
@@ -66,7 +88,7 @@ function impexo_product_to_array($product) {
     }
     $attributes = [];
     foreach ($product->get_attributes() ?: [] as $attr) {
-        $attributes[] = [
+        $item = [
             'id' => $attr->get_id(),
             'name' => $attr->get_name(),
             'slug' => $attr->get_name(),
@@ -74,6 +96,14 @@ function impexo_product_to_array($product) {
             'variation' => $attr->get_variation(),
             'options' => $attr->get_options() ?: [],
         ];
+        if ($attr->is_taxonomy()) {
+            $item['label'] = wc_attribute_label($attr->get_name());
+            $item['terms'] = [];
+            foreach ($attr->get_terms() ?: [] as $term) {
+                $item['terms'][] = ['id' => (int) $term->term_id, 'name' => $term->name, 'slug' => $term->slug];
+            }
+        }
+        $attributes[] = $item;
     }
     $cat_ids = $product->get_category_ids();
     $categories = [];
@@ -91,6 +121,7 @@ function impexo_product_to_array($product) {
         'id' => $product->get_id(),
         'name' => $product->get_name(),
         'slug' => $product->get_slug(),
+        'sku' => $product->get_sku(),
         'type' => $product->get_type(),
         'description' => $product->get_description(),
         'short_description' => $product->get_short_description(),
@@ -163,8 +194,7 @@ if ($action === 'products') {
         $a = impexo_product_to_array($p);
         if ($a) $out[] = $a;
     }
-    echo wp_json_encode($out);
-    exit;
+    impexo_send_json($out);
 }
 
 if ($action === 'product-by-slug') {
@@ -177,12 +207,10 @@ if ($action === 'product-by-slug') {
     $products = wc_get_products(['slug' => $slug, 'status' => isset($_GET['status']) ? sanitize_text_field($_GET['status']) : 'publish', 'limit' => 1]);
     $product = $products[0] ?? null;
     if (!$product) {
-        echo wp_json_encode([]);
-        exit;
+        impexo_send_json([]);
     }
     $a = impexo_product_to_array($product);
-    echo wp_json_encode($a ? [$a] : []);
-    exit;
+    impexo_send_json($a ? [$a] : []);
 }
 
 if ($action === 'variations') {
@@ -194,11 +222,11 @@ if ($action === 'variations') {
     }
     $product = wc_get_product($product_id);
     if (!$product || !$product->is_type('variable')) {
-        echo wp_json_encode([]);
-        exit;
+        impexo_send_json([]);
     }
     $per_page = isset($_GET['per_page']) ? max(1, min(100, (int) $_GET['per_page'])) : 100;
-    $children = array_slice($product->get_children(), 0, $per_page);
+    $page = isset($_GET['page']) ? max(1, (int) $_GET['page']) : 1;
+    $children = array_slice($product->get_children(), ($page - 1) * $per_page, $per_page);
     $out = [];
     foreach ($children as $var_id) {
         $v = wc_get_product($var_id);
@@ -207,8 +235,7 @@ if ($action === 'variations') {
             if ($a) $out[] = $a;
         }
     }
-    echo wp_json_encode($out);
-    exit;
+    impexo_send_json($out);
 }
 
 http_response_code(400);